@@ -1,13 +1,9 @@
 import bellmanford as bf
 import networkx as nx
-import matplotlib.pyplot as plt
-import numpy as np
 import itertools
 from ArbitragePath import ArbitragePath
 from OrderBook import OrderBookPrice, Asset
 import logging
-import matplotlib
-matplotlib.use('TkAgg')
 
 logger = logging.getLogger('CryptoArbitrageApp')
 
@@ -52,6 +48,20 @@ class ArbitrageGraph:
         except Exception as e:
             logger.error("updatePoint failed : " + str(e))
 
+    def invalidateMarket(self, exchange, symbol):
+        """ Removes the edges of the market (e.g. stale orderbook), they are added back by the next update """
+        try:
+            symbol_base, symbol_quote = symbol.split('/')
+        except ValueError:
+            return False
+        key1 = ((exchange, symbol_quote), (exchange, symbol_base))
+        key2 = ((exchange, symbol_base), (exchange, symbol_quote))
+        isRemoved = False
+        for key in (key1, key2):
+            if self.gdict.pop(key, None) is not None:
+                isRemoved = True
+        return isRemoved
+
     def getArbitrageDeal(self, timestamp):
         self.glist = []
         now = timestamp
@@ -68,7 +78,7 @@ class ArbitrageGraph:
                 self.glist.extend([[symbol_base, symbol_quote, edge]])
 
         if len(self.glist) == 0:
-            return 0, [], None
+            return ArbitragePath(nodesList=[], timestamp=timestamp, orderBookPriceList=[])
 
         self.G = nx.DiGraph()
         self.G.add_weighted_edges_from(self.glist)
@@ -108,49 +118,6 @@ class ArbitrageGraph:
             orderBookPriceList=orderBookPriceList)
 
     def plotGraph(self, figid=1, vol_BTC=None):
-        plt.figure(figid)
-        plt.clf()
-        plt.title("Throughput Volume %2.3fBTC" % vol_BTC)
-
-        pos = nx.circular_layout(self.G)
-        edges = self.G.edges()
-        colors = []
-        weights = []
-        if self.negativepath is not None:
-            for u, v in edges:
-                try:
-                    idx1 = self.negativepath.index(u)
-                except:
-                    idx1 = -1
-
-                idx2 = np.min([idx1 + 1, len(self.negativepath) - 1])
-                if idx1 != -1 and self.negativepath[idx2] == v:
-                    colors.append('r')
-                    weights.append(6)
-                else:
-                    colors.append('k')
-                    weights.append(1)
-        else:
-            for u, v in edges:
-                colors.append('k')
-                weights.append(1)
-
-        nx.draw_networkx(
-            self.G,
-            edge_color=colors,
-            ax=plt.gca(),
-            pos=pos,
-            with_labels=True,
-            width=weights)
-        labels = nx.get_edge_attributes(self.G, 'weight')
-        for key in labels.keys():
-            labels[key] = round(labels[key], 4)
-        nx.draw_networkx_edge_labels(
-            self.G,
-            pos=pos,
-            edge_labels=labels,
-            label_pos=0.3,
-            alpha=0.2,
-            font_size=8)
-        plt.draw()
-        plt.pause(0.001)
+        # matplotlib is only imported when plotting is enabled
+        from ArbitrageGraphPlot import ArbitrageGraphPlot
+        ArbitrageGraphPlot.plot(self, figid=figid, vol_BTC=vol_BTC)
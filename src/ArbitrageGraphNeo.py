@@ -1,5 +1,4 @@
 from FWLiveParams import FWLiveParams
-from GraphDB import GraphDB
 from OrderBook import Asset
 import logging
 
@@ -10,6 +9,9 @@ class ArbitrageGraphNeo:
     def __init__(self,volumeBTCs,neo4j_mode=FWLiveParams.neo4j_mode_disabled,resetDBData=False):
 
         self.volumeBTCs=volumeBTCs
+        if neo4j_mode in (FWLiveParams.neo4j_mode_aws_cloud, FWLiveParams.neo4j_mode_localhost):
+            # the neo4j driver is only loaded when the graph DB is enabled
+            from GraphDB import GraphDB
 
         if neo4j_mode == FWLiveParams.neo4j_mode_aws_cloud:
             cred=FWLiveParams.getNeo4jCredentials()
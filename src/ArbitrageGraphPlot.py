@@ -0,0 +1,66 @@
+import matplotlib
+# the GUI backend has to be selected before pyplot is imported
+matplotlib.use('TkAgg')
+import matplotlib.pyplot as plt
+import networkx as nx
+
+
+class ArbitrageGraphPlot:
+    """ Interactive plots of the arbitrage graphs, only imported when plotting is enabled """
+
+    @staticmethod
+    def init():
+        plt.figure(1)
+        plt.plot(1, 2)
+        plt.ion()
+        plt.show()
+        plt.pause(0.001)
+
+    @staticmethod
+    def plot(arbitrageGraph, figid=1, vol_BTC=None):
+        plt.figure(figid)
+        plt.clf()
+        plt.title("Throughput Volume %2.3fBTC" % vol_BTC)
+
+        pos = nx.circular_layout(arbitrageGraph.G)
+        edges = arbitrageGraph.G.edges()
+        colors = []
+        weights = []
+        if arbitrageGraph.negativepath is not None:
+            for u, v in edges:
+                try:
+                    idx1 = arbitrageGraph.negativepath.index(u)
+                except:
+                    idx1 = -1
+
+                idx2 = min(idx1 + 1, len(arbitrageGraph.negativepath) - 1)
+                if idx1 != -1 and arbitrageGraph.negativepath[idx2] == v:
+                    colors.append('r')
+                    weights.append(6)
+                else:
+                    colors.append('k')
+                    weights.append(1)
+        else:
+            for u, v in edges:
+                colors.append('k')
+                weights.append(1)
+
+        nx.draw_networkx(
+            arbitrageGraph.G,
+            edge_color=colors,
+            ax=plt.gca(),
+            pos=pos,
+            with_labels=True,
+            width=weights)
+        labels = nx.get_edge_attributes(arbitrageGraph.G, 'weight')
+        for key in labels.keys():
+            labels[key] = round(labels[key], 4)
+        nx.draw_networkx_edge_labels(
+            arbitrageGraph.G,
+            pos=pos,
+            edge_labels=labels,
+            label_pos=0.3,
+            alpha=0.2,
+            font_size=8)
+        plt.draw()
+        plt.pause(0.001)
@@ -325,3 +325,28 @@ class TestClass(object):
         assert segmentedOrderRequestLists[0].getOrderRequests()[2].market == 'ETH/BTC'
         assert segmentedOrderRequestLists[0].getOrderRequests()[2].limitPrice == 1/5
         assert segmentedOrderRequestLists[0].getOrderRequests()[2].volumeBase == 4.5
+
+    def test_invalidateMarket(self):
+        arbitrageGraph = ArbitrageGraph()
+        for exchange, symbol, asks, bids, rateBTCxBase, rateBTCxQuote in [
+                ("kraken", "BTC/USD", [[10000, 10]], [[9000, 10]], 1, 9500),
+                ("kraken", "ETH/USD", [[200, 1000]], [[100, 1000]], 4.5, 9500),
+                ("kraken", "BTC/ETH", [[5, 100]], [[4, 100]], 1, 4.5)]:
+            arbitrageGraph.updatePoint(
+                orderBookPair=OrderBookPair(
+                    exchange=exchange,
+                    symbol=symbol,
+                    asks=asks,
+                    bids=bids,
+                    rateBTCxBase=rateBTCxBase,
+                    rateBTCxQuote=rateBTCxQuote,
+                    feeRate=0,
+                    timestamp=0,
+                    timeToLiveSec=5
+                ),
+                volumeBTC=1)
+        assert arbitrageGraph.getArbitrageDeal(0).isProfitable() == True
+
+        assert arbitrageGraph.invalidateMarket("kraken", "BTC/ETH") is True
+        assert arbitrageGraph.invalidateMarket("kraken", "BTC/ETH") is False
+        assert arbitrageGraph.getArbitrageDeal(0).isProfitable() == False
@@ -0,0 +1,107 @@
+from typing import Dict, Tuple
+
+
+class BalanceCache:
+    """
+        Balances of the exchanges maintained incrementally from the orders of the Trader: placing an order moves
+        its input from free to used, the fills move the used input to the free output minus the fee and a closed or
+        canceled order releases what's left of its input. The cache is replaced by the fetched balances of an
+        exchange when they're reconciled (setBalance), the reads are O(1) dict lookups.
+        The fee is charged on the received currency if the exchange doesn't tell its currency.
+    """
+    # remaining reservations below this are rounding leftovers
+    EPSILON = 1e-12
+    # keys of the ccxt balance structure which aren't assets
+    CCXT_BALANCE_KEYS = ('info', 'free', 'used', 'total', 'timestamp', 'datetime')
+
+    def __init__(self):
+        # exchange: {asset: {'free': x, 'used': y}}
+        self.balances: Dict[str, Dict[str, Dict[str, float]]] = {}
+        # (exchange, orderId): order accounting of the open orders
+        self.orders: Dict[Tuple[str, str], Dict] = {}
+        # exchange: number of changes, a reconciliation is only applied if nothing changed while fetching
+        self.versions: Dict[str, int] = {}
+
+    def touch(self, exchange: str):
+        self.versions[exchange] = self.versions.get(exchange, 0) + 1
+
+    def getVersion(self, exchange: str) -> int:
+        return self.versions.get(exchange, 0)
+
+    def setBalance(self, exchange: str, balance):
+        ''' balance: ccxt balance structure, {asset: {'free', 'used', 'total'}, 'free': {...}, ...} '''
+        self.balances[exchange] = {asset: {'free': float(account.get('free') or 0), 'used': float(account.get('used') or 0)}
+                                   for asset, account in balance.items()
+                                   if asset not in BalanceCache.CCXT_BALANCE_KEYS and isinstance(account, dict)}
+        self.touch(exchange)
+
+    def hasExchange(self, exchange: str) -> bool:
+        return exchange in self.balances
+
+    def getFree(self, exchange: str, asset: str) -> float:
+        ''' :raises KeyError: unknown exchange or asset '''
+        return self.balances[exchange][asset]['free']
+
+    def getAsset(self, exchange: str, asset: str) -> Dict[str, float]:
+        return self.balances.setdefault(exchange, {}).setdefault(asset, {'free': 0.0, 'used': 0.0})
+
+    def hasOpenOrders(self, exchange: str) -> bool:
+        return any(key[0] == exchange for key in self.orders)
+
+    def toCCXT(self, exchange: str):
+        ''' The balances of the exchange in the ccxt balance structure '''
+        result = {'free': {}, 'used': {}, 'total': {}}
+        for asset, balance in self.balances.get(exchange, {}).items():
+            account = {'free': balance['free'], 'used': balance['used'], 'total': balance['free'] + balance['used']}
+            result[asset] = account
+            for key in ('free', 'used', 'total'):
+                result[key][asset] = account[key]
+        return result
+
+    def addOrder(self, exchange: str, orderId: str, symbol: str, side: str, amount: float, price: float):
+        base, quote = symbol.split('/')
+        inputAsset, outputAsset, reserved = (quote, base, amount * price) if side == 'buy' else (base, quote, amount)
+        balance = self.getAsset(exchange, inputAsset)
+        balance['free'] -= reserved
+        balance['used'] += reserved
+        self.orders[(exchange, orderId)] = {
+            'side': side,
+            'input': inputAsset,
+            'output': outputAsset,
+            'reserved': reserved,
+            'consumed': 0.0,
+            'filled': 0.0,
+            'fee': 0.0
+        }
+        self.touch(exchange)
+
+    def updateOrder(self, exchange: str, orderId: str, filled: float, price: float, feeCost: float = None, feeCurrency: str = None,
+                    isCompleted: bool = False):
+        '''
+        Applies the progress of an order, the amounts are cumulative like in the ccxt order structure
+        :param filled: base amount filled so far
+        :param price: average fill price
+        :param isCompleted: closed or canceled, its remaining input is released
+        '''
+        order = self.orders.get((exchange, orderId))
+        if order is None:
+            return
+        if filled is not None and filled > order['filled']:
+            delta = filled - order['filled']
+            spent, received = (delta * price, delta) if order['side'] == 'buy' else (delta, delta * price)
+            inputBalance = self.getAsset(exchange, order['input'])
+            inputBalance['used'] -= spent
+            order['consumed'] += spent
+            self.getAsset(exchange, order['output'])['free'] += received
+            order['filled'] = filled
+        if feeCost is not None and feeCost > order['fee']:
+            self.getAsset(exchange, feeCurrency if feeCurrency else order['output'])['free'] -= feeCost - order['fee']
+            order['fee'] = feeCost
+        if isCompleted:
+            remaining = order['reserved'] - order['consumed']
+            if abs(remaining) > BalanceCache.EPSILON:
+                inputBalance = self.getAsset(exchange, order['input'])
+                inputBalance['used'] -= remaining
+                inputBalance['free'] += remaining
+            del self.orders[(exchange, orderId)]
+        self.touch(exchange)
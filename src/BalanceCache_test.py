@@ -0,0 +1,86 @@
+from BalanceCache import BalanceCache
+from MockExchange import MockExchange, MockVenue
+from MockExchangeClient import MockExchangeClient
+from OrderRequest import OrderRequest, OrderRequestList, OrderRequestType, SegmentedOrderRequestList
+from Trader import Trader
+import asyncio
+import pytest
+
+
+def createCache():
+    cache = BalanceCache()
+    cache.setBalance('kraken', {'BTC': {'free': 1, 'used': 0, 'total': 1}, 'ETH': {'free': 10, 'used': 0, 'total': 10},
+                                'free': {'BTC': 1, 'ETH': 10}, 'used': {'BTC': 0, 'ETH': 0}, 'info': {}})
+    return cache
+
+
+class TestClass(object):
+    def test_fillsAndFees(self):
+        cache = createCache()
+        cache.addOrder('kraken', 'o1', 'ETH/BTC', 'buy', 2, 0.03)
+        assert cache.getFree('kraken', 'BTC') == pytest.approx(0.94)
+        assert cache.hasOpenOrders('kraken') is True
+
+        # partial fill below the limit price, the fee is charged on the received ETH
+        cache.updateOrder('kraken', 'o1', filled=1, price=0.029, feeCost=0.001)
+        assert cache.getFree('kraken', 'ETH') == pytest.approx(10 + 1 - 0.001)
+        assert cache.toCCXT('kraken')['used']['BTC'] == pytest.approx(0.06 - 0.029)
+
+        # the same update again is a no-op, the completion releases the rest of the reservation
+        cache.updateOrder('kraken', 'o1', filled=1, price=0.029, feeCost=0.001)
+        cache.updateOrder('kraken', 'o1', filled=2, price=0.029, feeCost=0.002, isCompleted=True)
+        assert cache.getFree('kraken', 'ETH') == pytest.approx(10 + 2 - 0.002)
+        assert cache.getFree('kraken', 'BTC') == pytest.approx(1 - 0.058)
+        assert cache.toCCXT('kraken')['used']['BTC'] == pytest.approx(0)
+        assert cache.hasOpenOrders('kraken') is False
+
+    def test_cancelAndReconcile(self):
+        cache = createCache()
+        cache.addOrder('kraken', 'o1', 'ETH/BTC', 'sell', 4, 0.03)
+        cache.updateOrder('kraken', 'o1', filled=1, price=0.03, feeCost=0.0001, feeCurrency='BTC', isCompleted=True)
+        assert cache.getFree('kraken', 'ETH') == pytest.approx(9)
+        assert cache.getFree('kraken', 'BTC') == pytest.approx(1 + 0.03 - 0.0001)
+
+        version = cache.getVersion('kraken')
+        cache.setBalance('kraken', {'BTC': {'free': 2, 'used': 0}, 'ETH': {'free': 8, 'used': 0}})
+        assert cache.getVersion('kraken') > version
+        assert cache.getFree('kraken', 'BTC') == 2
+        with pytest.raises(KeyError):
+            cache.getFree('kraken', 'USD')
+
+    def test_traderBalancesFollowTheFills(self, monkeypatch):
+        monkeypatch.setattr(Trader, 'storeFreeBalances', staticmethod(lambda uuid, timing, balances: None))
+
+        async def scenario():
+            venue = MockVenue('kraken', feeRate=0.001)
+            venue.addMarket('ETH/BTC')
+            venue.setOrderbook('ETH/BTC', [[0.03, 100]], [[0.031, 100]])
+            venue.setBalance('ETH', 10)
+            venue.setBalance('BTC', 1)
+            server = MockExchange([venue])
+            await server.start()
+            client = MockExchangeClient({'id': 'kraken', 'name': 'kraken', 'urls': {'api': server.getUrl('kraken')}})
+            trader = Trader(is_sandbox_mode=False)
+            trader.sendNotification = lambda text: None
+            trader.saveSORLtoDB = lambda sorl: None
+
+            async def pollTrades():
+                pass
+            trader.pollTrades = pollTrades
+            try:
+                await trader.initExchanges({'kraken': client})
+                await trader.execute(SegmentedOrderRequestList('deal', [OrderRequestList([
+                    OrderRequest('kraken', 'ETH/BTC', volumeBase=3, limitPrice=0.03, meanPrice=0.03, requestType=OrderRequestType.SELL),
+                    OrderRequest('kraken', 'ETH/BTC', volumeBase=1, limitPrice=0.031, meanPrice=0.031, requestType=OrderRequestType.BUY)])]))
+                # no fetch_balance after the deal, the cache is updated from the order statuses
+                for asset in ('ETH', 'BTC'):
+                    assert trader.get_free_balance('kraken', asset) == pytest.approx(venue.balances[asset]['free'])
+                assert trader.getBalanceLedger().getNofDeals() == 0
+
+                venue.setBalance('BTC', 5)
+                await trader.reconcileBalances()
+                assert trader.get_free_balance('kraken', 'BTC') == 5
+            finally:
+                await client.close()
+                await server.stop()
+        asyncio.get_event_loop().run_until_complete(scenario())
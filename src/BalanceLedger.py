@@ -0,0 +1,86 @@
+import logging
+from typing import Dict, Tuple
+
+from Exceptions import BalanceReservationError
+
+logger = logging.getLogger('Trader')
+
+
+class BalanceLedger:
+    """
+        In-memory reservations of the balances used by the deals in progress, per (exchange, asset).
+        A deal reserves everything it needs at once (all or nothing) before it places an order, deals whose
+        needs exceed the free balance minus the reservations of the other deals are rejected. A reservation is
+        released when its order is placed and the BalanceCache holds the funds as used, the rest when the deal ends.
+        The fills of an order are reserved for the next order of the deal as they arrive (reserveMore()).
+        Runs on the event loop of the Trader, reserve() doesn't await so the check and the reservation are atomic.
+    """
+    # rounding tolerance of the amounts
+    EPSILON = 1e-12
+
+    def __init__(self):
+        # dealId: {(exchange, asset): amount}
+        self.reservations: Dict[str, Dict[Tuple[str, str], float]] = {}
+        # (exchange, asset): amount reserved by all the deals
+        self.reserved: Dict[Tuple[str, str], float] = {}
+
+    def getReserved(self, exchange: str, asset: str) -> float:
+        return self.reserved.get((exchange, asset), 0.0)
+
+    def getReservedByOthers(self, dealId: str, exchange: str, asset: str) -> float:
+        return self.getReserved(exchange, asset) - self.reservations.get(dealId, {}).get((exchange, asset), 0.0)
+
+    def getAvailable(self, exchange: str, asset: str, freeBalance: float) -> float:
+        return freeBalance - self.getReserved(exchange, asset)
+
+    def getNofDeals(self) -> int:
+        return len(self.reservations)
+
+    def reserve(self, dealId: str, amounts: Dict[Tuple[str, str], float], getFreeBalance):
+        '''
+        :param amounts: {(exchange, asset): amount} needed by the deal
+        :param getFreeBalance: getFreeBalance(exchange, asset) -> float
+        :raises BalanceReservationError: nothing is reserved
+        '''
+        if dealId in self.reservations:
+            raise BalanceReservationError(f'Deal {dealId} has already reserved balances')
+        self.reserveMore(dealId, amounts, getFreeBalance)
+
+    def reserveMore(self, dealId: str, amounts: Dict[Tuple[str, str], float], getFreeBalance):
+        '''
+        Adds amounts to the reservation of the deal (e.g. the fills of a leg kept for the next leg), all or nothing
+        :raises BalanceReservationError: nothing is reserved
+        '''
+        for (exchange, asset), amount in amounts.items():
+            available = self.getAvailable(exchange, asset, getFreeBalance(exchange, asset))
+            if amount > available + BalanceLedger.EPSILON:
+                raise BalanceReservationError(
+                    f'Insufficient unreserved balance on {exchange} {asset}: needed={amount} available={available}'
+                    f' reserved={self.getReserved(exchange, asset)}')
+        reservation = self.reservations.setdefault(dealId, {})
+        for key, amount in amounts.items():
+            reservation[key] = reservation.get(key, 0.0) + amount
+            self.reserved[key] = self.reserved.get(key, 0.0) + amount
+        logger.debug(f'Balances reserved by deal {dealId}: {amounts}')
+
+    def release(self, dealId: str, exchange: str, asset: str, amount: float = None):
+        ''' Releases amount (everything if None) of the reservation of the deal on exchange/asset '''
+        reservation = self.reservations.get(dealId)
+        key = (exchange, asset)
+        if reservation is None or key not in reservation:
+            return
+        released = reservation[key] if amount is None else min(amount, reservation[key])
+        reservation[key] -= released
+        if reservation[key] <= BalanceLedger.EPSILON:
+            del reservation[key]
+        self.reserved[key] -= released
+        if self.reserved[key] <= BalanceLedger.EPSILON:
+            del self.reserved[key]
+        if not reservation:
+            del self.reservations[dealId]
+
+    def releaseAll(self, dealId: str):
+        for exchange, asset in list(self.reservations.get(dealId, {}).keys()):
+            self.release(dealId, exchange, asset)
+        self.reservations.pop(dealId, None)
+        logger.debug(f'Balances released by deal {dealId}')
@@ -0,0 +1,179 @@
+from BalanceLedger import BalanceLedger
+from Exceptions import BalanceReservationError
+from MockExchange import MockExchange, MockVenue
+from MockExchangeClient import MockExchangeClient
+from OrderRequest import OrderRequest, OrderRequestList, OrderRequestStatus, OrderRequestType, SegmentedOrderRequestList
+from TokenBucket import TokenBucket
+from Trader import Trader
+import asyncio
+import pytest
+
+FREE_BALANCES = {('kraken', 'ETH'): 10, ('kraken', 'BTC'): 1}
+
+
+def getFreeBalance(exchange, asset):
+    return FREE_BALANCES[(exchange, asset)]
+
+
+def createDeal(uuid, volumeBase):
+    return SegmentedOrderRequestList(uuid, [OrderRequestList([
+        OrderRequest('kraken', 'ETH/BTC', volumeBase=volumeBase, limitPrice=0.03, meanPrice=0.03, requestType=OrderRequestType.SELL)])])
+
+
+class TestClass(object):
+    def test_reserveAndRelease(self):
+        ledger = BalanceLedger()
+        ledger.reserve('deal1', {('kraken', 'ETH'): 6, ('kraken', 'BTC'): 0.5}, getFreeBalance)
+        assert ledger.getAvailable('kraken', 'ETH', 10) == 4
+
+        # all or nothing
+        with pytest.raises(BalanceReservationError):
+            ledger.reserve('deal2', {('kraken', 'BTC'): 0.1, ('kraken', 'ETH'): 5}, getFreeBalance)
+        assert ledger.getReserved('kraken', 'BTC') == 0.5
+        ledger.reserve('deal2', {('kraken', 'ETH'): 4}, getFreeBalance)
+        assert ledger.getNofDeals() == 2
+
+        ledger.release('deal1', 'kraken', 'ETH', 2)
+        assert ledger.getReserved('kraken', 'ETH') == 8
+        ledger.releaseAll('deal1')
+        ledger.releaseAll('deal2')
+        assert (ledger.getNofDeals(), ledger.reserved) == (0, {})
+
+    def test_balanceRequirements(self):
+        deal = SegmentedOrderRequestList('uuid', [
+            OrderRequestList([OrderRequest('kraken', 'ETH/BTC', volumeBase=2, limitPrice=0.03, meanPrice=0.029, requestType=OrderRequestType.BUY),
+                              OrderRequest('kraken', 'ETH/USD', volumeBase=2, limitPrice=200, meanPrice=200, requestType=OrderRequestType.SELL)]),
+            OrderRequestList([OrderRequest('Bitstamp', 'BTC/USD', volumeBase=0.1, limitPrice=9000, meanPrice=9000, requestType=OrderRequestType.SELL)])])
+        assert Trader.getBalanceRequirements(deal) == {('kraken', 'BTC'): pytest.approx(0.06), ('bitstamp', 'BTC'): 0.1}
+
+    def test_concurrentDealsOnTrader(self, monkeypatch):
+        monkeypatch.setattr(Trader, 'storeFreeBalances', staticmethod(lambda uuid, timing, balances: None))
+        monkeypatch.setattr(Trader, 'TTL_TRADEORDER_S', 0.2)
+
+        async def scenario():
+            venue = MockVenue('kraken')
+            venue.addMarket('ETH/BTC')
+            venue.setOrderbook('ETH/BTC', [[0.03, 100]], [[0.031, 100]])
+            venue.setBalance('ETH', 10)
+            server = MockExchange([venue])
+            await server.start()
+            client = MockExchangeClient({'id': 'kraken', 'name': 'kraken', 'urls': {'api': server.getUrl('kraken')}})
+            trader = Trader(is_sandbox_mode=False)
+            trader.sendNotification = lambda text: None
+            trader.saveSORLtoDB = lambda sorl: None
+
+            async def pollTrades():
+                pass
+            trader.pollTrades = pollTrades
+            try:
+                await trader.initExchanges({'kraken': client})
+                deals = [createDeal('deal1', 4), createDeal('deal2', 4), createDeal('deal3', 4)]
+                executions = [asyncio.ensure_future(trader.execute(deal)) for deal in deals]
+                await asyncio.sleep(0)
+                # deal3 would overdraw the ETH reserved by the first two
+                assert trader.getNofActiveDeals() == 2
+                assert trader.getBalanceLedger().getReserved('kraken', 'ETH') == 8
+                await asyncio.gather(*executions)
+                assert [deal.getOrderRequests()[0].getStatus() for deal in deals] == \
+                    [OrderRequestStatus.CLOSED, OrderRequestStatus.CLOSED, OrderRequestStatus.INITIAL]
+                assert trader.getNofActiveDeals() == 0
+                assert trader.getBalanceLedger().getReserved('kraken', 'ETH') == 0
+            finally:
+                await client.close()
+                await server.stop()
+        asyncio.get_event_loop().run_until_complete(scenario())
+
+    def test_fillsAreReservedForNextLeg(self, monkeypatch):
+        monkeypatch.setattr(Trader, 'storeFreeBalances', staticmethod(lambda uuid, timing, balances: None))
+        monkeypatch.setattr(Trader, 'TTL_TRADEORDER_S', 2)
+
+        async def scenario():
+            venue = MockVenue('kraken', fillMode=MockVenue.FILL_PARTIAL)
+            venue.addMarket('ETH/BTC')
+            venue.addMarket('BTC/USD')
+            venue.setOrderbook('ETH/BTC', [[0.03, 100]], [[0.031, 100]])
+            venue.setOrderbook('BTC/USD', [[9000, 10]], [[9100, 10]])
+            venue.setBalance('ETH', 10)
+            venue.setBalance('BTC', 0)
+            server = MockExchange([venue])
+            await server.start()
+            client = MockExchangeClient({'id': 'kraken', 'name': 'kraken', 'urls': {'api': server.getUrl('kraken')}})
+            trader = Trader(is_sandbox_mode=False)
+            trader.sendNotification = lambda text: None
+            trader.saveSORLtoDB = lambda sorl: None
+
+            async def pollTrades():
+                pass
+            trader.pollTrades = pollTrades
+            try:
+                await trader.initExchanges({'kraken': client})
+                deal1 = SegmentedOrderRequestList('deal1', [OrderRequestList([
+                    OrderRequest('kraken', 'ETH/BTC', volumeBase=4, limitPrice=0.03, meanPrice=0.03, requestType=OrderRequestType.SELL),
+                    OrderRequest('kraken', 'BTC/USD', volumeBase=0.05, limitPrice=9000, meanPrice=9000, requestType=OrderRequestType.SELL)])])
+                deal2 = SegmentedOrderRequestList('deal2', [OrderRequestList([
+                    OrderRequest('kraken', 'BTC/USD', volumeBase=0.05, limitPrice=9000, meanPrice=9000, requestType=OrderRequestType.SELL)])])
+                execution = asyncio.ensure_future(trader.execute(deal1))
+                while deal1.getOrderRequests()[0].id is None:
+                    await asyncio.sleep(0.01)
+                # half of the first leg is filled, its output is kept for the second leg
+                assert trader.getBalanceLedger().getReserved('kraken', 'BTC') == pytest.approx(0.05)
+                await trader.execute(deal2)
+                assert deal2.getOrderRequests()[0].getStatus() == OrderRequestStatus.INITIAL
+
+                venue.fillMode = MockVenue.FILL_IMMEDIATE
+                venue.setOrderbook('ETH/BTC', [[0.03, 100]], [[0.031, 100]])
+                await execution
+                assert [orderRequest.getStatus() for orderRequest in deal1.getOrderRequests()] == \
+                    [OrderRequestStatus.CLOSED, OrderRequestStatus.CLOSED]
+                assert trader.getBalanceLedger().getNofDeals() == 0
+            finally:
+                await client.close()
+                await server.stop()
+        asyncio.get_event_loop().run_until_complete(scenario())
+
+    def test_heldInputsOfPipelinedLegsAreReserved(self, monkeypatch):
+        monkeypatch.setattr(Trader, 'storeFreeBalances', staticmethod(lambda uuid, timing, balances: None))
+        monkeypatch.setattr(Trader, 'TTL_TRADEORDER_S', 2)
+
+        async def scenario():
+            venue = MockVenue('kraken')
+            venue.addMarket('ETH/BTC')
+            venue.setOrderbook('ETH/BTC', [[0.03, 100]], [[0.031, 100]])
+            venue.setBalance('ETH', 10)
+            venue.setBalance('BTC', 0.05)
+            server = MockExchange([venue])
+            await server.start()
+            client = MockExchangeClient({'id': 'kraken', 'name': 'kraken', 'urls': {'api': server.getUrl('kraken')}})
+            trader = Trader(is_sandbox_mode=False, is_pipelined_mode=True)
+            trader.sendNotification = lambda text: None
+            trader.saveSORLtoDB = lambda sorl: None
+
+            async def pollTrades():
+                pass
+            trader.pollTrades = pollTrades
+            try:
+                await trader.initExchanges({'kraken': client})
+                # the orders wait for the rate limit
+                bucket = TokenBucket(ratePerSecond=20, burst=1)
+                bucket.drain()
+                monkeypatch.setitem(trader.getRateLimiter('kraken').buckets, True, bucket)
+                deal1 = SegmentedOrderRequestList('deal1', [OrderRequestList([
+                    OrderRequest('kraken', 'ETH/BTC', volumeBase=2, limitPrice=0.03, meanPrice=0.03, requestType=OrderRequestType.SELL),
+                    OrderRequest('kraken', 'ETH/BTC', volumeBase=1, limitPrice=0.031, meanPrice=0.031, requestType=OrderRequestType.BUY)])])
+                deal2 = SegmentedOrderRequestList('deal2', [OrderRequestList([
+                    OrderRequest('kraken', 'ETH/BTC', volumeBase=1, limitPrice=0.031, meanPrice=0.031, requestType=OrderRequestType.BUY)])])
+                execution = asyncio.ensure_future(trader.execute(deal1))
+                await asyncio.sleep(0.01)
+                # the BTC held for the second leg is reserved until it's placed
+                assert trader.getBalanceLedger().getReserved('kraken', 'BTC') == pytest.approx(0.031)
+                await trader.execute(deal2)
+                assert deal2.getOrderRequests()[0].getStatus() == OrderRequestStatus.INITIAL
+
+                await execution
+                assert [orderRequest.getStatus() for orderRequest in deal1.getOrderRequests()] == \
+                    [OrderRequestStatus.CLOSED, OrderRequestStatus.CLOSED]
+                assert trader.getBalanceLedger().getNofDeals() == 0
+            finally:
+                await client.close()
+                await server.stop()
+        asyncio.get_event_loop().run_until_complete(scenario())
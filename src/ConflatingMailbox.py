@@ -0,0 +1,50 @@
+from threading import Condition
+import logging
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class ConflatingMailbox:
+    """
+        Latest-wins mailbox: only the newest item is kept per key (e.g. (exchange, symbol)),
+        so the depth of the mailbox is bounded by the number of markets, not by the burst size.
+        The consumer takes all the dirty keys at once when it is ready to process them.
+    """
+    def __init__(self):
+        self.__items = dict()
+        self.__condition = Condition()
+        self.__isClosed = False
+        self.nofReceived = 0
+        self.nofConflated = 0
+
+    def put(self, key, item):
+        with self.__condition:
+            if key in self.__items:
+                self.nofConflated += 1
+            self.__items[key] = item
+            self.nofReceived += 1
+            self.__condition.notify()
+
+    def take(self, timeout=None):
+        """
+            Blocks until there is at least one dirty key (or timeout/close) and returns
+            the dirty items as {key: item}. The mailbox is empty afterwards.
+        """
+        with self.__condition:
+            if not self.__items and not self.__isClosed:
+                self.__condition.wait(timeout)
+            items = self.__items
+            self.__items = dict()
+            return items
+
+    def close(self):
+        with self.__condition:
+            self.__isClosed = True
+            self.__condition.notify_all()
+
+    def isClosed(self):
+        return self.__isClosed
+
+    def __len__(self):
+        with self.__condition:
+            return len(self.__items)
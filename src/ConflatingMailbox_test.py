@@ -0,0 +1,47 @@
+from ConflatingMailbox import ConflatingMailbox
+from threading import Thread
+import time
+
+
+class TestClass(object):
+
+    def test_latestWins(self):
+        mailbox = ConflatingMailbox()
+        mailbox.put(('kraken', 'BTC/USD'), 1)
+        mailbox.put(('kraken', 'ETH/USD'), 2)
+        mailbox.put(('kraken', 'BTC/USD'), 3)
+        assert len(mailbox) == 2
+        assert mailbox.take() == {('kraken', 'BTC/USD'): 3, ('kraken', 'ETH/USD'): 2}
+        assert len(mailbox) == 0
+        assert mailbox.nofReceived == 3
+        assert mailbox.nofConflated == 1
+
+    def test_depthBoundedByMarkets(self):
+        mailbox = ConflatingMailbox()
+        for i in range(1000):
+            mailbox.put(('bitstamp', 'BTC/EUR'), i)
+            mailbox.put(('bitstamp', 'ETH/EUR'), i)
+        assert len(mailbox) == 2
+        assert mailbox.take()[('bitstamp', 'BTC/EUR')] == 999
+
+    def test_takeTimeout(self):
+        mailbox = ConflatingMailbox()
+        t1 = time.time()
+        assert mailbox.take(timeout=0.05) == {}
+        assert time.time() - t1 >= 0.04
+
+    def test_takeWakesUpOnPut(self):
+        mailbox = ConflatingMailbox()
+
+        def producer():
+            time.sleep(0.05)
+            mailbox.put(('gdax', 'BTC/USD'), 'book')
+
+        Thread(target=producer).start()
+        assert mailbox.take(timeout=5) == {('gdax', 'BTC/USD'): 'book'}
+
+    def test_close(self):
+        mailbox = ConflatingMailbox()
+        mailbox.close()
+        assert mailbox.isClosed() is True
+        assert mailbox.take() == {}
@@ -0,0 +1,105 @@
+import time
+
+
+class DealFinderScheduler:
+    """
+        Decides when a graph has to be searched for arbitrage deals.
+
+        The search interval adapts to the measured cost of the search (searchCostMultiplier x smoothed search
+        duration, never below minIntervalSeconds), so a worker doesn't spend all of its time searching while
+        updates are bursting. When the smoothed update interval is shorter than a search, the interval is stretched
+        by their ratio, so every search takes a batch of updates instead of starting stale on the next one.
+        When updates arrive slower than the interval the first unsearched update is
+        searched immediately. In every case a search is guaranteed to run at most maxDelaySeconds after the
+        oldest unsearched update. The delay between that update and the start of the search is measured as
+        staleness.
+    """
+    # updates arriving at the same time don't stretch the interval to infinity
+    MIN_UPDATE_INTERVAL_S = 1e-6
+
+    def __init__(self,
+                 minIntervalSeconds=0.05,
+                 maxDelaySeconds=0.25,
+                 searchCostMultiplier=2.0,
+                 smoothingFactor=0.2,
+                 clock=time.time):
+        self.minIntervalSeconds = minIntervalSeconds
+        self.maxDelaySeconds = max(maxDelaySeconds, minIntervalSeconds)
+        self.searchCostMultiplier = searchCostMultiplier
+        self.smoothingFactor = smoothingFactor
+        self.clock = clock
+
+        self.searchCostSeconds = None
+        self.updateIntervalSeconds = None
+        self.timeOfLastUpdate = None
+        self.timeOfLastSearch = None
+        self.timeOfOldestPendingUpdate = None
+
+        self.nofSearches = 0
+        self.lastStalenessSeconds = 0
+        self.maxStalenessSeconds = 0
+        self.sumStalenessSeconds = 0
+
+    def __smooth(self, average, sample):
+        if average is None:
+            return sample
+        return average + self.smoothingFactor * (sample - average)
+
+    def getIntervalSeconds(self):
+        interval = self.minIntervalSeconds
+        if self.searchCostSeconds is not None:
+            interval = max(interval, self.searchCostMultiplier * self.searchCostSeconds)
+            if self.updateIntervalSeconds is not None and self.updateIntervalSeconds < self.searchCostSeconds:
+                # updates arrive faster than a search finishes
+                interval *= self.searchCostSeconds / max(self.updateIntervalSeconds, DealFinderScheduler.MIN_UPDATE_INTERVAL_S)
+        return min(interval, self.maxDelaySeconds)
+
+    def isPending(self):
+        return self.timeOfOldestPendingUpdate is not None
+
+    def onUpdate(self, now=None):
+        if now is None:
+            now = self.clock()
+        if self.timeOfLastUpdate is not None:
+            self.updateIntervalSeconds = self.__smooth(self.updateIntervalSeconds, now - self.timeOfLastUpdate)
+        self.timeOfLastUpdate = now
+        if self.timeOfOldestPendingUpdate is None:
+            self.timeOfOldestPendingUpdate = now
+
+    def getTimeOfNextSearch(self):
+        if self.timeOfOldestPendingUpdate is None:
+            return None
+        if self.timeOfLastSearch is None:
+            return self.timeOfOldestPendingUpdate
+        timeOfNextSearch = max(self.timeOfLastSearch + self.getIntervalSeconds(), self.timeOfOldestPendingUpdate)
+        return min(timeOfNextSearch, self.timeOfOldestPendingUpdate + self.maxDelaySeconds)
+
+    def isSearchDue(self, now=None):
+        if self.timeOfOldestPendingUpdate is None:
+            return False
+        if now is None:
+            now = self.clock()
+        return now >= self.getTimeOfNextSearch()
+
+    def getWaitTimeout(self, now=None):
+        """ Time until the next search is due, None if there are no unsearched updates """
+        timeOfNextSearch = self.getTimeOfNextSearch()
+        if timeOfNextSearch is None:
+            return None
+        if now is None:
+            now = self.clock()
+        return max(0, timeOfNextSearch - now)
+
+    def onSearch(self, timeOfSearchStart, timeOfSearchEnd):
+        staleness = max(0, timeOfSearchStart - self.timeOfOldestPendingUpdate) if self.timeOfOldestPendingUpdate is not None else 0
+        self.lastStalenessSeconds = staleness
+        self.maxStalenessSeconds = max(self.maxStalenessSeconds, staleness)
+        self.sumStalenessSeconds += staleness
+        self.nofSearches += 1
+
+        self.searchCostSeconds = self.__smooth(self.searchCostSeconds, timeOfSearchEnd - timeOfSearchStart)
+        self.timeOfLastSearch = timeOfSearchStart
+        self.timeOfOldestPendingUpdate = None
+
+    def getMeanStalenessSeconds(self):
+        return self.sumStalenessSeconds / self.nofSearches if self.nofSearches else 0
@@ -0,0 +1,68 @@
+from DealFinderScheduler import DealFinderScheduler
+
+
+class TestClass(object):
+
+    def test_firstUpdateIsSearchedImmediately(self):
+        scheduler = DealFinderScheduler(minIntervalSeconds=0.05, maxDelaySeconds=0.25)
+        assert scheduler.isSearchDue(now=10) is False
+        assert scheduler.getWaitTimeout(now=10) is None
+        scheduler.onUpdate(now=10)
+        assert scheduler.isSearchDue(now=10) is True
+        scheduler.onSearch(10, 10.01)
+        assert scheduler.isPending() is False
+        assert scheduler.lastStalenessSeconds == 0
+
+    def test_updateInsideWindowIsSearchedWhenWindowEnds(self):
+        scheduler = DealFinderScheduler(minIntervalSeconds=0.05, maxDelaySeconds=0.25)
+        scheduler.onUpdate(now=10)
+        scheduler.onSearch(10, 10.001)
+        scheduler.onUpdate(now=10.02)
+        assert scheduler.isSearchDue(now=10.02) is False
+        assert abs(scheduler.getWaitTimeout(now=10.02) - 0.03) < 1e-9
+        assert scheduler.isSearchDue(now=10.05) is True
+        scheduler.onSearch(10.05, 10.051)
+        assert abs(scheduler.lastStalenessSeconds - 0.03) < 1e-9
+
+    def test_intervalAdaptsToSearchCost(self):
+        scheduler = DealFinderScheduler(minIntervalSeconds=0.01, maxDelaySeconds=0.25, searchCostMultiplier=2, smoothingFactor=1)
+        scheduler.onUpdate(now=0)
+        scheduler.onSearch(0, 0.05)
+        assert scheduler.getIntervalSeconds() == 0.1
+        scheduler.onUpdate(now=0.06)
+        assert scheduler.isSearchDue(now=0.09) is False
+        assert scheduler.isSearchDue(now=0.1) is True
+
+    def test_intervalStretchedByUpdateRate(self):
+        scheduler = DealFinderScheduler(minIntervalSeconds=0.01, maxDelaySeconds=1, searchCostMultiplier=2, smoothingFactor=1)
+        scheduler.onUpdate(now=0)
+        scheduler.onSearch(0, 0.02)
+        assert abs(scheduler.getIntervalSeconds() - 0.04) < 1e-9
+        scheduler.onUpdate(now=0.03)
+        scheduler.onUpdate(now=0.04)
+        # an update every 0.01 s, a search takes 0.02 s
+        assert abs(scheduler.getIntervalSeconds() - 0.08) < 1e-9
+        assert scheduler.isSearchDue(now=0.07) is False
+        assert scheduler.isSearchDue(now=0.08) is True
+
+    def test_delayIsBounded(self):
+        scheduler = DealFinderScheduler(minIntervalSeconds=0.01, maxDelaySeconds=0.2, searchCostMultiplier=2, smoothingFactor=1)
+        scheduler.onUpdate(now=0)
+        scheduler.onSearch(0, 1)  # very expensive search
+        assert scheduler.getIntervalSeconds() == 0.2
+        scheduler.onUpdate(now=1.0)
+        assert scheduler.getTimeOfNextSearch() == 1.0
+        scheduler.onSearch(1.0, 2.0)
+        scheduler.onUpdate(now=1.1)
+        assert scheduler.getTimeOfNextSearch() <= 1.1 + 0.2
+
+    def test_stalenessMetrics(self):
+        scheduler = DealFinderScheduler(minIntervalSeconds=0.1, maxDelaySeconds=0.25, smoothingFactor=1)
+        scheduler.onUpdate(now=0)
+        scheduler.onSearch(0, 0)
+        scheduler.onUpdate(now=0.02)
+        scheduler.onUpdate(now=0.04)
+        scheduler.onSearch(0.1, 0.1)
+        assert abs(scheduler.maxStalenessSeconds - 0.08) < 1e-9
+        assert abs(scheduler.getMeanStalenessSeconds() - 0.04) < 1e-9
+        assert abs(scheduler.updateIntervalSeconds - 0.02) < 1e-9
@@ -0,0 +1,54 @@
+from ArbitragePath import ArbitragePath
+from OrderBook import OrderBookPrice, Asset
+
+
+class DealRecord:
+    """
+        Compact fixed-schema arbitrage deal for cross-process transfer (graph workers -> deal processor).
+        Instead of pickling the ArbitragePath object graph (Asset and OrderBookPrice objects) only plain tuples
+        are transferred:
+            nodes: ((exchange, symbol), ...)
+            legs:  ((timestamp, meanPrice, limitPrice, volumeBase, volumeQuote, volumeBTC, feeRate, timeToLive), ...)
+        The ArbitragePath is rebuilt lazily on the receiving side.
+    """
+    __slots__ = ('timestamp', 'nodes', 'legs', '_path')
+
+    def __init__(self, timestamp, nodes, legs):
+        self.timestamp = timestamp
+        self.nodes = nodes
+        self.legs = legs
+        self._path = None
+
+    def __reduce__(self):
+        return DealRecord, (self.timestamp, self.nodes, self.legs)
+
+    @staticmethod
+    def fromArbitragePath(path):
+        return DealRecord(
+            timestamp=path.timestamp,
+            nodes=tuple((node.getExchange(), node.getSymbol()) for node in path.nodesList),
+            legs=tuple((orderBookPrice.timestamp,
+                        orderBookPrice.meanPrice,
+                        orderBookPrice.limitPrice,
+                        orderBookPrice.volumeBase,
+                        orderBookPrice.volumeQuote,
+                        orderBookPrice.volumeBTC,
+                        orderBookPrice.feeRate,
+                        orderBookPrice.timeToLive) for orderBookPrice in path.orderBookPriceList))
+
+    def getPath(self):
+        if self._path is None:
+            self._path = ArbitragePath(
+                nodesList=[Asset(exchange=exchange, symbol=symbol) for exchange, symbol in self.nodes],
+                timestamp=self.timestamp,
+                orderBookPriceList=[OrderBookPrice(
+                    timestamp=timestamp,
+                    meanPrice=meanPrice,
+                    limitPrice=limitPrice,
+                    volumeBase=volumeBase,
+                    volumeQuote=volumeQuote,
+                    volumeBTC=volumeBTC,
+                    feeRate=feeRate,
+                    timeToLive=timeToLive)
+                    for timestamp, meanPrice, limitPrice, volumeBase, volumeQuote, volumeBTC, feeRate, timeToLive in self.legs])
+        return self._path
@@ -0,0 +1,37 @@
+from DealRecord import DealRecord
+from ArbitragePath import ArbitragePath
+from OrderBook import OrderBookPrice, Asset
+import pickle
+
+
+def getArbitragePath():
+    return ArbitragePath(
+        nodesList=[Asset('kraken', 'BTC'), Asset('kraken', 'USD'), Asset('bitstamp', 'USD'), Asset('bitstamp', 'BTC'), Asset('kraken', 'BTC')],
+        timestamp=12,
+        orderBookPriceList=[
+            OrderBookPrice(timestamp=10, meanPrice=9000, limitPrice=8990, volumeBase=1, volumeQuote=9000, volumeBTC=1, feeRate=0.002, timeToLive=5),
+            OrderBookPrice(timestamp=None, meanPrice=1, limitPrice=1, volumeBase=None, volumeBTC=None, feeRate=0),
+            OrderBookPrice(timestamp=11, meanPrice=1 / 8800, limitPrice=1 / 8810, volumeBase=9000, volumeQuote=1, volumeBTC=1, feeRate=0.0025, timeToLive=5),
+            OrderBookPrice(timestamp=None, meanPrice=1, limitPrice=1, volumeBase=None, volumeBTC=None, feeRate=0)])
+
+
+class TestClass(object):
+
+    def test_roundTrip(self):
+        path = getArbitragePath()
+        dealRecord = pickle.loads(pickle.dumps(DealRecord.fromArbitragePath(path)))
+        rebuiltPath = dealRecord.getPath()
+
+        assert rebuiltPath.getLogJSON() == path.getLogJSON()
+        assert rebuiltPath.getProfit() == path.getProfit()
+        assert rebuiltPath.getAge() == path.getAge()
+        assert str(rebuiltPath) == str(path)
+
+    def test_pathIsRebuiltLazilyOnce(self):
+        dealRecord = pickle.loads(pickle.dumps(DealRecord.fromArbitragePath(getArbitragePath())))
+        assert dealRecord._path is None
+        assert dealRecord.getPath() is dealRecord.getPath()
+
+    def test_compactPickle(self):
+        path = getArbitragePath()
+        assert len(pickle.dumps(DealRecord.fromArbitragePath(path))) < len(pickle.dumps(path)) / 2
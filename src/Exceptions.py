@@ -31,3 +31,14 @@ class OrderErrorByExchange(Exception):
 
     def __str__(self):
         return str(self.value)
+
+
+"""
+    The balance needed by a deal is not available: free balance minus the reservations of the deals in progress
+"""
+class BalanceReservationError(ValueError):
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return str(self.value)
@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class FWLiveConfig:
+    """
+        Exchange and symbol universe of FrameworkLive, read from a JSON file (config/frameworklive.json):
+        enabled exchanges and their symbols, volume tiers, TTLs and datasources. The symbol lists are
+        deduplicated when loaded, they are validated against the markets of the venues at startup.
+    """
+    DEFAULT_PATH = os.path.dirname(os.path.realpath(__file__)) + '/../config/frameworklive.json'
+    DATASOURCES = ['localpollers', 'kafkalocal', 'kafkaaws']
+
+    def __init__(self, config):
+        self.datasource = config.get('datasource', 'localpollers')
+        if self.datasource not in FWLiveConfig.DATASOURCES:
+            raise ValueError('Invalid datasource in config: ' + str(self.datasource))
+
+        self.vol_BTC = FWLiveConfig.getPositiveNumbers(config, 'vol_BTC')
+        self.edge_ttl = FWLiveConfig.getPositiveNumbers(config, 'edge_ttl')
+        self.price_ttl = FWLiveConfig.getPositiveNumbers(config, 'price_ttl')
+
+        self.symbols = {}
+        for exchange, exchangeConfig in config.get('exchanges', {}).items():
+            if exchangeConfig.get('enabled', True) is not True:
+                continue
+            self.symbols[exchange] = FWLiveConfig.getSymbols(exchange, exchangeConfig.get('symbols', []))
+
+        self.streams = config.get('streams', [])
+        for exchange in self.streams:
+            if exchange not in self.symbols:
+                raise ValueError('Streamed exchange is not enabled in config: ' + str(exchange))
+
+        self.is_coinmarketcap_enabled = config.get('coinmarketcap', {}).get('enabled', True) is True
+        self.is_forex_enabled = config.get('forex', {}).get('enabled', True) is True
+        self.forex_symbols = FWLiveConfig.getSymbols('forex', config.get('forex', {}).get('symbols', []))
+        self.is_sfox_enabled = config.get('sfox', {}).get('enabled', True) is True
+        self.sfox_symbols = FWLiveConfig.getSymbols('sfox', config.get('sfox', {}).get('symbols', []))
+
+    @staticmethod
+    def load(path=None):
+        with open(path if path is not None else FWLiveConfig.DEFAULT_PATH) as file:
+            return FWLiveConfig(json.load(file))
+
+    @staticmethod
+    def getPositiveNumbers(config, key):
+        if key not in config:
+            raise ValueError('Missing %s in config' % key)
+        value = config[key]
+        numbers = value if isinstance(value, list) else [value]
+        if not numbers or any(isinstance(number, bool) or not isinstance(number, (int, float)) or number <= 0 for number in numbers):
+            raise ValueError('Invalid %s in config: %s' % (key, str(value)))
+        return value
+
+    @staticmethod
+    def getSymbols(exchange, symbols):
+        """ Symbols without duplicates, in the order of the config """
+        if not isinstance(symbols, list) or not all(isinstance(symbol, str) for symbol in symbols):
+            raise ValueError('Invalid symbol list of %s in config' % exchange)
+        uniqueSymbols = list(dict.fromkeys(symbols))
+        if len(uniqueSymbols) < len(symbols):
+            logger.warning('Duplicate symbols of %s in config are ignored' % exchange)
+        return uniqueSymbols
+
+    @staticmethod
+    def filterSymbols(symbols, markets):
+        """ (symbols listed by the venue, unknown symbols) """
+        return [symbol for symbol in symbols if symbol in markets], [symbol for symbol in symbols if symbol not in markets]
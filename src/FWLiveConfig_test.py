@@ -0,0 +1,56 @@
+from FWLiveConfig import FWLiveConfig
+import pytest
+
+
+def getConfig(**kwargs):
+    config = {
+        'datasource': 'localpollers',
+        'vol_BTC': [0.025, 0.05],
+        'edge_ttl': 1,
+        'price_ttl': 600,
+        'exchanges': {
+            'kraken': {'enabled': True, 'symbols': ['BTC/USD', 'BTC/EUR', 'BTC/USD']},
+            'bitstamp': {'enabled': False, 'symbols': ['BTC/EUR']}
+        },
+        'streams': ['kraken'],
+        'forex': {'enabled': False, 'symbols': ['EUR_USD']}
+    }
+    config.update(kwargs)
+    return config
+
+
+class TestClass(object):
+    def test_defaultConfig(self):
+        config = FWLiveConfig.load()
+        assert config.datasource == 'localpollers'
+        assert config.vol_BTC == [0.025, 0.05, 0.5]
+        assert set(config.symbols.keys()) == {'coinfloor', 'kraken', 'bittrex', 'gdax', 'bitstamp', 'poloniex'}
+        for symbols in config.symbols.values():
+            assert len(symbols) == len(set(symbols))
+
+    def test_enabledExchangesAndDuplicates(self):
+        config = FWLiveConfig(getConfig())
+        assert config.symbols == {'kraken': ['BTC/USD', 'BTC/EUR']}
+        assert config.streams == ['kraken']
+        assert config.is_forex_enabled is False
+        assert config.is_coinmarketcap_enabled is True
+
+    def test_invalidConfig(self):
+        with pytest.raises(ValueError):
+            FWLiveConfig(getConfig(datasource='ftp'))
+        with pytest.raises(ValueError):
+            FWLiveConfig(getConfig(vol_BTC=[0.1, -1]))
+        with pytest.raises(ValueError):
+            FWLiveConfig(getConfig(edge_ttl='1'))
+        with pytest.raises(ValueError):
+            FWLiveConfig(getConfig(streams=['bitstamp']))
+        with pytest.raises(ValueError):
+            FWLiveConfig(getConfig(exchanges={'kraken': {'symbols': 'BTC/USD'}}))
+        config = getConfig()
+        del config['price_ttl']
+        with pytest.raises(ValueError):
+            FWLiveConfig(config)
+
+    def test_filterSymbols(self):
+        assert FWLiveConfig.filterSymbols(['BTC/USD', 'LSK/ETH', 'ETH/BTC'], {'BTC/USD': {}, 'ETH/BTC': {}}) == \
+            (['BTC/USD', 'ETH/BTC'], ['LSK/ETH'])
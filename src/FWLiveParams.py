@@ -12,6 +12,11 @@ class FWLiveParams:
     datasource_localpollers = 1
     datasource_kafka_local = 2
     datasource_kafka_aws = 3
+    datasource_names = {
+        'localpollers': datasource_localpollers,
+        'kafkalocal': datasource_kafka_local,
+        'kafkaaws': datasource_kafka_aws
+    }
 
     output_logfiles = 1
     output_kafkalocal = 2
@@ -41,7 +46,20 @@ class FWLiveParams:
                  neo4j_mode=neo4j_mode_disabled,
                  dealfinder_mode=dealfinder_mode_networkx,
                  datasource=datasource_localpollers,
-                 output=output_logfiles):
+                 output=output_logfiles,
+                 nof_graph_workers=None,
+                 exchange_clusters=None,
+                 metrics_port=9100,
+                 kafka_lag_policy='seek_to_end',
+                 kafka_max_lag_messages=1000,
+                 kafka_max_delay_ms=1000,
+                 streaming_exchanges=None,
+                 config=None,
+                 record_dir=None,
+                 replay_dir=None,
+                 replay_speed=None,
+                 mock_exchange_url=None,
+                 is_pipelined_mode=False):
         self.enable_plotting = enable_plotting
         self.is_sandbox_mode = is_sandbox_mode
         self.is_forex_enabled = is_forex_enabled
@@ -51,6 +69,26 @@ class FWLiveParams:
         self.dealfinder_mode = dealfinder_mode
         self.datasource= datasource
         self.output=output
+        self.nof_graph_workers = nof_graph_workers
+        self.exchange_clusters = exchange_clusters
+        self.metrics_port = metrics_port
+        self.kafka_lag_policy = kafka_lag_policy
+        self.kafka_max_lag_messages = kafka_max_lag_messages
+        self.kafka_max_delay_ms = kafka_max_delay_ms
+        # local pollers: exchanges fed by websocket streams instead of REST polling
+        self.streaming_exchanges = streaming_exchanges if streaming_exchanges is not None else []
+        # FWLiveConfig, config/frameworklive.json if None
+        self.config = config
+        # market data capture directory, None disables the recorder
+        self.record_dir = record_dir
+        # capture directory replayed instead of the datasources (sandbox, inline deal finder)
+        self.replay_dir = replay_dir
+        # None: as fast as possible, 1: event time
+        self.replay_speed = replay_speed
+        # local MockExchange serving the enabled exchanges, e.g. http://127.0.0.1:8090
+        self.mock_exchange_url = mock_exchange_url
+        # the orders of a segment are placed as soon as their input is available, not after the previous one is CLOSED
+        self.is_pipelined_mode = is_pipelined_mode
 
     @staticmethod
     def getNeo4jCredentials():
@@ -11,6 +11,11 @@ class FeeStore:
 
     def __init__(self):
         self.exchanges = {}
+        # (exchangename, symbol): taker fee, e.g. the fees recorded with the replayed market data
+        self.takerFees = {}
+
+    def setTakerFee(self, exchangename, symbols, fee):
+        self.takerFees[(exchangename, symbols)] = fee
 
     def getExchange(self, exchangename):
         if exchangename in self.exchanges:
@@ -27,6 +32,9 @@ class FeeStore:
             return FeeStore.DEFAULT_TAKER_FEE
 
     def getTakerFee(self, exchangename, symbols):
+        fee = self.takerFees.get((exchangename, symbols))
+        if fee is not None:
+            return fee
         if exchangename == 'oanda': # TODO: refactor
             return 0.0
         elif exchangename == 'sfox': # TODO: refactor
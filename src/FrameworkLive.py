@@ -1,5 +1,6 @@
 #!/usr/bin/python
 
+import os
 import sys
 import signal
 import getopt
@@ -7,10 +8,6 @@ import asyncio
 import aiohttp
 
 import ccxt.async_support as ccxt
-import numpy as np
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
 import time
 from OrderbookAnalyser import OrderbookAnalyser
 from Trader import Trader
@@ -19,131 +16,164 @@ import datetime
 from InitLogger import logger
 import json
 from FWLiveParams import FWLiveParams
+from FWLiveConfig import FWLiveConfig
+from Metrics import getRegistry
+from MetricsServer import MetricsServer
+from KafkaOrderbookBatch import KafkaOrderbookBatch
+from LagPolicy import LagPolicy
+from OrderbookPoller import OrderbookPoller
+from RateLimiter import RateLimiter
+from StreamingDatasource import KrakenStream, CoinbaseProStream, BitstampStream
 #import ptvsd
-from aiokafka import AIOKafkaConsumer
 import logging
-import dateutil
 import websockets
+from utilities import parseIsoTimestamp
 
 logger = logging.getLogger('CryptoArbitrageApp')
 
 class FrameworkLive:
+    KAFKA_BATCH_TIMEOUT_MS = 100
+    KAFKA_BATCH_MAX_RECORDS = 500
+    # larger batches while catching up in LagPolicy.MODE_CONFLATE
+    KAFKA_CATCHUP_BATCH_MAX_RECORDS = 5000
+    OANDA_POLL_INTERVAL_SECONDS = 0.5
+    OANDA_MAX_CONNECTIONS = 2
+    OANDA_KEEPALIVE_SECONDS = 60
+    # websocket datasources replacing the REST pollers, by exchange
+    STREAMING_DATASOURCES = {
+        'kraken': KrakenStream,
+        'bitstamp': BitstampStream,
+        'gdax': CoinbaseProStream
+    }
+
     def __init__(self, frameworklive_parameters):
-        self.exchanges = {}
-        self.symbols = {}
         self.parameters = frameworklive_parameters
-        self.exchanges["poloniex"] = ccxt.poloniex({'enableRateLimit': True})
-        self.exchanges["kraken"] = ccxt.kraken({'enableRateLimit': True})
-        self.exchanges["coinfloor"] = ccxt.coinfloor({'enableRateLimit': True})
-        self.exchanges["bitstamp"] = ccxt.bitstamp({'enableRateLimit': True})
-        self.exchanges["gdax"] = ccxt.gdax({'enableRateLimit': True})
-        self.exchanges["bittrex"] = ccxt.bittrex({'enableRateLimit': True})
-
-        self.symbols['coinfloor'] = [
-            'BTC/EUR', 'BTC/EUR', 'BCH/GBP', 'BTC/GBP', 'BTC/USD'
-        ]
-        self.symbols['kraken'] = [
-            'BTC/USD', 'BTC/EUR', 'BTC/USD', 'BCH/USD', 'XRP/USD', 'LTC/EUR',
-            'LTC/USD', 'ETH/BTC', 'BCH/BTC', 'XRP/BTC'
-        ]
-        self.symbols['bittrex'] = [
-            'XRP/BTC', 'BTC/USD', 'BCH/BTC', 'BTC/USD', 'LTC/BTC', 'XRP/ETH',
-            'BCH/ETH', 'ETH/BTC', 'LTC/ETH', 'BCH/USDT'
-        ]
-        self.symbols['gdax'] = [
-            'BCH/BTC', 'BTC/EUR', 'LTC/EUR', 'BTC/USD', 'BTC/EUR', 'ETH/USD',
-            'ETH/EUR', 'BCH/EUR', 'ETH/BTC', 'BCH/USD'
-        ]
-        self.symbols['bitstamp'] = [
-            'BTC/EUR', 'ETH/BTC', 'BTC/USD', 'ETH/USD', 'BCH/EUR', 'BCH/BTC',
-            'LTC/EUR', 'ETH/EUR', 'XRP/BTC', 'LTC/BTC'
-        ]
-        self.symbols['poloniex'] = [
-            'BCH/BTC', 'XRP/BTC', 'LTC/BTC', 'ETH/BTC', 'BCH/ETH', 'ETC/BTC',
-            'ETC/ETH', 'LSK/ETH', 'LSK/BTC', 'LTC/USDT'
-        ]
+        self.config = self.parameters.config if self.parameters.config is not None else FWLiveConfig.load()
+        # the ccxt clients are created on first use, only for the enabled exchanges
+        self.exchanges = {}
+        self.symbols = self.config.symbols
+        self.orderbookPollers = {}
+        self.streams = {}
 
         if self.parameters.enable_plotting is True:
-            plt.figure(1)
-            plt.plot(1, 2)
-            plt.ion()
-            plt.show()
-            plt.pause(0.001)
+            # matplotlib and its GUI backend are only loaded for plotting
+            from ArbitrageGraphPlot import ArbitrageGraphPlot
+            ArbitrageGraphPlot.init()
 
         self.arbTradeTriggerEvent = Condition()
         self.arbTradeQueue = []
 
-        self.cmc = ccxt.coinmarketcap({'enableRateLimit': True})
-        self.trader = Trader(is_sandbox_mode=frameworklive_parameters.is_sandbox_mode)
+        self.cmc = None
+        self.clock = time.time
+        nofGraphWorkers = self.parameters.nof_graph_workers
+        if self.parameters.replay_dir is not None:
+            # deterministic replay: simulated clock, inline deal finder, trades never executed
+            from MarketDataReplay import SimulatedClock
+            self.clock = SimulatedClock()
+            nofGraphWorkers = 0
+            self.parameters.is_sandbox_mode = True
+        self.trader = Trader(is_sandbox_mode=frameworklive_parameters.is_sandbox_mode,
+                             is_pipelined_mode=frameworklive_parameters.is_pipelined_mode)
+
+        self.marketDataRecorder = None
+        if self.parameters.record_dir is not None:
+            # numpy is only loaded for recording
+            from MarketDataRecorder import MarketDataRecorder
+            captureDirectory = MarketDataRecorder.createSessionDirectory(self.parameters.record_dir)
+            self.marketDataRecorder = MarketDataRecorder(captureDirectory)
+            logger.info('Recording market data to ' + captureDirectory)
 
         kafkaCredentials=self.parameters.getKafkaProducerCredentials()
         self.orderbookAnalyser = OrderbookAnalyser(
-            vol_BTC=[0.025, 0.05, 0.5], # TODO : this should be configurable
-            edgeTTL=1,
-            priceTTL=600,
+            vol_BTC=self.config.vol_BTC,
+            edgeTTL=self.config.edge_ttl,
+            priceTTL=self.config.price_ttl,
             resultsdir=self.parameters.results_dir,
             priceSource=OrderbookAnalyser.PRICE_SOURCE_CMC,
             trader=self.trader,
             neo4j_mode=self.parameters.neo4j_mode,
             dealfinder_mode=self.parameters.dealfinder_mode,
-            kafkaCredentials=kafkaCredentials)
-
-    async def pollOrderbook(self, exchange, symbols):
-        i = 0
-        while True:
-            symbol = symbols[i % len(symbols)]
-            try:
-                yield (symbol, await exchange.fetch_order_book(
-                    symbol, limit=20))
-            except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-                logger.error('Fetch orderbook network/exchange error ' + exchange.name + " " + symbol + ": " + type(error).__name__ + " " + str(error.args))
-            except Exception as error:
-                logger.error('Fetch orderbook error ' + exchange.name + " " + symbol + ": " + type(error).__name__ + " " + str(error.args))
+            kafkaCredentials=kafkaCredentials,
+            nofGraphWorkers=nofGraphWorkers,
+            exchangeClusters=self.parameters.exchange_clusters,
+            marketDataRecorder=self.marketDataRecorder,
+            clock=self.clock)
+        self.orderbookAnalyser.addDealListener(self.onDeal)
+
+        self.metrics = getRegistry()
+        self.feedDelayHistograms = {}
+        self.metricsServer = None
+        if self.parameters.metrics_port is not None:
+            self.metricsServer = MetricsServer(
+                registry=self.metrics,
+                port=self.parameters.metrics_port,
+                collectors=[self.orderbookAnalyser.collectMetrics, self.collectTraderMetrics],
+                statusProvider=self.getStatus)
+
+    def collectTraderMetrics(self):
+        self.metrics.gauge('trader_busy').set(1 if self.trader.isBusy() else 0)
+        self.metrics.gauge('trader_active_deals').set(self.trader.getNofActiveDeals())
+        self.metrics.gauge('trader_sandbox_mode').set(1 if self.trader.isSandboxMode() else 0)
+        self.metrics.gauge('trader_exchanges').set(len(self.trader.getExchangeNames()))
+        for rateLimiter in list(RateLimiter.instances.values()):
+            rateLimiter.collectMetrics(self.metrics)
+
+    def getStatus(self):
+        return {
+            'uptimeSeconds': (datetime.datetime.now() - self.orderbookAnalyser.timestamp_start).total_seconds(),
+            'graphWorkers': self.orderbookAnalyser.getGraphWorkerLoadMetrics(),
+            'rejectedOrderbooks': self.orderbookAnalyser.getRejectionCounters(),
+            'trader': {
+                'busy': self.trader.isBusy(),
+                'activeDeals': self.trader.getNofActiveDeals(),
+                'sandboxMode': self.trader.isSandboxMode(),
+                'exchanges': self.trader.getExchangeNames()
+            }
+        }
 
-            i += 1
-            await asyncio.sleep(exchange.rateLimit / 1000)
+    def recordFeedDelay(self, exchangename, delayMs):
+        try:
+            histogram = self.feedDelayHistograms[exchangename]
+        except KeyError:
+            histogram = self.feedDelayHistograms[exchangename] = self.metrics.histogram('feed_delay', exchange=exchangename)
+        histogram.record(delayMs * 1000000)
 
     async def pollForex(self,symbols, authkey,accountid):
-        i = 0
-        while True:
-            symbol = symbols[i % len(symbols)]
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(
-                            url="https://api-fxpractice.oanda.com/v3/accounts/"+accountid+"/pricing",
-                            headers={'Authorization': ('Bearer ' + authkey)},
-                            params='instruments=' + symbol) as resp:
+        # one keep-alive connection, all the instruments are priced by a single request
+        connector = aiohttp.TCPConnector(limit=FrameworkLive.OANDA_MAX_CONNECTIONS, keepalive_timeout=FrameworkLive.OANDA_KEEPALIVE_SECONDS)
+        async with aiohttp.ClientSession(
+                connector=connector,
+                headers={'Authorization': ('Bearer ' + authkey)}) as session:
+            url = "https://api-fxpractice.oanda.com/v3/accounts/"+accountid+"/pricing"
+            params = {'instruments': ','.join(symbols)}
+            while True:
+                try:
+                    async with session.get(url=url, params=params) as resp:
+                        resp.raise_for_status()
                         yield (await resp.json())
-            except Exception as error:
-                logger.error("Error while fetching forex rates from Oanda: " + type(error).__name__ + " " + str(error.args))
-                
-            i += 1
-            await asyncio.sleep(0.5)
+                except Exception as error:
+                    logger.error("Error while fetching forex rates from Oanda: " + type(error).__name__ + " " + str(error.args))
+
+                await asyncio.sleep(FrameworkLive.OANDA_POLL_INTERVAL_SECONDS)
 
     async def forexPoller(self,symbols, authkey, accountid, orderbookAnalyser):
         async for ticker in self.pollForex(symbols=symbols, authkey=authkey,accountid=accountid):
-            try:
-                symbolBase = ticker['prices'][0]['instrument'].split("_")[0]
-                symbolQuote = ticker['prices'][0]['instrument'].split("_")[1]
-                asks = ticker['prices'][0]['asks']
-                bids = ticker['prices'][0]['bids']
-                payload = {}
-                payload['exchange'] = "oanda"
-                payload['symbol'] = symbolBase + "/" + symbolQuote
-                payload['data'] = {}
-                payload['data']['asks'] = [[float(asks[0]['price']),asks[0]['liquidity']]]
-                payload['data']['bids'] = [[float(bids[0]['price']),bids[0]['liquidity']]]
-                payload['timestamp'] = time.mktime(dateutil.parser.parse(ticker['time']).timetuple())
-                logger.info("Received " + symbolBase+"/"+ symbolQuote + " from Oanda")
-                orderbookAnalyser.update(
-                    exchangename="oanda",
-                    symbol=payload['symbol'],
-                    bids=payload['data']['bids'],
-                    asks=payload['data']['asks'],
-                    timestamp=payload['timestamp'])
+            for price in ticker.get('prices', []):
+                try:
+                    symbolBase, symbolQuote = price['instrument'].split("_")
+                    asks = price['asks']
+                    bids = price['bids']
+                    symbol = symbolBase + "/" + symbolQuote
+                    logger.info("Received " + symbol + " from Oanda")
+                    orderbookAnalyser.update(
+                        exchangename="oanda",
+                        symbol=symbol,
+                        bids=[[float(bids[0]['price']),bids[0]['liquidity']]],
+                        asks=[[float(asks[0]['price']),asks[0]['liquidity']]],
+                        timestamp=parseIsoTimestamp(price['time']))
 
-            except Exception as error:
-                logger.error("Error interpreting Oanda ticker: " + type(error).__name__ + " " + str(error.args))
+                except Exception as error:
+                    logger.error("Error interpreting Oanda ticker: " + type(error).__name__ + " " + str(error.args))
 
     async def sfoxWebSocket(self,symbols,orderbookAnalyser):
         async with websockets.connect('wss://ws.sfox.com/ws') as ws:
@@ -190,6 +220,7 @@ class FrameworkLive:
         symbols = ['USD', 'BTC', 'ETH', 'EUR', 'GBP']
         while True:
             symbol_quote = symbols[i % len(symbols)]
+            await RateLimiter.forExchange(cmc).acquire(RateLimiter.PRIORITY_MARKET_DATA, isPrivate=False)
             try:
                 yield (await cmc.fetch_tickers(
                     symbol_quote, params={
@@ -202,15 +233,42 @@ class FrameworkLive:
                 logger.error("Fetch tickers from coinmarketcap generic exception: " + type(error).__name__ + " " + str(error.args))
 
             i += 1
-            await asyncio.sleep(cmc.rateLimit / 1000)
 
     async def coinmarketcapPoller(self, cmc, orderbookAnalyser):
         async for ticker in self.pollCoinmarketcap(cmc):
             logger.info("Received prices from coinmarketcap")
             orderbookAnalyser.updateCoinmarketcapPrice(ticker)
 
+    def getExchange(self, exchangeid):
+        try:
+            return self.exchanges[exchangeid]
+        except KeyError:
+            # the orderbook requests are scheduled by the token buckets of the OrderbookPollers
+            exchange = self.exchanges[exchangeid] = self.createExchange(exchangeid, {'enableRateLimit': False})
+            return exchange
+
+    def createExchange(self, exchangeid, config):
+        """ ccxt client of the exchange, or of its venue on the mock exchange if --mockexchange is set """
+        if self.parameters.mock_exchange_url is None:
+            return getattr(ccxt, exchangeid)(config)
+        from MockExchangeClient import MockExchangeClient
+        return MockExchangeClient(dict(config, id=exchangeid, name=exchangeid,
+                                       urls={'api': self.parameters.mock_exchange_url.rstrip('/') + '/' + exchangeid}))
+
+    async def getValidSymbols(self, exchange, symbols):
+        """ The symbols of the config listed by the venue, all of them if its markets can't be loaded """
+        try:
+            await exchange.load_markets()
+        except Exception as error:
+            logger.warning('Symbols of %s could not be validated: %s %s' % (exchange.name, type(error).__name__, str(error.args)))
+            return symbols
+        validSymbols, unknownSymbols = FWLiveConfig.filterSymbols(symbols, exchange.markets)
+        if unknownSymbols:
+            logger.error('Symbols not listed by %s are ignored: %s' % (exchange.name, ','.join(unknownSymbols)))
+        return validSymbols
+
     async def exchangePoller(self, exchange, symbols,orderbookAnalyser: OrderbookAnalyser,enablePlotting):
-        async for (symbol, order_book) in self.pollOrderbook(exchange, symbols):
+        def onOrderbook(symbol, order_book):
             logger.info("Received " + symbol + " from " + exchange.name)
             try:
                 orderbookAnalyser.update(
@@ -224,7 +282,34 @@ class FrameworkLive:
             if enablePlotting:
                 orderbookAnalyser.plotGraphs()
 
+        symbols = await self.getValidSymbols(exchange, symbols)
+        if not symbols:
+            return
+        orderbookPoller = OrderbookPoller(exchange=exchange, symbols=symbols, onOrderbook=onOrderbook)
+        self.orderbookPollers[exchange.name] = orderbookPoller
+        await orderbookPoller.run()
+
+    async def exchangeStream(self, exchangeid, symbols, orderbookAnalyser: OrderbookAnalyser):
+        exchange = self.getExchange(exchangeid)
+        symbols = await self.getValidSymbols(exchange, symbols)
+        if not symbols:
+            return
+        # the graph nodes keep the ccxt name of the exchange
+        stream = FrameworkLive.STREAMING_DATASOURCES[exchangeid](
+            symbols=symbols,
+            onOrderbook=orderbookAnalyser.update,
+            exchangename=exchange.name)
+        self.streams[exchangeid] = stream
+        await stream.run()
+
+    def onDeal(self, path):
+        # the markets traded by recent deals are polled more often
+        for node, nextNode in zip(path.nodesList[:-1], path.nodesList[1:]):
+            if node.getExchange() == nextNode.getExchange() and node.getExchange() in self.orderbookPollers:
+                self.orderbookPollers[node.getExchange()].recordDealByCurrencies(node.getSymbol(), nextNode.getSymbol())
+
     async def kafkaConsumer(self):
+        from aiokafka import AIOKafkaConsumer
 
         cred=self.parameters.getKafkaConsumerCredentials()
         topic = cred['topic']
@@ -232,44 +317,93 @@ class FrameworkLive:
         group_id = cred['group_id']
 
         loop = asyncio.get_event_loop()
+        # the payloads are decoded once per batch by KafkaOrderbookBatch
         consumer = AIOKafkaConsumer(
             topic,
             loop=loop,
             bootstrap_servers=kafka_server,
             group_id=group_id,
             auto_offset_reset='latest',
-            enable_auto_commit=False,
-            value_deserializer=lambda m: json.loads(m.decode('utf-8')))
-        
+            enable_auto_commit=False)
+
+        lagPolicy = LagPolicy(
+            mode=self.parameters.kafka_lag_policy,
+            maxLagMessages=self.parameters.kafka_max_lag_messages,
+            maxDelayMs=self.parameters.kafka_max_delay_ms)
+
+        nofMessages = self.metrics.counter('kafka_messages')
+        nofInvalid = self.metrics.counter('kafka_messages_invalid')
+        nofConflated = self.metrics.counter('kafka_messages_conflated')
+        nofSkipped = self.metrics.counter('kafka_messages_skipped')
+        nofStale = self.metrics.counter('kafka_orderbooks_stale')
+        nofSeeks = self.metrics.counter('kafka_partition_seeks')
+
         # Get cluster layout and join group
         await consumer.start()
         try:
             # Consume messages
-            async for msg in consumer:
-                try:
-                    payload = json.loads(msg.value)
-                    if payload['exchange'] == 'coinmarketcap':
-                        logger.info("Received Coinmarketcap sample " + payload['symbol'] + ' producer timestamp [ms]:' + str(payload['timestamp']) + ' (delay [ms]:'+str(time.time()*1000-float(payload['timestamp']))+')')
-                        self.orderbookAnalyser.updateCoinmarketcapPrice(payload['data'])
-                    else:
-                        delay = time.time()*1000-float(payload['timestamp'])
-                        if delay > 1000:
-                            logger.warning("Received " + payload['symbol'] + " from " + payload[
-                                'exchange'] + ' with high delay! producer timestamp [ms]:' + str(
-                                payload['timestamp']) + ' (delay [ms]:' + str(delay) + ')')
-                        else:
-                            logger.info("Received " + payload['symbol'] + " from " + payload['exchange'] + ' producer timestamp [ms]:' + str(payload['timestamp']) + ' (delay [ms]:'+str(delay)+')')
-
-                        self.orderbookAnalyser.update(
-                            exchangename=payload['exchange'],
-                            symbol=payload['symbol'],
-                            bids=payload['data']['bids'],
-                            asks=payload['data']['asks'],
-                            timestamp=payload['timestamp']/1000)
-                except Exception as e:
-                    logger.warning('Error parsing Kafka JSON:'+str(e))
-                # TODO : last resort solution: drop frames that cannot be processed
-                #await consumer.seek_to_end()
+            while True:
+                messagesByPartition = await consumer.getmany(
+                    timeout_ms=FrameworkLive.KAFKA_BATCH_TIMEOUT_MS,
+                    max_records=FrameworkLive.KAFKA_CATCHUP_BATCH_MAX_RECORDS if lagPolicy.isBehind() else FrameworkLive.KAFKA_BATCH_MAX_RECORDS)
+                if not messagesByPartition:
+                    continue
+
+                # per-partition lag, the backlog of the lagging partitions is skipped in seek to end mode
+                seekPartitions = []
+                for partition, messages in messagesByPartition.items():
+                    if not messages:
+                        continue
+                    highwater = consumer.highwater(partition)
+                    action = lagPolicy.onBatch(partition, messages[-1].offset, highwater)
+                    if highwater is not None:
+                        self.metrics.gauge('kafka_consumer_lag', partition=str(partition.partition)).set(lagPolicy.lags[partition])
+                    if action == LagPolicy.ACTION_SEEK_TO_END:
+                        seekPartitions.append(partition)
+
+                batch = KafkaOrderbookBatch()
+                batch.addMessages(messagesByPartition, skippedPartitions=seekPartitions)
+                nofMessages.inc(batch.nofMessages)
+                nofConflated.inc(batch.nofConflated)
+                nofSkipped.inc(batch.nofSkipped)
+
+                if seekPartitions:
+                    await consumer.seek_to_end(*seekPartitions)
+                    nofSeeks.inc(len(seekPartitions))
+
+                # a malformed message is dropped, the rest of the batch is processed
+                for ticker in batch.getCoinmarketcapTickers():
+                    try:
+                        self.orderbookAnalyser.updateCoinmarketcapPrice(ticker)
+                    except Exception as e:
+                        nofInvalid.inc()
+                        logger.warning('Error processing Kafka coinmarketcap ticker:' + str(e))
+
+                updates = batch.getOrderbookUpdates()
+                nofInvalid.inc(batch.nofInvalid)
+
+                timestampNow = time.time()
+                maxDelayMs = 0
+                for exchangename, symbol, bids, asks, timestamp in updates:
+                    delayMs = lagPolicy.getDelayMs(timestamp, timestampNow)
+                    self.recordFeedDelay(exchangename, delayMs)
+                    maxDelayMs = max(maxDelayMs, delayMs)
+
+                # books that are seconds old are never fed to the deal finder, their edges are invalidated instead
+                updates, staleMarkets = lagPolicy.splitStale(updates, timestampNow)
+                nofStale.inc(len(staleMarkets))
+                staleMarkets = set(staleMarkets) | batch.skippedMarkets
+                if staleMarkets:
+                    self.orderbookAnalyser.invalidateMarkets(staleMarkets)
+
+                if maxDelayMs > lagPolicy.maxDelayMs or seekPartitions:
+                    logger.warning('Received %d messages (%d orderbooks fed, %d markets invalidated) with high delay/lag! max delay [ms]:%d'
+                                   % (batch.nofMessages, len(updates), len(staleMarkets), maxDelayMs))
+                else:
+                    logger.info('Received %d messages (%d orderbooks after conflation), max delay [ms]:%d'
+                                % (batch.nofMessages, len(updates), maxDelayMs))
+
+                self.orderbookAnalyser.updateBatch(updates)
 
         except Exception as e:
             logger.error('Kafka consumer failed '+str(e))
@@ -280,41 +414,79 @@ class FrameworkLive:
 
     async def asyncRun(self):
 
-        await self.trader.initExchangesFromAWSParameterStore()
+        if self.metricsServer is not None:
+            try:
+                await self.metricsServer.start()
+            except OSError as e:
+                logger.error('Metrics endpoint could not be started: ' + str(e))
+
+        if self.parameters.replay_dir is not None:
+            await self.replay()
+            return
+
+        if self.parameters.mock_exchange_url is not None:
+            await self.trader.initExchanges({exchange: self.createExchange(exchange, {}) for exchange in self.symbols.keys()})
+        else:
+            await self.trader.initExchangesFromAWSParameterStore()
+        asyncio.ensure_future(self.trader.runBalanceReconciliation())
 
         # start local pollers if selected as datasource 
         if self.parameters.datasource is FWLiveParams.datasource_localpollers:
-            for exchange in self.exchanges.keys():
+            for exchange in self.symbols.keys():
+                if exchange in self.parameters.streaming_exchanges:
+                    asyncio.ensure_future(
+                        self.exchangeStream(
+                            exchangeid=exchange,
+                            symbols=self.symbols[exchange],
+                            orderbookAnalyser=self.orderbookAnalyser))
+                    continue
                 asyncio.ensure_future(
                     self.exchangePoller(
-                        exchange=self.exchanges[exchange],
+                        exchange=self.getExchange(exchange),
                         symbols=self.symbols[exchange],
                         orderbookAnalyser=self.orderbookAnalyser,
                         enablePlotting=self.parameters.enable_plotting))
 
-            asyncio.ensure_future(
-                self.coinmarketcapPoller(self.cmc, self.orderbookAnalyser))
-
-            #TODO: add if self.parameters.is_forex_enabled is True:
-            oandaCredentials=FWLiveParams.getOandaCredentials()
-            asyncio.ensure_future(
-                self.forexPoller(
-                    symbols=['EUR_USD', 'GBP_USD', 'EUR_GBP'],
-                    authkey=oandaCredentials['apikey'],
-                    accountid=oandaCredentials['accountid'],
-                    orderbookAnalyser=self.orderbookAnalyser))
-
-            #TODO: add parameter to make sfox configurable
-            asyncio.ensure_future(
-                self.sfoxWebSocket(
-                    symbols=["bchbtc","bchusd","ethbtc","btcusd","ethusd"],
-                    orderbookAnalyser=self.orderbookAnalyser))
-            
+            if self.config.is_coinmarketcap_enabled is True:
+                self.cmc = ccxt.coinmarketcap({'enableRateLimit': True})
+                asyncio.ensure_future(
+                    self.coinmarketcapPoller(self.cmc, self.orderbookAnalyser))
+
+            if self.parameters.is_forex_enabled is True and self.config.is_forex_enabled is True:
+                oandaCredentials=FWLiveParams.getOandaCredentials()
+                asyncio.ensure_future(
+                    self.forexPoller(
+                        symbols=self.config.forex_symbols,
+                        authkey=oandaCredentials['apikey'],
+                        accountid=oandaCredentials['accountid'],
+                        orderbookAnalyser=self.orderbookAnalyser))
+
+            if self.config.is_sfox_enabled is True:
+                asyncio.ensure_future(
+                    self.sfoxWebSocket(
+                        symbols=self.config.sfox_symbols,
+                        orderbookAnalyser=self.orderbookAnalyser))
+
         # start kafka consumer if selected as datasource 
         if self.parameters.datasource is FWLiveParams.datasource_kafka_local or self.parameters.datasource is FWLiveParams.datasource_kafka_aws:
             asyncio.ensure_future(self.kafkaConsumer())
 
 
+    async def replay(self):
+        """ Feeds the analyser from a capture instead of the datasources and stops when it's replayed """
+        from MarketDataReplay import MarketDataReplay
+        marketDataReplay = MarketDataReplay(
+            directory=self.parameters.replay_dir,
+            orderbookAnalyser=self.orderbookAnalyser,
+            clock=self.clock,
+            speed=self.parameters.replay_speed)
+        try:
+            stats = await marketDataReplay.run()
+            logger.info('Replayed %d events of %.1f s in %.1f s' % (stats['events'], stats['eventSeconds'], stats['wallSeconds']))
+        except Exception as e:
+            logger.error('Market data replay failed: ' + str(e))
+        asyncio.get_event_loop().stop()
+
     def run(self):
 
         asyncio.ensure_future(self.asyncRun())
@@ -335,7 +507,7 @@ signal.signal(signal.SIGINT, signal_handler)
 def main(argv):
     frameworklive_parameters = FWLiveParams()
     try:
-        opts, _ = getopt.getopt(argv, "nrodpslfe",
+        opts, _ = getopt.getopt(argv, "nrodpslfegcmkwxyzqtu",
                                 ["enableplotting",
                                  "resultsdir=",
                                  "neo4jmode=",
@@ -344,7 +516,18 @@ def main(argv):
                                  "datasource=",
                                  "live",
                                  "noforex",
-                                 "remotedebug"])
+                                 "remotedebug",
+                                 "graphworkers=",
+                                 "exchangeclusters=",
+                                 "metricsport=",
+                                 "lagpolicy=",
+                                 "streams=",
+                                 "config=",
+                                 "recorddir=",
+                                 "replay=",
+                                 "replayspeed=",
+                                 "mockexchange=",
+                                 "pipelined"])
     except getopt.GetoptError:
         logger.error(
             'Invalid parameter(s) entered. List of valid parameters:\n'
@@ -364,11 +547,42 @@ def main(argv):
             ' --neo4jmode =   local: connect to neo4j running on localhost\n'
             '                 aws: connect to neo4j running in AWS\n'
             ' --remotedebug: enable remote debugging\n'
+            ' --graphworkers = N: number of deal finder processes (default: number of cores)\n'
+            ' --exchangeclusters = kraken,bitstamp;poloniex,bittrex: independent exchange clusters, each\n'
+            '                 cluster gets its own graph per volume tier (default: one cluster)\n'
+            ' --metricsport = port: local HTTP endpoint serving /metrics (Prometheus) and /status,\n'
+            '                 0 disables the endpoint (default: 9100)\n'
+            ' --lagpolicy =   seek_to_end: lagging kafka partitions skip their backlog (default)\n'
+            '                 conflate: lagging kafka partitions catch up with large conflated batches\n'
+            ' --streams =     kraken,bitstamp,gdax: exchanges fed by websocket streams instead of REST polling\n'
+            ' --config =      path: exchanges, symbols, volume tiers, TTLs and datasources\n'
+            '                 (default: config/frameworklive.json), the other parameters override it\n'
+            ' --recorddir =   path: record the orderbooks and prices fed to the analyser (capture-* directories)\n'
+            ' --replay =      path: replay a capture directory instead of the datasources and exit (sandbox)\n'
+            ' --replayspeed = X: replay X times faster than event time (default: as fast as possible)\n'
+            ' --mockexchange = url: the pollers and the trader use the local mock exchange (tools/mockExchangeServer.py)\n'
+            ' --pipelined:    the next order of a segment is placed as soon as the fills of the previous one cover it\n'
         )
         sys.exit(2)
     except Exception as error:
         logger.error('Generic exception whilst parsing console arguments '+ str(error.args))
 
+    configPath = None
+    for opt, arg in opts:
+        if opt in ("-x", "--config"):
+            configPath = arg
+    try:
+        config = FWLiveConfig.load(configPath)
+    except (OSError, ValueError) as error:
+        logger.error('Invalid config: ' + type(error).__name__ + ' ' + str(error.args))
+        return
+    if not set(config.streams) <= set(FrameworkLive.STREAMING_DATASOURCES.keys()):
+        logger.error('Invalid streaming exchange in config')
+        return
+    frameworklive_parameters.config = config
+    frameworklive_parameters.datasource = FWLiveParams.datasource_names[config.datasource]
+    frameworklive_parameters.streaming_exchanges = config.streams
+
     for opt, arg in opts:
         if opt in ("-n", "--enableplotting"):
             frameworklive_parameters.enable_plotting = True
@@ -427,6 +641,67 @@ def main(argv):
         if opt in ("-e", "--noforex"):
             frameworklive_parameters.remoteDebuggingEnabled = False
 
+        if opt in ("-g", "--graphworkers"):
+            try:
+                frameworklive_parameters.nof_graph_workers = int(arg)
+            except ValueError:
+                logger.error('Invalid number of graph workers in parameter')
+                return
+
+        if opt in ("-c", "--exchangeclusters"):
+            frameworklive_parameters.exchange_clusters = [
+                cluster.split(',') for cluster in arg.split(';') if cluster]
+
+        if opt in ("-m", "--metricsport"):
+            try:
+                port = int(arg)
+            except ValueError:
+                logger.error('Invalid metrics port in parameter')
+                return
+            frameworklive_parameters.metrics_port = port if port > 0 else None
+
+        if opt in ("-k", "--lagpolicy"):
+            if arg not in [LagPolicy.MODE_SEEK_TO_END, LagPolicy.MODE_CONFLATE]:
+                logger.error('Invalid kafka lag policy in parameter')
+                return
+            frameworklive_parameters.kafka_lag_policy = arg
+
+        if opt in ("-y", "--recorddir"):
+            frameworklive_parameters.record_dir = arg
+
+        if opt in ("-z", "--replay"):
+            if not os.path.isdir(arg):
+                logger.error('Invalid replay directory in parameter')
+                return
+            frameworklive_parameters.replay_dir = arg
+
+        if opt in ("-q", "--replayspeed"):
+            try:
+                speed = float(arg)
+            except ValueError:
+                speed = 0
+            if speed <= 0:
+                logger.error('Invalid replay speed in parameter')
+                return
+            frameworklive_parameters.replay_speed = speed
+
+        if opt in ("-t", "--mockexchange"):
+            frameworklive_parameters.mock_exchange_url = arg
+
+        if opt in ("-u", "--pipelined"):
+            frameworklive_parameters.is_pipelined_mode = True
+
+        if opt in ("-w", "--streams"):
+            streams = [exchange for exchange in arg.split(',') if exchange]
+            if not set(streams) <= set(FrameworkLive.STREAMING_DATASOURCES.keys()) & set(config.symbols.keys()):
+                logger.error('Invalid streaming exchange in parameter')
+                return
+            frameworklive_parameters.streaming_exchanges = streams
+
+    if frameworklive_parameters.replay_dir is not None:
+        # the replayed deals are never traded
+        frameworklive_parameters.is_sandbox_mode = True
+
     if frameworklive_parameters.is_sandbox_mode is True:
         logger.info("Running in sandbox mode, TRADES WILL NOT BE EXECUTED")
     else:
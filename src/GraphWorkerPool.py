@@ -0,0 +1,310 @@
+from ArbitrageGraph import ArbitrageGraph
+from ConflatingMailbox import ConflatingMailbox
+from DealRecord import DealRecord
+from DealFinderScheduler import DealFinderScheduler
+from Metrics import MetricsRegistry, getRegistry, perf_counter_ns
+from multiprocessing import Process, Pipe, Array, Queue, cpu_count
+from threading import Thread
+import itertools
+import queue
+import logging
+import time
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class GraphShard:
+    """
+        One arbitrage graph of the deal finder: a volume tier and an independent cluster of exchanges
+        (exchanges=None means every exchange is routed to the shard).
+    """
+    def __init__(self, shardId, volumeBTC, exchanges=None):
+        self.shardId = shardId
+        self.volumeBTC = volumeBTC
+        self.exchanges = None if exchanges is None else frozenset(GraphShard.getExchangeNameStd(e) for e in exchanges)
+        self.arbitrageGraph = ArbitrageGraph()
+
+    @staticmethod
+    def getExchangeNameStd(exchangename):
+        return exchangename.lower().replace(" ", "")
+
+    def isExchangeRouted(self, exchangeNameStd):
+        return self.exchanges is None or exchangeNameStd in self.exchanges
+
+    def __str__(self):
+        return "shard #%d vol_BTC:%s exchanges:%s" % (
+            self.shardId, str(self.volumeBTC), 'all' if self.exchanges is None else ','.join(sorted(self.exchanges)))
+
+
+class StaleMarket:
+    """
+        Invalidation of the graph edges of a market, routed and conflated like an orderbook update:
+        a fresh orderbook of the market supersedes it and vice versa.
+    """
+    __slots__ = ('exchange', 'symbol')
+
+    def __init__(self, exchange, symbol):
+        self.exchange = exchange
+        self.symbol = symbol
+
+    def getExchange(self):
+        return self.exchange
+
+
+class GraphWorker:
+    """
+        Deal finder of the shards of one worker: applies the orderbook updates to the graphs and searches the
+        graphs whose DealFinderScheduler is due. The schedulers run on clock, the busy time is wall time.
+    """
+    def __init__(self, workerId, shards, dealQueue, schedulerParameters, loadMetrics, metrics, clock=time.time):
+        self.workerId = workerId
+        self.shards = shards
+        self.dealQueue = dealQueue
+        (self.nofProcessedUpdates, self.nofDealSearches, self.busyTimeSeconds, self.maxStalenessSeconds,
+         self.sumStalenessSeconds, self.nofReceivedUpdates, self.nofConflatedUpdates) = loadMetrics
+        minIntervalSeconds, maxDelaySeconds = schedulerParameters
+        self.clock = clock
+        self.schedulers = [DealFinderScheduler(minIntervalSeconds=minIntervalSeconds, maxDelaySeconds=maxDelaySeconds, clock=clock)
+                           for shard in shards]
+        # newest orderbook timestamp not searched yet, per shard
+        self.pendingTimestamps = [None] * len(shards)
+
+        self.graphUpdateLatency = metrics.histogram('stage_latency', stage='graph_update')
+        self.cycleSearchLatency = metrics.histogram('stage_latency', stage='cycle_search')
+        self.nofDealsFound = metrics.counter('deals_found')
+
+    def getWaitTimeout(self):
+        timeouts = [timeout for timeout in (scheduler.getWaitTimeout() for scheduler in self.schedulers) if timeout is not None]
+        return min(timeouts) if timeouts else None
+
+    def update(self, items, now):
+        """ items: (orderBookPair or StaleMarket, timestamp) """
+        nofItems = 0
+        for orderBookPair, timestamp in items:
+            nofItems += 1
+            exchangeNameStd = GraphShard.getExchangeNameStd(orderBookPair.getExchange())
+            if isinstance(orderBookPair, StaleMarket):
+                for shard in self.shards:
+                    if shard.isExchangeRouted(exchangeNameStd):
+                        shard.arbitrageGraph.invalidateMarket(orderBookPair.exchange, orderBookPair.symbol)
+                continue
+            for idx, shard in enumerate(self.shards):
+                if shard.isExchangeRouted(exchangeNameStd):
+                    t_start = perf_counter_ns()
+                    shard.arbitrageGraph.updatePoint(orderBookPair=orderBookPair, volumeBTC=shard.volumeBTC)
+                    self.graphUpdateLatency.record(perf_counter_ns() - t_start)
+                    if self.pendingTimestamps[idx] is None or timestamp > self.pendingTimestamps[idx]:
+                        self.pendingTimestamps[idx] = timestamp
+                    self.schedulers[idx].onUpdate(now)
+        self.nofProcessedUpdates[self.workerId] += nofItems
+
+    def search(self, idx):
+        timeOfSearchStart = self.clock()
+        t_start = perf_counter_ns()
+        path = self.shards[idx].arbitrageGraph.getArbitrageDeal(self.pendingTimestamps[idx])
+        self.cycleSearchLatency.record(perf_counter_ns() - t_start)
+        if path.isProfitable() is True:
+            self.dealQueue.put(DealRecord.fromArbitragePath(path))
+            self.nofDealsFound.inc()
+        scheduler = self.schedulers[idx]
+        scheduler.onSearch(timeOfSearchStart, self.clock())
+        self.pendingTimestamps[idx] = None
+
+        self.nofDealSearches[self.workerId] += 1
+        self.sumStalenessSeconds[self.workerId] += scheduler.lastStalenessSeconds
+        self.maxStalenessSeconds[self.workerId] = max(self.maxStalenessSeconds[self.workerId], scheduler.lastStalenessSeconds)
+
+    def step(self, items, isFlush=False):
+        """ Applies the updates and runs the due searches (all the pending ones if isFlush), returns the wall time """
+        t1 = time.time()
+        self.update(items, self.clock())
+        # only the shards with unsearched updates are searched
+        for idx in range(len(self.shards)):
+            if self.schedulers[idx].isSearchDue() or (isFlush and self.schedulers[idx].isPending()):
+                self.search(idx)
+        t2 = time.time()
+        self.busyTimeSeconds[self.workerId] += t2 - t1
+        return t2
+
+
+class GraphWorkerPool:
+    """
+        Pool of deal finder processes sized to the available cores. The work is sharded by volume tier and
+        by independent exchange clusters, shards are distributed round-robin across the workers and every
+        orderbook update is routed only to the workers hosting a shard that needs it.
+        nofWorkers=0 runs every shard inline in the calling thread on clock, without conflation: the deals
+        only depend on the order of the updates (replay, backtests).
+    """
+    METRICS_PUSH_INTERVAL_SECONDS = 5
+    def __init__(self, vol_BTC, dealQueue, nofWorkers=None, exchangeClusters=None,
+                 dealFinderRateLimitTimeSeconds=0.05, dealFinderMaxDelaySeconds=0.25, clock=time.time):
+        clusters = exchangeClusters if exchangeClusters else [None]
+        self.shards = [GraphShard(shardId=idx, volumeBTC=volumeBTC, exchanges=cluster)
+                       for idx, (volumeBTC, cluster) in enumerate(itertools.product(vol_BTC, clusters))]
+
+        if nofWorkers is None:
+            nofWorkers = cpu_count()
+        self.isInline = nofWorkers == 0
+        if nofWorkers > len(self.shards):
+            logger.info('Number of graph workers (%d) limited to the number of shards (%d)' % (nofWorkers, len(self.shards)))
+        self.nofWorkers = max(1, min(nofWorkers, len(self.shards)))
+
+        self.workerShards = [[] for idx in range(self.nofWorkers)]
+        for shard in self.shards:
+            self.workerShards[shard.shardId % self.nofWorkers].append(shard)
+
+        self.dealQueue = dealQueue
+        self.dealFinderRateLimitTimeSeconds = dealFinderRateLimitTimeSeconds
+        self.dealFinderMaxDelaySeconds = dealFinderMaxDelaySeconds
+        self.pipes = [Pipe() for idx in range(self.nofWorkers)]
+        self.routingTable = {}
+
+        # load metrics, the counters in shared memory are written by the workers only
+        self.nofRoutedUpdates = [0] * self.nofWorkers
+        self.nofProcessedUpdates = Array('L', self.nofWorkers, lock=False)
+        self.nofDealSearches = Array('L', self.nofWorkers, lock=False)
+        self.busyTimeSeconds = Array('d', self.nofWorkers, lock=False)
+        self.maxStalenessSeconds = Array('d', self.nofWorkers, lock=False)
+        self.sumStalenessSeconds = Array('d', self.nofWorkers, lock=False)
+        self.nofReceivedUpdates = Array('L', self.nofWorkers, lock=False)
+        self.nofConflatedUpdates = Array('L', self.nofWorkers, lock=False)
+        self.timestampStart = time.time()
+        # delta snapshots of the metrics registries of the workers
+        self.metricsQueue = Queue()
+
+        self.inlineWorker = None
+        if self.isInline:
+            self.inlineWorker = GraphWorker(
+                0, self.workerShards[0], self.dealQueue,
+                (self.dealFinderRateLimitTimeSeconds, self.dealFinderMaxDelaySeconds),
+                (self.nofProcessedUpdates, self.nofDealSearches, self.busyTimeSeconds,
+                 self.maxStalenessSeconds, self.sumStalenessSeconds,
+                 self.nofReceivedUpdates, self.nofConflatedUpdates),
+                getRegistry(), clock=clock)
+            logger.info('Graph worker running inline: ' + '; '.join(str(shard) for shard in self.shards))
+            self.processes = []
+            return
+
+        self.processes = [
+            Process(target=GraphWorkerPool.workerProcess,
+                    args=(workerId, self.workerShards[workerId], self.pipes[workerId], self.dealQueue,
+                          (self.dealFinderRateLimitTimeSeconds, self.dealFinderMaxDelaySeconds),
+                          (self.nofProcessedUpdates, self.nofDealSearches, self.busyTimeSeconds,
+                           self.maxStalenessSeconds, self.sumStalenessSeconds,
+                           self.nofReceivedUpdates, self.nofConflatedUpdates),
+                          self.metricsQueue))
+            for workerId in range(self.nofWorkers)]
+
+        for workerId, shards in enumerate(self.workerShards):
+            logger.info('Graph worker #%d: %s' % (workerId, '; '.join(str(shard) for shard in shards)))
+
+    def start(self):
+        for process in self.processes:
+            process.daemon = True
+            process.start()
+
+    def getWorkersForExchange(self, exchangename):
+        try:
+            return self.routingTable[exchangename]
+        except KeyError:
+            exchangeNameStd = GraphShard.getExchangeNameStd(exchangename)
+            workers = [workerId for workerId, shards in enumerate(self.workerShards)
+                       if any(shard.isExchangeRouted(exchangeNameStd) for shard in shards)]
+            self.routingTable[exchangename] = workers
+            return workers
+
+    def routeInline(self, item):
+        if self.getWorkersForExchange(item[0].getExchange()):
+            self.nofRoutedUpdates[0] += 1
+            self.nofReceivedUpdates[0] += 1
+            self.inlineWorker.step((item,))
+
+    def poll(self):
+        """ Inline mode: runs the searches that became due on the clock """
+        if self.isInline:
+            self.inlineWorker.step(())
+
+    def flush(self):
+        """ Inline mode: runs every pending search """
+        if self.isInline:
+            self.inlineWorker.step((), isFlush=True)
+
+    def route(self, orderBookPair, timestamp):
+        if self.isInline:
+            self.routeInline((orderBookPair, timestamp))
+            return
+        for workerId in self.getWorkersForExchange(orderBookPair.getExchange()):
+            self.pipes[workerId][1].send((orderBookPair, timestamp))
+            self.nofRoutedUpdates[workerId] += 1
+
+    def invalidate(self, exchangename, symbol, timestamp=None):
+        staleMarket = StaleMarket(exchangename, symbol)
+        if self.isInline:
+            self.routeInline((staleMarket, timestamp))
+            return
+        for workerId in self.getWorkersForExchange(exchangename):
+            self.pipes[workerId][1].send((staleMarket, timestamp))
+            self.nofRoutedUpdates[workerId] += 1
+
+    def getLoadMetrics(self):
+        elapsed = max(time.time() - self.timestampStart, 1e-9)
+        return [{
+            'worker': workerId,
+            'shards': [shard.shardId for shard in self.workerShards[workerId]],
+            'routedUpdates': self.nofRoutedUpdates[workerId],
+            'pipeBacklog': max(0, self.nofRoutedUpdates[workerId] - self.nofReceivedUpdates[workerId]),
+            'conflatedUpdates': self.nofConflatedUpdates[workerId],
+            'processedUpdates': self.nofProcessedUpdates[workerId],
+            'dealSearches': self.nofDealSearches[workerId],
+            'busyTimeSeconds': self.busyTimeSeconds[workerId],
+            'utilisation': self.busyTimeSeconds[workerId] / elapsed,
+            'maxStalenessSeconds': self.maxStalenessSeconds[workerId],
+            'meanStalenessSeconds': self.sumStalenessSeconds[workerId] / self.nofDealSearches[workerId] if self.nofDealSearches[workerId] else 0
+        } for workerId in range(self.nofWorkers)]
+
+    def collectMetrics(self, metricsRegistry):
+        """ Merges the metrics pushed by the workers so far into metricsRegistry """
+        while True:
+            try:
+                snapshot = self.metricsQueue.get_nowait()
+            except queue.Empty:
+                return
+            metricsRegistry.merge(snapshot)
+
+    def terminate(self):
+        for process in self.processes:
+            process.terminate()
+
+    @staticmethod
+    def pipeReceiverThread(p_output, mailbox):
+        # Drain the pipe as fast as possible, superseded orderbooks are conflated in the mailbox
+        while True:
+            try:
+                orderBookPair, timestamp = p_output.recv()    # Read from the output pipe
+            except (EOFError, OSError):
+                mailbox.close()
+                return
+            mailbox.put((orderBookPair.getExchange(), orderBookPair.symbol), (orderBookPair, timestamp))
+
+    @staticmethod
+    def workerProcess(workerId, shards, pipe, dealQueue, schedulerParameters, loadMetrics, metricsQueue):
+        p_output, p_input = pipe
+        mailbox = ConflatingMailbox()
+        receiverThread = Thread(target=GraphWorkerPool.pipeReceiverThread, args=(p_output, mailbox))
+        receiverThread.daemon = True
+        receiverThread.start()
+
+        metrics = MetricsRegistry()
+        worker = GraphWorker(workerId, shards, dealQueue, schedulerParameters, loadMetrics, metrics)
+        timeOfNextMetricsPush = time.time() + GraphWorkerPool.METRICS_PUSH_INTERVAL_SECONDS
+
+        while mailbox.isClosed() is False:
+            # wake up for the next due search even if no update arrives
+            dirtyItems = mailbox.take(timeout=worker.getWaitTimeout())
+            worker.nofReceivedUpdates[workerId] = mailbox.nofReceived
+            worker.nofConflatedUpdates[workerId] = mailbox.nofConflated
+            t2 = worker.step(dirtyItems.values())
+
+            if t2 >= timeOfNextMetricsPush:
+                metricsQueue.put(metrics.snapshot(reset=True))
+                timeOfNextMetricsPush = t2 + GraphWorkerPool.METRICS_PUSH_INTERVAL_SECONDS
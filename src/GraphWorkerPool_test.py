@@ -0,0 +1,66 @@
+from GraphWorkerPool import GraphWorkerPool, GraphShard
+from OrderBook import OrderBookPair
+from multiprocessing import Queue
+import queue
+import pytest
+
+
+def getOrderBookPair(exchange, symbol, bids, asks, rateBTCxBase, rateBTCxQuote, timestamp):
+    return OrderBookPair(
+        timestamp=timestamp,
+        symbol=symbol,
+        exchange=exchange,
+        asks=asks,
+        bids=bids,
+        rateBTCxBase=rateBTCxBase,
+        rateBTCxQuote=rateBTCxQuote,
+        feeRate=0,
+        timeToLiveSec=30)
+
+
+class TestClass(object):
+
+    def test_shardsByVolumeAndCluster(self):
+        pool = GraphWorkerPool(vol_BTC=[0.1, 1], dealQueue=Queue(), nofWorkers=16,
+                               exchangeClusters=[['Kraken', 'bitstamp'], ['poloniex']])
+        assert len(pool.shards) == 4
+        assert pool.nofWorkers == 4
+        assert [(shard.volumeBTC, shard.exchanges) for shard in pool.shards] == [
+            (0.1, frozenset(['kraken', 'bitstamp'])), (0.1, frozenset(['poloniex'])),
+            (1, frozenset(['kraken', 'bitstamp'])), (1, frozenset(['poloniex']))]
+
+    def test_routing(self):
+        pool = GraphWorkerPool(vol_BTC=[0.1, 1], dealQueue=Queue(), nofWorkers=2,
+                               exchangeClusters=[['kraken'], ['poloniex', 'Coinbase Pro']])
+        assert pool.workerShards == [[pool.shards[0], pool.shards[2]], [pool.shards[1], pool.shards[3]]]
+        assert pool.getWorkersForExchange('Kraken') == [0]
+        assert pool.getWorkersForExchange('Coinbase Pro') == [1]
+        assert pool.getWorkersForExchange('bittrex') == []
+
+    def test_singleClusterRoutesEverywhere(self):
+        pool = GraphWorkerPool(vol_BTC=[0.025, 0.05, 0.5], dealQueue=Queue(), nofWorkers=2)
+        assert pool.nofWorkers == 2
+        assert pool.getWorkersForExchange('anything') == [0, 1]
+        assert GraphShard(shardId=0, volumeBTC=1).isExchangeRouted('kraken') is True
+
+    def test_dealFound(self):
+        dealQueue = Queue()
+        pool = GraphWorkerPool(vol_BTC=[1], dealQueue=dealQueue, nofWorkers=1, dealFinderRateLimitTimeSeconds=0)
+        pool.start()
+        try:
+            pool.route(getOrderBookPair('kraken', 'BTC/USD', [[9000, 10]], [[10000, 10]], 1, 9500, 0), 0)
+            pool.route(getOrderBookPair('kraken', 'ETH/USD', [[100, 1000]], [[200, 1000]], 4.5, 9500, 1), 1)
+            pool.route(getOrderBookPair('kraken', 'BTC/ETH', [[4, 100]], [[5, 100]], 1, 4.5, 2), 2)
+            path = dealQueue.get(timeout=10).getPath()
+            assert path.isProfitable() is True
+            while True:
+                try:
+                    dealQueue.get(timeout=0.5)
+                except queue.Empty:
+                    break
+            metrics = pool.getLoadMetrics()
+            assert metrics[0]['routedUpdates'] == 3
+            assert metrics[0]['processedUpdates'] == 3
+            assert metrics[0]['dealSearches'] >= 1
+        finally:
+            pool.terminate()
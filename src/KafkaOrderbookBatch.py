@@ -0,0 +1,103 @@
+import json
+import logging
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class KafkaOrderbookBatch:
+    """
+        One getmany() batch of the orderbook stream. Every payload is decoded exactly once and the snapshots
+        of the same (exchange, symbol) are conflated to the newest one, so the analyser is fed only the
+        latest state of every market in the batch.
+    """
+    EXCHANGE_COINMARKETCAP = 'coinmarketcap'
+
+    def __init__(self):
+        self.orderbooks = {}
+        self.coinmarketcapTickers = {}
+        self.nofMessages = 0
+        self.nofInvalid = 0
+        self.nofConflated = 0
+        self.nofSkipped = 0
+        # markets of the skipped messages
+        self.skippedMarkets = set()
+        # last consumed offset per partition
+        self.offsets = {}
+
+    @staticmethod
+    def decodePayload(value):
+        payload = json.loads(value.decode('utf-8') if isinstance(value, bytes) else value)
+        # legacy producers encode the JSON document twice
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        return payload
+
+    def add(self, message, partition=None, isSkipped=False):
+        self.nofMessages += 1
+        if partition is not None:
+            self.offsets[partition] = message.offset
+        try:
+            payload = KafkaOrderbookBatch.decodePayload(message.value)
+            exchangename = payload['exchange']
+            key = (exchangename, payload['symbol'])
+            timestamp = float(payload['timestamp'])
+        except Exception as e:
+            self.nofInvalid += 1
+            logger.warning('Error parsing Kafka JSON:' + str(e))
+            return
+
+        if isSkipped is True:
+            self.nofSkipped += 1
+            if exchangename != KafkaOrderbookBatch.EXCHANGE_COINMARKETCAP:
+                self.skippedMarkets.add(key)
+            return
+
+        if exchangename == KafkaOrderbookBatch.EXCHANGE_COINMARKETCAP:
+            snapshots = self.coinmarketcapTickers
+        else:
+            snapshots = self.orderbooks
+
+        previous = snapshots.get(key)
+        if previous is not None:
+            self.nofConflated += 1
+            if float(previous['timestamp']) > timestamp:
+                return
+        snapshots[key] = payload
+
+    def addMessages(self, messagesByPartition, skippedPartitions=()):
+        """
+            messagesByPartition: the dict returned by getmany(), {TopicPartition: [ConsumerRecord, ...]}
+            skippedPartitions: the messages of these partitions are dropped, only their markets are collected
+        """
+        for partition, messages in messagesByPartition.items():
+            isSkipped = partition in skippedPartitions
+            for message in messages:
+                self.add(message, partition, isSkipped)
+
+    def getOrderbookUpdates(self):
+        """ [(exchange, symbol, bids, asks, timestamp [s]), ...], the producer timestamps are in ms """
+        updates = []
+        for payload in self.orderbooks.values():
+            try:
+                updates.append((payload['exchange'],
+                                payload['symbol'],
+                                payload['data']['bids'],
+                                payload['data']['asks'],
+                                float(payload['timestamp']) / 1000))
+            except Exception as e:
+                self.nofInvalid += 1
+                logger.warning('Error parsing Kafka orderbook payload:' + str(e))
+        return updates
+
+    def getCoinmarketcapTickers(self):
+        tickers = []
+        for payload in self.coinmarketcapTickers.values():
+            try:
+                tickers.append(payload['data'])
+            except Exception as e:
+                self.nofInvalid += 1
+                logger.warning('Error parsing Kafka coinmarketcap payload:' + str(e))
+        return tickers
+
+    def getPayloads(self):
+        return list(self.coinmarketcapTickers.values()) + list(self.orderbooks.values())
@@ -0,0 +1,65 @@
+from KafkaOrderbookBatch import KafkaOrderbookBatch
+from collections import namedtuple
+import json
+
+Message = namedtuple('Message', ['offset', 'value'])
+
+
+def getPayload(exchange, symbol, timestamp, bid=9000):
+    return {'exchange': exchange, 'symbol': symbol, 'timestamp': timestamp,
+            'data': {'bids': [[bid, 1]], 'asks': [[bid + 1, 1]]}}
+
+
+class TestClass(object):
+
+    def test_decodePayload(self):
+        payload = getPayload('kraken', 'BTC/USD', 1000)
+        assert KafkaOrderbookBatch.decodePayload(json.dumps(payload).encode('utf-8')) == payload
+        # legacy double-encoded payload
+        assert KafkaOrderbookBatch.decodePayload(json.dumps(json.dumps(payload)).encode('utf-8')) == payload
+
+    def test_conflation(self):
+        batch = KafkaOrderbookBatch()
+        batch.addMessages({
+            'p0': [Message(10, json.dumps(getPayload('kraken', 'BTC/USD', 1000, bid=1)).encode('utf-8')),
+                   Message(11, json.dumps(getPayload('kraken', 'BTC/USD', 3000, bid=3)).encode('utf-8')),
+                   Message(12, json.dumps(getPayload('kraken', 'ETH/USD', 1000)).encode('utf-8')),
+                   Message(13, b'not json')],
+            'p1': [Message(5, json.dumps(json.dumps(getPayload('kraken', 'BTC/USD', 2000, bid=2))).encode('utf-8')),
+                   Message(6, json.dumps({'exchange': 'coinmarketcap', 'symbol': 'USD', 'timestamp': 1, 'data': {'BTC/USD': {}}}).encode('utf-8'))]
+        })
+
+        assert batch.nofMessages == 6
+        assert batch.nofInvalid == 1
+        assert batch.nofConflated == 2
+        assert batch.offsets == {'p0': 13, 'p1': 6}
+        assert sorted(batch.getOrderbookUpdates()) == [
+            ('kraken', 'BTC/USD', [[3, 1]], [[4, 1]], 3.0),
+            ('kraken', 'ETH/USD', [[9000, 1]], [[9001, 1]], 1.0)]
+        assert batch.getCoinmarketcapTickers() == [{'BTC/USD': {}}]
+
+    def test_skippedPartitions(self):
+        batch = KafkaOrderbookBatch()
+        batch.addMessages({
+            'p0': [Message(10, json.dumps(getPayload('kraken', 'BTC/USD', 1000)).encode('utf-8'))],
+            'p1': [Message(20, json.dumps(getPayload('kraken', 'ETH/USD', 1000)).encode('utf-8')),
+                   Message(21, json.dumps(getPayload('kraken', 'ETH/USD', 2000)).encode('utf-8'))]
+        }, skippedPartitions=['p1'])
+
+        assert batch.nofSkipped == 2
+        assert batch.skippedMarkets == {('kraken', 'ETH/USD')}
+        assert batch.offsets == {'p0': 10, 'p1': 21}
+        assert [update[:2] for update in batch.getOrderbookUpdates()] == [('kraken', 'BTC/USD')]
+
+    def test_malformedTickerIsDropped(self):
+        batch = KafkaOrderbookBatch()
+        batch.addMessages({
+            'p0': [Message(1, json.dumps({'exchange': 'coinmarketcap', 'symbol': 'USD', 'timestamp': 1}).encode('utf-8')),
+                   Message(2, json.dumps({'exchange': 'coinmarketcap', 'symbol': 'EUR', 'timestamp': 1, 'data': {'BTC/EUR': {}}}).encode('utf-8')),
+                   Message(3, json.dumps({'exchange': 'kraken', 'symbol': 'BTC/USD', 'timestamp': 1000}).encode('utf-8')),
+                   Message(4, json.dumps(getPayload('kraken', 'ETH/USD', 1000)).encode('utf-8'))]
+        })
+
+        assert batch.getCoinmarketcapTickers() == [{'BTC/EUR': {}}]
+        assert [update[:2] for update in batch.getOrderbookUpdates()] == [('kraken', 'ETH/USD')]
+        assert batch.nofInvalid == 2
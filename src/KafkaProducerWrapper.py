@@ -0,0 +1,115 @@
+from Metrics import getRegistry
+import asyncio
+import logging
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class KafkaProducerWrapper:
+    """
+        Publishes the arbitrage deals to the Kafka deal stream. publish() may be called from any thread, the
+        deal is JSON-encoded once in the calling thread and handed over to a bounded queue on the event loop.
+        A single publisher task feeds the queue into the producer, which batches (linger time) and compresses
+        the messages without waiting for the broker round trip of every deal. When the queue is full the deal
+        is dropped and counted instead of piling up tasks on the event loop.
+    """
+    MAX_QUEUE_SIZE = 1000
+    LINGER_MS = 50
+    COMPRESSION_TYPE = 'gzip'
+
+    def __init__(self, kafkaCredentials, eventLoop,
+                 maxQueueSize=MAX_QUEUE_SIZE, lingerMs=LINGER_MS, compressionType=COMPRESSION_TYPE):
+        self.kafkaProducer = None
+        self.eventLoop = eventLoop
+        self.queue = None
+        self.publisherTask = None
+
+        metrics = getRegistry()
+        self.nofQueued = metrics.counter('kafka_deals_queued')
+        self.nofDropped = metrics.counter('kafka_deals_dropped')
+        self.nofPublished = metrics.counter('kafka_deals_published')
+        self.nofFailed = metrics.counter('kafka_deals_failed')
+
+        if kafkaCredentials is not None:
+            self.topic = kafkaCredentials["topicDeals"]
+            try:
+                self.kafkaProducer = self.createProducer(kafkaCredentials, lingerMs, compressionType)
+                self.queue = asyncio.Queue(maxsize=maxQueueSize)
+                self.publisherTask = asyncio.ensure_future(self.publisher(), loop=self.eventLoop)
+            except Exception as e:
+                logger.error('Kafka producer initialization failed: ' + str(e))
+                self.kafkaProducer = None
+        else:
+            logger.info('No credentials available for Kafka producer')
+
+    def createProducer(self, kafkaCredentials, lingerMs, compressionType):
+        from aiokafka import AIOKafkaProducer
+        return AIOKafkaProducer(
+            loop=self.eventLoop,
+            bootstrap_servers=kafkaCredentials["uri"],
+            linger_ms=lingerMs,
+            compression_type=compressionType)
+
+    def isEnabled(self):
+        return self.kafkaProducer is not None
+
+    def publish(self, deal):
+        """ Thread-safe, non-blocking """
+        if self.kafkaProducer is None:
+            return
+        payload = deal.getLogJSONDump().encode('utf-8')
+        self.eventLoop.call_soon_threadsafe(self.enqueue, payload)
+
+    def enqueue(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+            self.nofQueued.inc()
+        except asyncio.QueueFull:
+            self.nofDropped.inc()
+            logger.warning('Kafka deal queue is full, deal dropped (%d dropped so far)' % self.nofDropped.value)
+
+    def onDelivery(self, future):
+        if future.cancelled() or future.exception() is not None:
+            self.nofFailed.inc()
+            logger.warning('Failed to publish to Kafka stream: ' + str(None if future.cancelled() else future.exception()))
+        else:
+            self.nofPublished.inc()
+
+    async def publisher(self):
+        try:
+            await self.kafkaProducer.start()
+        except Exception as e:
+            logger.error('Kafka producer start failed: ' + str(e))
+            return
+
+        while True:
+            payload = await self.queue.get()
+            try:
+                # send() returns as soon as the message is in the batch of the producer
+                deliveryFuture = await self.kafkaProducer.send(self.topic, payload)
+                deliveryFuture.add_done_callback(self.onDelivery)
+            except Exception as e:
+                self.nofFailed.inc()
+                logger.warning('Failed to publish to Kafka stream: ' + str(e))
+
+    async def stop(self):
+        if self.publisherTask is not None:
+            self.publisherTask.cancel()
+            self.publisherTask = None
+        if self.kafkaProducer is not None:
+            kafkaProducer = self.kafkaProducer
+            self.kafkaProducer = None
+            try:
+                while not self.queue.empty():
+                    (await kafkaProducer.send(self.topic, self.queue.get_nowait())).add_done_callback(self.onDelivery)
+            except Exception as e:
+                logger.warning('Queued deals could not be published: ' + str(e))
+            # flushes the pending batches
+            await kafkaProducer.stop()
+
+    def __del__(self):
+        if self.kafkaProducer is not None:
+            try:
+                self.eventLoop.run_until_complete(self.stop())
+            except Exception as e:
+                logger.error('Error during destroying Kafka producer: '+str(e))
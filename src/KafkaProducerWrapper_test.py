@@ -0,0 +1,70 @@
+from KafkaProducerWrapper import KafkaProducerWrapper
+import asyncio
+import json
+
+
+class FakeDeal:
+    def __init__(self, idx):
+        self.idx = idx
+
+    def getLogJSONDump(self):
+        return json.dumps({'uuid': self.idx})
+
+
+class FakeProducer:
+    def __init__(self):
+        self.sent = []
+        self.isStarted = False
+        self.isStopped = False
+
+    async def start(self):
+        self.isStarted = True
+
+    async def send(self, topic, value):
+        self.sent.append((topic, value))
+        future = asyncio.Future()
+        future.set_result(None)
+        return future
+
+    async def stop(self):
+        self.isStopped = True
+
+
+class FakeProducerWrapper(KafkaProducerWrapper):
+    def createProducer(self, kafkaCredentials, lingerMs, compressionType):
+        return FakeProducer()
+
+
+class TestClass(object):
+
+    def test_publishEncodesOnce(self):
+        loop = asyncio.get_event_loop()
+        wrapper = FakeProducerWrapper({'uri': 'localhost:9092', 'topicDeals': 'deals'}, eventLoop=loop)
+        producer = wrapper.kafkaProducer
+        wrapper.publish(FakeDeal(1))
+        wrapper.publish(FakeDeal(2))
+        loop.run_until_complete(asyncio.sleep(0.01))
+
+        assert producer.isStarted is True
+        assert producer.sent == [('deals', b'{"uuid": 1}'), ('deals', b'{"uuid": 2}')]
+        assert json.loads(producer.sent[0][1].decode('utf-8')) == {'uuid': 1}
+        loop.run_until_complete(wrapper.stop())
+        assert producer.isStopped is True
+
+    def test_fullQueueDrops(self):
+        loop = asyncio.get_event_loop()
+        wrapper = FakeProducerWrapper({'uri': 'localhost:9092', 'topicDeals': 'deals'}, eventLoop=loop, maxQueueSize=2)
+        producer = wrapper.kafkaProducer
+        nofDropped = wrapper.nofDropped.value
+        # the publisher task doesn't run until the loop is given control
+        for idx in range(5):
+            wrapper.enqueue(b'{}')
+        assert wrapper.nofDropped.value - nofDropped == 3
+
+        loop.run_until_complete(wrapper.stop())
+        assert len(producer.sent) == 2
+
+    def test_disabledWithoutCredentials(self):
+        wrapper = KafkaProducerWrapper(None, eventLoop=asyncio.get_event_loop())
+        assert wrapper.isEnabled() is False
+        wrapper.publish(FakeDeal(1))
@@ -0,0 +1,76 @@
+import time
+import logging
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class LagPolicy:
+    """
+        Frame dropping policy of the Kafka datasource.
+        Lag of a partition (messages behind the high watermark) above maxLagMessages:
+            MODE_SEEK_TO_END: the backlog of the partition is skipped, the consumer seeks to the end
+            MODE_CONFLATE: the consumer catches up with larger batches, every batch is conflated to the newest snapshot per market
+        Snapshots with a producer-to-consumer delay above maxDelayMs are never fed to the deal finder,
+        the graph edges of their market are invalidated instead.
+    """
+    MODE_SEEK_TO_END = 'seek_to_end'
+    MODE_CONFLATE = 'conflate'
+
+    ACTION_NONE = 'none'
+    ACTION_CONFLATE = 'conflate'
+    ACTION_SEEK_TO_END = 'seek_to_end'
+
+    def __init__(self, mode=MODE_SEEK_TO_END, maxLagMessages=1000, maxDelayMs=1000, clock=time.time):
+        if mode not in (LagPolicy.MODE_SEEK_TO_END, LagPolicy.MODE_CONFLATE):
+            raise ValueError('Invalid lag policy mode: ' + str(mode))
+        self.mode = mode
+        self.maxLagMessages = maxLagMessages
+        self.maxDelayMs = maxDelayMs
+        self.clock = clock
+        self.lags = {}
+        self.behindPartitions = set()
+        self.nofLagActions = {}
+
+    def onBatch(self, partition, lastOffset, highwater):
+        """ Action for the partition after a batch that ended at lastOffset """
+        if highwater is None:
+            return LagPolicy.ACTION_NONE
+        lag = max(0, highwater - lastOffset - 1)
+        self.lags[partition] = lag
+
+        if lag <= self.maxLagMessages:
+            if partition in self.behindPartitions:
+                self.behindPartitions.discard(partition)
+                logger.info('Kafka partition %s caught up (lag:%d)' % (str(partition), lag))
+            return LagPolicy.ACTION_NONE
+
+        if partition not in self.behindPartitions:
+            self.behindPartitions.add(partition)
+            logger.warning('Kafka partition %s is behind (lag:%d), policy: %s' % (str(partition), lag, self.mode))
+        self.nofLagActions[partition] = self.nofLagActions.get(partition, 0) + 1
+        if self.mode == LagPolicy.MODE_SEEK_TO_END:
+            return LagPolicy.ACTION_SEEK_TO_END
+        return LagPolicy.ACTION_CONFLATE
+
+    def isBehind(self):
+        return len(self.behindPartitions) > 0
+
+    def getDelayMs(self, timestamp, now=None):
+        """ timestamp: producer timestamp [s] """
+        return ((self.clock() if now is None else now) - timestamp) * 1000
+
+    def splitStale(self, updates, now=None):
+        """
+            Splits [(exchange, symbol, bids, asks, timestamp [s]), ...] into the fresh updates and the
+            (exchange, symbol) markets of the stale ones
+        """
+        if now is None:
+            now = self.clock()
+        fresh = []
+        staleMarkets = []
+        for update in updates:
+            if self.getDelayMs(update[4], now) > self.maxDelayMs:
+                staleMarkets.append((update[0], update[1]))
+            else:
+                fresh.append(update)
+        return fresh, staleMarkets
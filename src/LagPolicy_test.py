@@ -0,0 +1,34 @@
+from LagPolicy import LagPolicy
+import pytest
+
+
+class TestClass(object):
+
+    def test_seekToEnd(self):
+        lagPolicy = LagPolicy(mode=LagPolicy.MODE_SEEK_TO_END, maxLagMessages=100)
+        assert lagPolicy.onBatch('p0', lastOffset=899, highwater=1000) == LagPolicy.ACTION_NONE
+        assert lagPolicy.lags['p0'] == 100
+        assert lagPolicy.onBatch('p0', lastOffset=898, highwater=1000) == LagPolicy.ACTION_SEEK_TO_END
+        assert lagPolicy.isBehind() is True
+        assert lagPolicy.onBatch('p1', lastOffset=10, highwater=11) == LagPolicy.ACTION_NONE
+        assert lagPolicy.onBatch('p0', lastOffset=1999, highwater=2000) == LagPolicy.ACTION_NONE
+        assert lagPolicy.isBehind() is False
+        assert lagPolicy.nofLagActions == {'p0': 1}
+        assert lagPolicy.onBatch('p2', lastOffset=0, highwater=None) == LagPolicy.ACTION_NONE
+
+    def test_conflate(self):
+        lagPolicy = LagPolicy(mode=LagPolicy.MODE_CONFLATE, maxLagMessages=100)
+        assert lagPolicy.onBatch('p0', lastOffset=0, highwater=1000) == LagPolicy.ACTION_CONFLATE
+
+    def test_invalidMode(self):
+        with pytest.raises(ValueError):
+            LagPolicy(mode='drop_everything')
+
+    def test_splitStale(self):
+        lagPolicy = LagPolicy(maxDelayMs=1000, clock=lambda: 100.0)
+        fresh, staleMarkets = lagPolicy.splitStale([
+            ('kraken', 'BTC/USD', [], [], 99.5),
+            ('kraken', 'ETH/USD', [], [], 98.5),
+            ('bitstamp', 'BTC/USD', [], [], 100.2)])
+        assert [update[:2] for update in fresh] == [('kraken', 'BTC/USD'), ('bitstamp', 'BTC/USD')]
+        assert staleMarkets == [('kraken', 'ETH/USD')]
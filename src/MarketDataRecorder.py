@@ -0,0 +1,207 @@
+from Metrics import getRegistry
+from threading import Thread
+import datetime
+import glob
+import logging
+import os
+import queue
+import time
+import numpy as np
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class MarketDataRecorder:
+    """
+        Captures the accepted orderbook snapshots and the coinmarketcap tickers fed to the analyser. The hot
+        path only hands the references over to a bounded queue (dropped and counted when full), a background
+        writer converts them to NumPy structured arrays and writes them in chunks:
+            <directory>/orderbooks-000001.npz, prices-000001.npz, ...
+        The chunks are compressed (.npz) or, with compress=False, plain .npy files that np.load() can
+        memory-map. Orderbooks keep the top ORDERBOOK_DEPTH levels, nofBids/nofAsks tell the valid ones.
+    """
+    ORDERBOOK_DEPTH = 20
+    # sequence: order of the records across the orderbook and price chunks
+    ORDERBOOK_DTYPE = np.dtype([
+        ('sequence', 'u8'),
+        ('timestamp', 'f8'),
+        ('exchange', 'S24'),
+        ('symbol', 'S24'),
+        ('nofBids', 'u1'),
+        ('nofAsks', 'u1'),
+        ('takerFee', 'f8'),
+        ('bids', 'f8', (ORDERBOOK_DEPTH, 2)),
+        ('asks', 'f8', (ORDERBOOK_DEPTH, 2))])
+    # one row per coinmarketcap ticker item, the items of one ticker share the batch number
+    PRICE_DTYPE = np.dtype([
+        ('sequence', 'u8'),
+        ('timestamp', 'f8'),
+        ('batch', 'u4'),
+        ('source', 'S16'),
+        ('symbol', 'S24'),
+        ('price', 'f8'),
+        ('priceTimestamp', 'f8')])
+    SOURCE_COINMARKETCAP = 'coinmarketcap'
+
+    KIND_ORDERBOOKS = 'orderbooks'
+    KIND_PRICES = 'prices'
+    CHUNK_ROWS = 20000
+    FLUSH_INTERVAL_SECONDS = 60
+    MAX_QUEUE_SIZE = 100000
+
+    def __init__(self, directory, compress=True, chunkRows=CHUNK_ROWS, flushIntervalSeconds=FLUSH_INTERVAL_SECONDS,
+                 maxQueueSize=MAX_QUEUE_SIZE):
+        self.directory = directory
+        self.compress = compress
+        self.chunkRows = chunkRows
+        self.flushIntervalSeconds = flushIntervalSeconds
+        self.queue = queue.Queue(maxsize=maxQueueSize)
+        # preallocated chunk, filled in place by the writer
+        self.orderbooks = np.zeros(chunkRows, dtype=MarketDataRecorder.ORDERBOOK_DTYPE)
+        self.nofOrderbookRows = 0
+        self.prices = []
+        self.nofBatches = 0
+        self.nofRecords = 0
+        self.nofChunks = {MarketDataRecorder.KIND_ORDERBOOKS: 0, MarketDataRecorder.KIND_PRICES: 0}
+
+        metrics = getRegistry()
+        self.nofRecorded = metrics.counter('market_data_recorded')
+        self.nofDropped = metrics.counter('market_data_dropped')
+
+        os.makedirs(directory, exist_ok=True)
+        self.writerThread = Thread(target=self.writer, name='MarketDataRecorder', daemon=True)
+        self.writerThread.start()
+
+    @staticmethod
+    def createSessionDirectory(recordDir):
+        """ A new capture directory per run, e.g. <recordDir>/capture-20190601-120000 """
+        return os.path.join(recordDir, 'capture-' + datetime.datetime.now().strftime('%Y%m%d-%H%M%S'))
+
+    def put(self, record):
+        try:
+            self.queue.put_nowait(record)
+            self.nofRecorded.inc()
+        except queue.Full:
+            self.nofDropped.inc()
+
+    def recordOrderbook(self, exchangename, symbol, bids, asks, timestamp, takerFee=np.nan):
+        """ bids, asks: validated [[price, volume], ...] lists, they must not be modified afterwards """
+        self.put((MarketDataRecorder.KIND_ORDERBOOKS, (timestamp, exchangename, symbol, bids, asks, takerFee)))
+
+    def recordCoinmarketcapTicker(self, ticker, timestamp):
+        self.put((MarketDataRecorder.KIND_PRICES, (timestamp, MarketDataRecorder.SOURCE_COINMARKETCAP, ticker)))
+
+    def appendOrderbook(self, timestamp, exchangename, symbol, bids, asks, takerFee):
+        bids = bids[:MarketDataRecorder.ORDERBOOK_DEPTH]
+        asks = asks[:MarketDataRecorder.ORDERBOOK_DEPTH]
+        row = self.orderbooks[self.nofOrderbookRows]
+        self.nofRecords += 1
+        row['sequence'] = self.nofRecords
+        row['timestamp'] = timestamp
+        row['takerFee'] = takerFee
+        row['exchange'] = exchangename.encode()
+        row['symbol'] = symbol.encode()
+        row['nofBids'] = len(bids)
+        row['nofAsks'] = len(asks)
+        if bids:
+            row['bids'][:len(bids)] = [level[0:2] for level in bids]
+        if asks:
+            row['asks'][:len(asks)] = [level[0:2] for level in asks]
+        self.nofOrderbookRows += 1
+
+    def toPriceRows(self, timestamp, source, ticker):
+        self.nofBatches += 1
+        self.nofRecords += 1
+        rows = []
+        for symbol, tickeritem in ticker.items():
+            price = tickeritem.get('last')
+            priceTimestamp = tickeritem.get('timestamp')
+            if price is None or priceTimestamp is None:
+                continue
+            rows.append((self.nofRecords, timestamp, self.nofBatches, source.encode(), symbol.encode(), price, priceTimestamp))
+        return rows
+
+    def getChunkPath(self, kind, chunk):
+        return os.path.join(self.directory, '%s-%06d.%s' % (kind, chunk, 'npz' if self.compress else 'npy'))
+
+    def writeChunk(self, kind, data):
+        self.nofChunks[kind] += 1
+        path = self.getChunkPath(kind, self.nofChunks[kind])
+        # written under a temporary name, readers only see complete chunks
+        temporaryPath = path + '.tmp'
+        with open(temporaryPath, 'wb') as file:
+            if self.compress:
+                np.savez_compressed(file, data=data)
+            else:
+                np.save(file, data)
+        os.replace(temporaryPath, path)
+
+    def flush(self):
+        try:
+            if self.nofOrderbookRows > 0:
+                self.writeChunk(MarketDataRecorder.KIND_ORDERBOOKS, self.orderbooks[:self.nofOrderbookRows])
+            if self.prices:
+                self.writeChunk(MarketDataRecorder.KIND_PRICES, np.array(self.prices, dtype=MarketDataRecorder.PRICE_DTYPE))
+        except Exception as e:
+            logger.error('Market data chunk could not be written: ' + str(e))
+        if self.nofOrderbookRows > 0:
+            self.orderbooks = np.zeros(self.chunkRows, dtype=MarketDataRecorder.ORDERBOOK_DTYPE)
+            self.nofOrderbookRows = 0
+        self.prices = []
+
+    def writer(self):
+        timeOfLastFlush = time.time()
+        while True:
+            try:
+                record = self.queue.get(timeout=max(0.01, timeOfLastFlush + self.flushIntervalSeconds - time.time()))
+            except queue.Empty:
+                record = False
+            if record is None:
+                self.flush()
+                return
+
+            if record is not False:
+                kind, values = record
+                try:
+                    if kind == MarketDataRecorder.KIND_ORDERBOOKS:
+                        self.appendOrderbook(*values)
+                    else:
+                        self.prices.extend(self.toPriceRows(*values))
+                except Exception as e:
+                    logger.warning('Market data record skipped: ' + str(e))
+                    if kind == MarketDataRecorder.KIND_ORDERBOOKS and self.nofOrderbookRows < self.chunkRows:
+                        # the partially written row is reused
+                        self.orderbooks[self.nofOrderbookRows:self.nofOrderbookRows + 1] = 0
+
+            if self.nofOrderbookRows >= self.chunkRows or len(self.prices) >= self.chunkRows or \
+                    time.time() - timeOfLastFlush >= self.flushIntervalSeconds:
+                self.flush()
+                timeOfLastFlush = time.time()
+
+    def stop(self):
+        """ Writes the pending records and stops the writer """
+        self.queue.put(None)
+        self.writerThread.join()
+
+    @staticmethod
+    def iterChunks(directory, kind, mmap=True):
+        """ The arrays of the chunks of a kind in write order, .npy chunks are memory-mapped """
+        for path in sorted(glob.glob(os.path.join(directory, kind + '-*.np[yz]'))):
+            if path.endswith('.npz'):
+                with np.load(path) as archive:
+                    yield archive['data']
+            else:
+                yield np.load(path, mmap_mode='r' if mmap else None)
+
+    @staticmethod
+    def loadChunks(directory, kind, mmap=True):
+        return list(MarketDataRecorder.iterChunks(directory, kind, mmap))
+
+    @staticmethod
+    def toOrderbook(row):
+        """ (exchangename, symbol, bids, asks, timestamp) of an orderbook row """
+        return (row['exchange'].decode(),
+                row['symbol'].decode(),
+                row['bids'][:row['nofBids']].tolist(),
+                row['asks'][:row['nofAsks']].tolist(),
+                float(row['timestamp']))
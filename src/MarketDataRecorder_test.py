@@ -0,0 +1,68 @@
+from MarketDataRecorder import MarketDataRecorder
+import numpy as np
+import os
+import threading
+import time
+
+
+class TestClass(object):
+    def test_recordAndLoad(self, tmpdir):
+        directory = str(tmpdir.join('capture'))
+        recorder = MarketDataRecorder(directory, chunkRows=2)
+        recorder.recordOrderbook('Kraken', 'BTC/USD', [[9000.0, 1.0], [8999.0, 2.0]], [[9001.0, 0.5]], 1000.5)
+        recorder.recordOrderbook('Bitstamp', 'ETH/BTC', [[0.03, 10.0]], [[0.031, 5.0], [0.032, 1.0]], 1001.0)
+        recorder.recordOrderbook('oanda', 'EUR/USD', [[1.1, 1000000]], [[1.2, 1000000]], 1002.0)
+        recorder.recordCoinmarketcapTicker({'BTC/USD': {'last': 9000, 'timestamp': 1000000},
+                                            'ETH/USD': {'last': None, 'timestamp': 1000000},
+                                            'ETH/BTC': {'last': 0.03, 'timestamp': 1000000}}, 1000.0)
+        recorder.recordCoinmarketcapTicker({'BTC/USD': {'last': 9100, 'timestamp': 1001000}}, 1001.0)
+        recorder.stop()
+
+        assert sorted(os.listdir(directory)) == ['orderbooks-000001.npz', 'orderbooks-000002.npz', 'prices-000001.npz', 'prices-000002.npz']
+        orderbooks = np.concatenate(MarketDataRecorder.loadChunks(directory, MarketDataRecorder.KIND_ORDERBOOKS))
+        assert len(orderbooks) == 3
+        assert MarketDataRecorder.toOrderbook(orderbooks[0]) == ('Kraken', 'BTC/USD', [[9000.0, 1.0], [8999.0, 2.0]], [[9001.0, 0.5]], 1000.5)
+        assert MarketDataRecorder.toOrderbook(orderbooks[1])[3] == [[0.031, 5.0], [0.032, 1.0]]
+
+        prices = np.concatenate(MarketDataRecorder.loadChunks(directory, MarketDataRecorder.KIND_PRICES))
+        assert prices['symbol'].tolist() == [b'BTC/USD', b'ETH/BTC', b'BTC/USD']
+        assert prices['batch'].tolist() == [1, 1, 2]
+        assert prices['price'].tolist() == [9000, 0.03, 9100]
+        # recording order across the orderbooks and the tickers
+        assert orderbooks['sequence'].tolist() == [1, 2, 3]
+        assert prices['sequence'].tolist() == [4, 4, 5]
+        assert np.isnan(orderbooks['takerFee']).all()
+
+    def test_uncompressedChunksAreMemoryMapped(self, tmpdir):
+        directory = str(tmpdir)
+        recorder = MarketDataRecorder(directory, compress=False)
+        levels = [[100.0 - i, 1.0] for i in range(30)]
+        recorder.recordOrderbook('Kraken', 'BTC/USD', levels, [[101.0, 1.0]], 1.0)
+        recorder.stop()
+
+        chunks = MarketDataRecorder.loadChunks(directory, MarketDataRecorder.KIND_ORDERBOOKS)
+        assert isinstance(chunks[0], np.memmap)
+        # the levels beyond the depth are not recorded
+        assert len(MarketDataRecorder.toOrderbook(chunks[0][0])[2]) == MarketDataRecorder.ORDERBOOK_DEPTH
+
+    def test_fullQueueDropsRecords(self, tmpdir):
+        recorder = MarketDataRecorder(str(tmpdir), maxQueueSize=2)
+        writerBlocked = threading.Event()
+        appendOrderbook = recorder.appendOrderbook
+
+        def blockingAppendOrderbook(*args):
+            writerBlocked.wait()
+            appendOrderbook(*args)
+        recorder.appendOrderbook = blockingAppendOrderbook
+
+        nofDropped = recorder.nofDropped.value
+        recorder.recordOrderbook('Kraken', 'BTC/USD', [[1.0, 1.0]], [[2.0, 1.0]], 1.0)
+        while recorder.queue.qsize() > 0:
+            time.sleep(0.001)
+        for _ in range(9):
+            recorder.recordOrderbook('Kraken', 'BTC/USD', [[1.0, 1.0]], [[2.0, 1.0]], 1.0)
+        # one record in the writer, two in the queue
+        assert recorder.nofDropped.value - nofDropped == 7
+        writerBlocked.set()
+        recorder.stop()
+        assert len(MarketDataRecorder.loadChunks(str(tmpdir), MarketDataRecorder.KIND_ORDERBOOKS)[0]) == 3
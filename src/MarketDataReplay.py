@@ -0,0 +1,117 @@
+from MarketDataRecorder import MarketDataRecorder
+import asyncio
+import heapq
+import logging
+import math
+import time
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class SimulatedClock:
+    """ Clock of the replay, set to the recording time of the event being replayed. Never goes backwards. """
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def set(self, now):
+        self.now = max(self.now, now)
+
+
+class MarketDataReplay:
+    """
+        Feeds a capture of the MarketDataRecorder to an OrderbookAnalyser in recording order: orderbooks with
+        their recorded taker fees and coinmarketcap tickers. The analyser has to run on the clock of the replay
+        with the inline deal finder (nofGraphWorkers=0), the found deals then only depend on the capture.
+        speed=None replays as fast as possible, speed=1 in event time, speed=10 ten times faster.
+    """
+    YIELD_INTERVAL_EVENTS = 1000
+
+    def __init__(self, directory, orderbookAnalyser, clock, speed=None):
+        graphWorkerPool = orderbookAnalyser.graphWorkerPool
+        if graphWorkerPool is not None and graphWorkerPool.isInline is False:
+            raise ValueError('Market data replay needs the inline deal finder (nofGraphWorkers=0)')
+        self.directory = directory
+        self.orderbookAnalyser = orderbookAnalyser
+        self.clock = clock
+        self.speed = speed
+        self.nofEvents = 0
+
+    def iterOrderbookEvents(self):
+        for chunk in MarketDataRecorder.iterChunks(self.directory, MarketDataRecorder.KIND_ORDERBOOKS):
+            for row in chunk:
+                yield int(row['sequence']), float(row['timestamp']), MarketDataRecorder.KIND_ORDERBOOKS, row
+
+    def iterPriceEvents(self):
+        """ One event per recorded ticker: {symbol: {'symbol', 'last', 'timestamp'}} """
+        batch = None
+        for chunk in MarketDataRecorder.iterChunks(self.directory, MarketDataRecorder.KIND_PRICES):
+            for row in chunk:
+                if batch is not None and batch[0] != row['batch']:
+                    yield batch[1:]
+                    batch = None
+                if batch is None:
+                    batch = [row['batch'], int(row['sequence']), float(row['timestamp']), MarketDataRecorder.KIND_PRICES, {}]
+                symbol = row['symbol'].decode()
+                batch[4][symbol] = {'symbol': symbol, 'last': float(row['price']), 'timestamp': float(row['priceTimestamp'])}
+        if batch is not None:
+            yield batch[1:]
+
+    def iterEvents(self):
+        """ (sequence, timestamp, kind, data) of the orderbooks and tickers in recording order """
+        return heapq.merge(self.iterOrderbookEvents(), self.iterPriceEvents(), key=lambda event: event[0])
+
+    def replayEvent(self, kind, data):
+        graphWorkerPool = self.orderbookAnalyser.graphWorkerPool
+        if graphWorkerPool is not None:
+            # the searches due until the time of this event
+            graphWorkerPool.poll()
+        if kind == MarketDataRecorder.KIND_ORDERBOOKS:
+            exchangename, symbol, bids, asks, timestamp = MarketDataRecorder.toOrderbook(data)
+            takerFee = float(data['takerFee'])
+            if not math.isnan(takerFee):
+                self.orderbookAnalyser.feeStore.setTakerFee(exchangename, symbol, takerFee)
+            self.orderbookAnalyser.update(exchangename, symbol, bids, asks, timestamp)
+        else:
+            self.orderbookAnalyser.updateCoinmarketcapPrice(data)
+
+    async def run(self):
+        """ Replays the capture and waits for the deals found, returns the replay statistics """
+        loop = asyncio.get_event_loop()
+        timeOfStart = time.time()
+        firstTimestamp = None
+        lastTimestamp = None
+        for sequence, timestamp, kind, data in self.iterEvents():
+            if firstTimestamp is None:
+                firstTimestamp = timestamp
+            lastTimestamp = timestamp
+            if self.speed is not None:
+                delay = timeOfStart + (timestamp - firstTimestamp) / self.speed - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.clock.set(timestamp)
+            self.replayEvent(kind, data)
+            self.nofEvents += 1
+            if self.nofEvents % MarketDataReplay.YIELD_INTERVAL_EVENTS == 0:
+                # deal listeners and traders run on the event loop
+                await asyncio.sleep(0)
+
+        graphWorkerPool = self.orderbookAnalyser.graphWorkerPool
+        if graphWorkerPool is not None:
+            graphWorkerPool.flush()
+            await loop.run_in_executor(None, self.orderbookAnalyser.dealQueue.join)
+        # the deal listeners scheduled by the deal processor thread
+        await asyncio.sleep(0)
+
+        wallSeconds = time.time() - timeOfStart
+        eventSeconds = lastTimestamp - firstTimestamp if firstTimestamp is not None else 0
+        stats = {
+            'events': self.nofEvents,
+            'wallSeconds': wallSeconds,
+            'eventSeconds': eventSeconds,
+            'speedup': eventSeconds / wallSeconds if wallSeconds > 0 else None
+        }
+        logger.info('Market data replay of %s finished: %s' % (self.directory, str(stats)))
+        return stats
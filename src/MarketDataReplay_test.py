@@ -0,0 +1,64 @@
+from MarketDataRecorder import MarketDataRecorder
+from MarketDataReplay import MarketDataReplay, SimulatedClock
+from OrderbookAnalyser import OrderbookAnalyser
+from Trader import Trader
+import asyncio
+import pytest
+
+CMC_TICKER = {'BTC/USD': {'timestamp': 100000, 'last': 9000},
+              'ETH/USD': {'timestamp': 100000, 'last': 100},
+              'ETH/BTC': {'timestamp': 100000, 'last': 0.03}}
+
+
+def recordTriangularArbitrage(directory):
+    recorder = MarketDataRecorder(directory, chunkRows=2)
+    recorder.recordCoinmarketcapTicker(CMC_TICKER, 99.0)
+    recorder.recordOrderbook('kraken', 'BTC/USD', [[9000, 1]], [[10000, 1]], 100.0, 0.0)
+    recorder.recordOrderbook('kraken', 'ETH/USD', [[100, 1000]], [[200, 1000]], 101.0, 0.0)
+    recorder.recordOrderbook('kraken', 'ETH/BTC', [[0.03, 1000]], [[0.04, 1000]], 102.0, 0.0)
+    recorder.stop()
+
+
+def replay(directory):
+    clock = SimulatedClock()
+    trader = Trader(is_sandbox_mode=True)
+
+    async def execute(segmentedOrderList):
+        pass
+    trader.execute = execute
+    orderbookAnalyser = OrderbookAnalyser(
+        vol_BTC=[1], edgeTTL=30, priceTTL=60, priceSource=OrderbookAnalyser.PRICE_SOURCE_CMC, trader=trader,
+        kafkaCredentials=None, dealFinderRateLimitTimeSeconds=0, nofGraphWorkers=0, clock=clock)
+    deals = []
+    orderbookAnalyser.addDealListener(lambda path: deals.append((','.join(str(node) for node in path.nodesList), path.timestamp, path.getProfit())))
+    try:
+        stats = asyncio.get_event_loop().run_until_complete(MarketDataReplay(directory, orderbookAnalyser, clock).run())
+    finally:
+        orderbookAnalyser.terminate()
+    assert clock() == 102.0
+    return stats, deals
+
+
+class TestClass(object):
+    def test_eventsInRecordingOrder(self, tmpdir):
+        directory = str(tmpdir)
+        recordTriangularArbitrage(directory)
+        events = list(MarketDataReplay(directory, type('Analyser', (), {'graphWorkerPool': None}), SimulatedClock()).iterEvents())
+        assert [event[2] for event in events] == ['prices', 'orderbooks', 'orderbooks', 'orderbooks']
+        assert [event[1] for event in events] == [99.0, 100.0, 101.0, 102.0]
+        assert events[0][3]['ETH/BTC'] == {'symbol': 'ETH/BTC', 'last': 0.03, 'timestamp': 100000}
+
+    def test_replayIsDeterministic(self, tmpdir):
+        directory = str(tmpdir)
+        recordTriangularArbitrage(directory)
+        stats, deals = replay(directory)
+        assert stats['events'] == 4
+        assert stats['eventSeconds'] == pytest.approx(3.0)
+        assert len(deals) == 1
+        assert replay(directory)[1] == deals
+
+    def test_simulatedClockIsMonotonic(self):
+        clock = SimulatedClock()
+        clock.set(10.0)
+        clock.set(5.0)
+        assert clock() == 10.0
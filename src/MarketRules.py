@@ -0,0 +1,127 @@
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from typing import Dict, Iterable, Tuple
+
+from OrderRequest import OrderRequest
+
+# ccxt precisionMode values (ccxt.base.decimal_to_precision)
+DECIMAL_PLACES = 2
+SIGNIFICANT_DIGITS = 3
+TICK_SIZE = 4
+
+
+class MarketRule:
+    """
+        Trading rules of one market: amount and cost limits, lot size (amountStep) and tick size (priceStep).
+        Markets with a precision in significant digits have no fixed step, amountDigits/priceDigits are used instead.
+    """
+    __slots__ = ('amountMin', 'amountMax', 'costMin', 'amountStep', 'priceStep', 'amountDigits', 'priceDigits')
+
+    def __init__(self, amountMin=None, amountMax=None, costMin=None, amountStep=None, priceStep=None, amountDigits=None, priceDigits=None):
+        self.amountMin = amountMin
+        self.amountMax = amountMax
+        self.costMin = costMin
+        self.amountStep = amountStep
+        self.priceStep = priceStep
+        self.amountDigits = amountDigits
+        self.priceDigits = priceDigits
+
+    @staticmethod
+    def roundToStep(value, step: Decimal, rounding) -> float:
+        return float((Decimal(repr(value)) / step).to_integral_value(rounding=rounding) * step)
+
+    @staticmethod
+    def roundToDigits(value, digits: int, rounding) -> float:
+        value = Decimal(repr(value))
+        if value == 0:
+            return 0.0
+        return float(value.quantize(Decimal(1).scaleb(value.adjusted() - digits + 1), rounding=rounding))
+
+    def roundAmount(self, amount) -> float:
+        ''' Truncated to the lot size, like ccxt amountToPrecision '''
+        if self.amountStep is not None:
+            return MarketRule.roundToStep(amount, self.amountStep, ROUND_DOWN)
+        if self.amountDigits is not None:
+            return MarketRule.roundToDigits(amount, self.amountDigits, ROUND_DOWN)
+        return amount
+
+    def roundPrice(self, price) -> float:
+        ''' Rounded to the tick size, like ccxt priceToPrecision '''
+        if self.priceStep is not None:
+            return MarketRule.roundToStep(price, self.priceStep, ROUND_HALF_UP)
+        if self.priceDigits is not None:
+            return MarketRule.roundToDigits(price, self.priceDigits, ROUND_HALF_UP)
+        return price
+
+
+class MarketRules:
+    """
+        Market rules of the exchanges compiled from the ccxt markets once after load_markets, the lookups are
+        O(1) and the rounding doesn't call the exchange. prepareOrderRequests() rounds the amount and the limit price
+        of every order request and validates them in one pass, before the first order is placed.
+    """
+    def __init__(self):
+        # (exchange_name_std, symbol): MarketRule
+        self.rules: Dict[Tuple[str, str], MarketRule] = {}
+        self.exchanges = set()
+
+    @staticmethod
+    def getStep(precision, precisionMode):
+        if precision is None:
+            return None
+        if precisionMode == TICK_SIZE:
+            return Decimal(repr(precision))
+        if precisionMode == DECIMAL_PLACES:
+            return Decimal(1).scaleb(-int(precision))
+        return None
+
+    @staticmethod
+    def compile(market, precisionMode) -> MarketRule:
+        limits = market.get('limits') or {}
+        precision = market.get('precision') or {}
+        isSignificantDigits = precisionMode == SIGNIFICANT_DIGITS
+        return MarketRule(
+            amountMin=(limits.get('amount') or {}).get('min') or None,
+            amountMax=(limits.get('amount') or {}).get('max') or None,
+            costMin=(limits.get('cost') or {}).get('min') or None,
+            amountStep=MarketRules.getStep(precision.get('amount'), precisionMode),
+            priceStep=MarketRules.getStep(precision.get('price'), precisionMode),
+            amountDigits=int(precision['amount']) if isSignificantDigits and precision.get('amount') is not None else None,
+            priceDigits=int(precision['price']) if isSignificantDigits and precision.get('price') is not None else None)
+
+    def addExchange(self, exchangeName: str, exchange):
+        ''' exchange: ccxt exchange with loaded markets '''
+        precisionMode = getattr(exchange, 'precisionMode', DECIMAL_PLACES)
+        for symbol, market in exchange.markets.items():
+            self.rules[(exchangeName, symbol)] = MarketRules.compile(market, precisionMode)
+        self.exchanges.add(exchangeName)
+
+    def getRule(self, exchangeName: str, symbol: str) -> MarketRule:
+        try:
+            return self.rules[(exchangeName, symbol)]
+        except KeyError:
+            if exchangeName not in self.exchanges:
+                raise ValueError(f'Exchange is not available: {exchangeName}')
+            raise ValueError(f'Symbol ({symbol}) does not exists in exchange ({exchangeName})')
+
+    def validate(self, orderRequest: OrderRequest, rule: MarketRule = None):
+        ''' :raises ValueError: the order request violates the rules of its market '''
+        if rule is None:
+            rule = self.getRule(orderRequest.exchange_name_std, orderRequest.market)
+        amount = orderRequest.volumeBase
+        if rule.amountMin is not None and amount < rule.amountMin:
+            raise ValueError(f"Amount too small, won't execute on {orderRequest.exchange_name} {orderRequest.market} Amount: {amount} Min.amount: {rule.amountMin}")
+        if rule.amountMax is not None and amount > rule.amountMax:
+            raise ValueError(f"Amount too big, won't execute on {orderRequest.exchange_name} {orderRequest.market} Amount: {amount} Max.amount: {rule.amountMax}")
+        if rule.costMin is not None and amount * orderRequest.limitPrice < rule.costMin:
+            raise ValueError(f"Cost too small, won't execute on {orderRequest.exchange_name} {orderRequest.market} Cost: {amount * orderRequest.limitPrice} Min.cost: {rule.costMin}")
+
+    def prepareOrderRequests(self, orderRequests: Iterable[OrderRequest]):
+        '''
+        Rounds the volume and the limit price of the order requests to the precision of their markets and validates them
+        :raises ValueError: the first order request violating the rules
+        '''
+        for orderRequest in orderRequests:
+            rule = self.getRule(orderRequest.exchange_name_std, orderRequest.market)
+            orderRequest.volumeBase = rule.roundAmount(orderRequest.volumeBase)
+            orderRequest.limitPrice = rule.roundPrice(orderRequest.limitPrice)
+            self.validate(orderRequest, rule)
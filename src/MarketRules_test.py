@@ -0,0 +1,54 @@
+from MarketRules import MarketRules, DECIMAL_PLACES, SIGNIFICANT_DIGITS, TICK_SIZE
+from OrderRequest import OrderRequest, OrderRequestList, OrderRequestType, SegmentedOrderRequestList
+import pytest
+
+
+class FakeExchange:
+    def __init__(self, precisionMode, markets):
+        self.precisionMode = precisionMode
+        self.markets = markets
+
+
+def createMarket(amountPrecision, pricePrecision, amountMin=0.01, amountMax=1000, costMin=None):
+    return {
+        'precision': {'amount': amountPrecision, 'price': pricePrecision},
+        'limits': {'amount': {'min': amountMin, 'max': amountMax}, 'cost': {'min': costMin, 'max': None}}
+    }
+
+
+def createOrderRequest(exchange, volumeBase, limitPrice, market='ETH/BTC'):
+    return OrderRequest(exchange, market, volumeBase=volumeBase, limitPrice=limitPrice, meanPrice=limitPrice, requestType=OrderRequestType.SELL)
+
+
+class TestClass(object):
+    def test_roundingByPrecisionMode(self):
+        marketRules = MarketRules()
+        marketRules.addExchange('kraken', FakeExchange(DECIMAL_PLACES, {'ETH/BTC': createMarket(3, 5)}))
+        marketRules.addExchange('binance', FakeExchange(TICK_SIZE, {'ETH/BTC': createMarket(0.05, 0.00025)}))
+        marketRules.addExchange('bittrex', FakeExchange(SIGNIFICANT_DIGITS, {'ETH/BTC': createMarket(3, 2)}))
+
+        kraken = marketRules.getRule('kraken', 'ETH/BTC')
+        assert (kraken.roundAmount(1.23456), kraken.roundPrice(0.0312345)) == (1.234, 0.03123)
+        binance = marketRules.getRule('binance', 'ETH/BTC')
+        assert (binance.roundAmount(1.23456), binance.roundPrice(0.03138)) == (1.2, 0.0315)
+        bittrex = marketRules.getRule('bittrex', 'ETH/BTC')
+        assert (bittrex.roundAmount(1.23456), bittrex.roundPrice(0.0312345)) == (1.23, 0.031)
+
+    def test_prepareSegmentedOrderRequestList(self):
+        marketRules = MarketRules()
+        marketRules.addExchange('kraken', FakeExchange(DECIMAL_PLACES, {'ETH/BTC': createMarket(3, 5, costMin=0.001)}))
+        deal = SegmentedOrderRequestList('uuid', [OrderRequestList([createOrderRequest('kraken', 2.00049, 0.0300049)])])
+        marketRules.prepareOrderRequests(deal.getOrderRequests())
+        orderRequest = deal.getOrderRequests()[0]
+        assert (orderRequest.volumeBase, orderRequest.limitPrice) == (2.0, 0.03)
+
+        with pytest.raises(ValueError, match='Amount too small'):
+            marketRules.prepareOrderRequests([createOrderRequest('kraken', 0.0099, 0.03)])
+        with pytest.raises(ValueError, match='Amount too big'):
+            marketRules.prepareOrderRequests([createOrderRequest('kraken', 1001, 0.03)])
+        with pytest.raises(ValueError, match='Cost too small'):
+            marketRules.prepareOrderRequests([createOrderRequest('kraken', 0.02, 0.03)])
+        with pytest.raises(ValueError, match='Exchange is not available'):
+            marketRules.prepareOrderRequests([createOrderRequest('bitstamp', 1, 0.03)])
+        with pytest.raises(ValueError, match='does not exists'):
+            marketRules.prepareOrderRequests([createOrderRequest('kraken', 1, 200, 'ETH/USD')])
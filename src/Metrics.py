@@ -0,0 +1,226 @@
+import logging
+import time
+
+try:
+    from time import perf_counter_ns
+except ImportError:
+    # python < 3.7
+    from time import perf_counter
+
+    def perf_counter_ns():
+        return int(perf_counter() * 1000000000)
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def reset(self):
+        self.value = 0
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class LatencyHistogram:
+    """
+        HDR-style log-linear histogram of integer latencies (ns). Values below 2*SUB_BUCKET_COUNT are
+        stored exactly, above that every power of two is split into SUB_BUCKET_COUNT linear buckets,
+        so the relative error of the percentiles is bounded by 1/SUB_BUCKET_COUNT (~3%).
+        Recording is a bit_length, a shift and a dict increment.
+    """
+    SUB_BUCKET_BITS = 5
+    SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+    EXACT_LIMIT = SUB_BUCKET_COUNT << 1
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = {}
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def getBucketIndex(value):
+        if value < LatencyHistogram.EXACT_LIMIT:
+            return value
+        shift = value.bit_length() - LatencyHistogram.SUB_BUCKET_BITS - 1
+        return (shift << LatencyHistogram.SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def getBucketRange(index):
+        """ Lowest and highest value stored in the bucket """
+        if index < LatencyHistogram.EXACT_LIMIT:
+            return index, index
+        shift = (index >> LatencyHistogram.SUB_BUCKET_BITS) - 1
+        mantissa = index - (shift << LatencyHistogram.SUB_BUCKET_BITS)
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = int(value)
+        if value < 0:
+            value = 0
+        index = LatencyHistogram.getBucketIndex(value)
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def getPercentile(self, percentile):
+        if self.count == 0:
+            return None
+        if percentile >= 100:
+            return self.max
+        rank = max(1, int(round(percentile / 100.0 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = LatencyHistogram.getBucketRange(index)
+                return min(max((low + high) // 2, self.min), self.max)
+        return self.max
+
+    def getMean(self):
+        return self.sum / self.count if self.count else None
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+
+    def snapshot(self):
+        return dict(counts=dict(self.counts), count=self.count, sum=self.sum, min=self.min, max=self.max)
+
+    @staticmethod
+    def fromSnapshot(snapshot):
+        histogram = LatencyHistogram()
+        histogram.counts = dict(snapshot['counts'])
+        histogram.count = snapshot['count']
+        histogram.sum = snapshot['sum']
+        histogram.min = snapshot['min']
+        histogram.max = snapshot['max']
+        return histogram
+
+
+class MetricsRegistry:
+    """
+        In-process registry of counters, gauges and latency histograms, identified by name and labels.
+        Other processes (e.g. the graph workers) keep their own registry and ship snapshots that are
+        merged into the registry of the main process.
+    """
+    def __init__(self, summaryIntervalSeconds=60):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.summaryIntervalSeconds = summaryIntervalSeconds
+        self.timeOfNextSummary = time.time() + summaryIntervalSeconds
+
+    @staticmethod
+    def getKey(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def counter(self, name, **labels):
+        key = MetricsRegistry.getKey(name, labels)
+        try:
+            return self.counters[key]
+        except KeyError:
+            return self.counters.setdefault(key, Counter())
+
+    def gauge(self, name, **labels):
+        key = MetricsRegistry.getKey(name, labels)
+        try:
+            return self.gauges[key]
+        except KeyError:
+            return self.gauges.setdefault(key, Gauge())
+
+    def histogram(self, name, **labels):
+        key = MetricsRegistry.getKey(name, labels)
+        try:
+            return self.histograms[key]
+        except KeyError:
+            return self.histograms.setdefault(key, LatencyHistogram())
+
+    def snapshot(self, reset=False):
+        """ Picklable copy of the metrics, with reset=True the counters and histograms restart from zero (delta snapshot) """
+        snapshot = dict(
+            counters={key: counter.value for key, counter in list(self.counters.items())},
+            gauges={key: gauge.value for key, gauge in list(self.gauges.items())},
+            histograms={key: histogram.snapshot() for key, histogram in list(self.histograms.items())})
+        if reset is True:
+            for metric in list(self.counters.values()) + list(self.histograms.values()):
+                metric.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        """ Adds a (delta) snapshot of another registry: counters and histograms are summed, gauges are overwritten """
+        for (name, labels), value in snapshot['counters'].items():
+            self.counter(name, **dict(labels)).inc(value)
+        for (name, labels), value in snapshot['gauges'].items():
+            self.gauge(name, **dict(labels)).set(value)
+        for (name, labels), histogramSnapshot in snapshot['histograms'].items():
+            self.histogram(name, **dict(labels)).merge(LatencyHistogram.fromSnapshot(histogramSnapshot))
+
+    @staticmethod
+    def getLabelString(labels):
+        return ','.join('%s=%s' % (label, value) for label, value in labels)
+
+    def summary(self):
+        lines = ['%-40s %10s %10s %10s %10s %10s %10s' % ('latency (us)', 'count', 'mean', 'p50', 'p90', 'p99', 'max')]
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if histogram.count == 0:
+                continue
+            lines.append('%-40s %10d %10.1f %10.1f %10.1f %10.1f %10.1f' % (
+                name + ' ' + MetricsRegistry.getLabelString(labels),
+                histogram.count,
+                histogram.getMean() / 1000,
+                histogram.getPercentile(50) / 1000,
+                histogram.getPercentile(90) / 1000,
+                histogram.getPercentile(99) / 1000,
+                histogram.max / 1000))
+        for (name, labels), counter in sorted(self.counters.items()):
+            lines.append('%-40s %10d' % (name + ' ' + MetricsRegistry.getLabelString(labels), counter.value))
+        for (name, labels), gauge in sorted(self.gauges.items()):
+            lines.append('%-40s %10s' % (name + ' ' + MetricsRegistry.getLabelString(labels), str(gauge.value)))
+        return '\n'.join(lines)
+
+    def isSummaryDue(self, now=None):
+        return (time.time() if now is None else now) >= self.timeOfNextSummary
+
+    def dumpIfDue(self, now=None):
+        if now is None:
+            now = time.time()
+        if now < self.timeOfNextSummary:
+            return False
+        self.timeOfNextSummary = now + self.summaryIntervalSeconds
+        logger.info('Metrics summary:\n' + self.summary())
+        return True
+
+
+registry = MetricsRegistry()
+
+
+def getRegistry():
+    """ Registry of the current process """
+    return registry
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import logging
+from Metrics import LatencyHistogram
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class MetricsServer:
+    """
+        Lightweight HTTP endpoint running on the asyncio event loop of the application:
+            GET /metrics : the metrics registry in Prometheus text exposition format
+            GET /status  : JSON introspection provided by statusProvider()
+        The collectors (callables) are run before every scrape to refresh the gauges computed on demand
+        (e.g. pipe backlog, trader state).
+    """
+    METRIC_PREFIX = 'cryptoarb_'
+    LATENCY_BUCKETS_SECONDS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                               0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    MAX_HEADER_LINES = 100
+
+    def __init__(self, registry, host='127.0.0.1', port=9100, collectors=None, statusProvider=None):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.collectors = collectors if collectors is not None else []
+        self.statusProvider = statusProvider
+        self.server = None
+        self.nofRequests = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handleConnection, host=self.host, port=self.port)
+        # port=0 binds a free port
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info('Metrics endpoint listening on http://%s:%d/metrics' % (self.host, self.port))
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def collect(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning('Metrics collector failed: ' + str(e))
+
+    async def handleConnection(self, reader, writer):
+        try:
+            requestLine = (await reader.readline()).decode('latin-1').split()
+            for idx in range(MetricsServer.MAX_HEADER_LINES):
+                if (await reader.readline()) in (b'\r\n', b'\n', b''):
+                    break
+
+            if len(requestLine) < 2 or requestLine[0] != 'GET':
+                status, contentType, body = '405 Method Not Allowed', 'text/plain', 'Method not allowed\n'
+            else:
+                path = requestLine[1].split('?')[0]
+                if path == '/metrics':
+                    self.collect()
+                    status, contentType, body = '200 OK', 'text/plain; version=0.0.4', MetricsServer.toPrometheusText(self.registry)
+                elif path == '/status' and self.statusProvider is not None:
+                    status, contentType, body = '200 OK', 'application/json', json.dumps(self.statusProvider(), default=str)
+                else:
+                    status, contentType, body = '404 Not Found', 'text/plain', 'Not found\n'
+            self.nofRequests += 1
+
+            payload = body.encode('utf-8')
+            writer.write(('HTTP/1.1 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: close\r\n\r\n'
+                          % (status, contentType, len(payload))).encode('latin-1') + payload)
+            await writer.drain()
+        except Exception as e:
+            logger.warning('Metrics endpoint request failed: ' + str(e))
+        finally:
+            writer.close()
+
+    @staticmethod
+    def getLabelString(labels, extraLabels=()):
+        labels = tuple(labels) + tuple(extraLabels)
+        if not labels:
+            return ''
+        return '{' + ','.join('%s="%s"' % (label, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                              for label, value in labels) + '}'
+
+    @staticmethod
+    def getCumulativeBucketCounts(histogram, boundsSeconds):
+        """ Cumulative counts of the histogram (ns) for the upper bounds (s), a bucket is counted by its lower bound """
+        counts = []
+        indices = sorted(histogram.counts)
+        position = 0
+        cumulativeCount = 0
+        for bound in boundsSeconds:
+            boundNs = bound * 1000000000
+            while position < len(indices) and LatencyHistogram.getBucketRange(indices[position])[0] <= boundNs:
+                cumulativeCount += histogram.counts[indices[position]]
+                position += 1
+            counts.append(cumulativeCount)
+        return counts
+
+    @staticmethod
+    def toPrometheusText(registry):
+        lines = []
+
+        def addFamily(metrics, metricType, suffix=''):
+            for name in sorted(set(name for name, labels in metrics)):
+                lines.append('# TYPE %s%s%s %s' % (MetricsServer.METRIC_PREFIX, name, suffix, metricType))
+                for (metricName, labels), metric in sorted(metrics.items()):
+                    if metricName == name:
+                        yield MetricsServer.METRIC_PREFIX + name + suffix, labels, metric
+
+        counters = dict(registry.counters)
+        for name, labels, counter in addFamily(counters, 'counter', '_total'):
+            lines.append('%s%s %s' % (name, MetricsServer.getLabelString(labels), repr(counter.value)))
+
+        gauges = dict(registry.gauges)
+        for name, labels, gauge in addFamily(gauges, 'gauge'):
+            lines.append('%s%s %s' % (name, MetricsServer.getLabelString(labels), repr(float(gauge.value))))
+
+        histograms = dict(registry.histograms)
+        for name, labels, histogram in addFamily(histograms, 'histogram', '_seconds'):
+            bucketCounts = MetricsServer.getCumulativeBucketCounts(histogram, MetricsServer.LATENCY_BUCKETS_SECONDS)
+            for bound, count in zip(MetricsServer.LATENCY_BUCKETS_SECONDS, bucketCounts):
+                lines.append('%s_bucket%s %d' % (name, MetricsServer.getLabelString(labels, (('le', repr(bound)),)), count))
+            lines.append('%s_bucket%s %d' % (name, MetricsServer.getLabelString(labels, (('le', '+Inf'),)), histogram.count))
+            lines.append('%s_sum%s %s' % (name, MetricsServer.getLabelString(labels), repr(histogram.sum / 1000000000)))
+            lines.append('%s_count%s %d' % (name, MetricsServer.getLabelString(labels), histogram.count))
+
+        return '\n'.join(lines) + '\n'
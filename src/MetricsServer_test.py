@@ -0,0 +1,62 @@
+from Metrics import MetricsRegistry
+from MetricsServer import MetricsServer
+import asyncio
+import json
+import pytest
+
+
+async def httpGet(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(('GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % path).encode('latin-1'))
+    response = await reader.read()
+    writer.close()
+    header, body = response.decode('utf-8').split('\r\n\r\n', 1)
+    return header.split('\r\n')[0], body
+
+
+class TestClass(object):
+
+    def test_prometheusText(self):
+        registry = MetricsRegistry()
+        registry.counter('orderbook_messages', exchange='kraken').inc(3)
+        registry.gauge('trader_busy').set(1)
+        histogram = registry.histogram('stage_latency', stage='cycle_search')
+        histogram.record(3000)          # 3 us
+        histogram.record(2000000)       # 2 ms
+        text = MetricsServer.toPrometheusText(registry)
+
+        assert '# TYPE cryptoarb_orderbook_messages_total counter' in text
+        assert 'cryptoarb_orderbook_messages_total{exchange="kraken"} 3' in text
+        assert 'cryptoarb_trader_busy 1.0' in text
+        assert '# TYPE cryptoarb_stage_latency_seconds histogram' in text
+        assert 'cryptoarb_stage_latency_seconds_bucket{stage="cycle_search",le="1e-05"} 1' in text
+        assert 'cryptoarb_stage_latency_seconds_bucket{stage="cycle_search",le="0.001"} 1' in text
+        assert 'cryptoarb_stage_latency_seconds_bucket{stage="cycle_search",le="0.0025"} 2' in text
+        assert 'cryptoarb_stage_latency_seconds_bucket{stage="cycle_search",le="+Inf"} 2' in text
+        assert 'cryptoarb_stage_latency_seconds_count{stage="cycle_search"} 2' in text
+
+    @pytest.mark.asyncio
+    async def test_endpoint(self):
+        registry = MetricsRegistry()
+        collected = []
+        server = MetricsServer(
+            registry=registry,
+            port=0,
+            collectors=[lambda: registry.gauge('pipe_backlog').set(len(collected)), lambda: collected.append(1)],
+            statusProvider=lambda: {'trader': {'busy': False}})
+        await server.start()
+        try:
+            status, body = await httpGet(server.port, '/metrics')
+            assert status == 'HTTP/1.1 200 OK'
+            assert 'cryptoarb_pipe_backlog 0.0' in body
+            status, body = await httpGet(server.port, '/metrics')
+            assert 'cryptoarb_pipe_backlog 1.0' in body
+
+            status, body = await httpGet(server.port, '/status')
+            assert status == 'HTTP/1.1 200 OK'
+            assert json.loads(body) == {'trader': {'busy': False}}
+
+            status, body = await httpGet(server.port, '/unknown')
+            assert status == 'HTTP/1.1 404 Not Found'
+        finally:
+            await server.stop()
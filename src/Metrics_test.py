@@ -0,0 +1,70 @@
+from Metrics import MetricsRegistry, LatencyHistogram
+from utilities import timed
+import pickle
+
+
+class TestClass(object):
+
+    def test_bucketsAreMonotonicAndContiguous(self):
+        previousIndex = -1
+        for value in list(range(0, 5000)) + [10 ** 6, 10 ** 9, 10 ** 12]:
+            index = LatencyHistogram.getBucketIndex(value)
+            assert index >= previousIndex
+            low, high = LatencyHistogram.getBucketRange(index)
+            assert low <= value <= high
+            assert (high - low) <= max(1, value / LatencyHistogram.SUB_BUCKET_COUNT)
+            previousIndex = index
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 100001):
+            histogram.record(value * 1000)
+        assert histogram.count == 100000
+        assert histogram.min == 1000
+        assert histogram.max == 100000000
+        for percentile in [50, 90, 99]:
+            expected = percentile * 1000000
+            assert abs(histogram.getPercentile(percentile) - expected) / expected < 1.0 / LatencyHistogram.SUB_BUCKET_COUNT
+        assert histogram.getPercentile(100) == histogram.max
+        assert LatencyHistogram().getPercentile(50) is None
+
+    def test_deltaSnapshotsMergeIntoRegistry(self):
+        worker = MetricsRegistry()
+        worker.histogram('stage_latency', stage='cycle_search').record(1000)
+        worker.counter('deals_found').inc()
+        snapshot = pickle.loads(pickle.dumps(worker.snapshot(reset=True)))
+        assert worker.histogram('stage_latency', stage='cycle_search').count == 0
+        assert worker.counter('deals_found').value == 0
+        worker.histogram('stage_latency', stage='cycle_search').record(3000)
+
+        main = MetricsRegistry()
+        main.merge(snapshot)
+        main.merge(worker.snapshot(reset=True))
+        histogram = main.histogram('stage_latency', stage='cycle_search')
+        assert histogram.count == 2
+        assert histogram.min == 1000
+        assert histogram.max == 3000
+        assert main.counter('deals_found').value == 1
+        assert 'stage_latency stage=cycle_search' in main.summary()
+
+    def test_dumpIfDue(self):
+        registry = MetricsRegistry(summaryIntervalSeconds=10)
+        now = registry.timeOfNextSummary
+        assert registry.dumpIfDue(now=now - 1) is False
+        assert registry.dumpIfDue(now=now) is True
+        assert registry.dumpIfDue(now=now + 1) is False
+
+    def test_timed(self):
+        @timed('test_stage')
+        def stage():
+            return 42
+
+        @timed
+        def otherStage():
+            return 43
+
+        assert stage() == 42
+        assert otherStage() == 43
+        from Metrics import getRegistry
+        assert getRegistry().histogram('stage_latency', stage='test_stage').count == 1
+        assert getRegistry().histogram('stage_latency', stage='otherStage').count == 1
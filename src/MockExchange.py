@@ -0,0 +1,385 @@
+from TokenBucket import TokenBucket
+from aiohttp import web
+import asyncio
+import itertools
+import logging
+import random
+import time
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class MockExchangeError(Exception):
+    """ Error returned to the client, code is the name of the ccxt exception raised by MockExchangeClient """
+    def __init__(self, code, message, status=400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+class MockVenue:
+    """
+        In-memory exchange: markets, orderbooks, balances, orders and trades. A limit order fills at its limit
+        price when it crosses the book (the book itself isn't consumed), according to fillMode:
+            immediate : fills when placed or when a later book update crosses it
+            partial   : partialFillRatio of the amount fills when placed, the rest like immediate
+            delayed   : fills fillDelaySeconds after it crosses the book
+            never     : stays open until canceled
+        Placing an order reserves the funds (used balance), fills move them and charge feeRate on the
+        received currency.
+    """
+    FILL_IMMEDIATE = 'immediate'
+    FILL_PARTIAL = 'partial'
+    FILL_DELAYED = 'delayed'
+    FILL_NEVER = 'never'
+    FILL_MODES = [FILL_IMMEDIATE, FILL_PARTIAL, FILL_DELAYED, FILL_NEVER]
+
+    def __init__(self, name, fillMode=FILL_IMMEDIATE, fillDelaySeconds=0.5, partialFillRatio=0.5, feeRate=0.0026):
+        if fillMode not in MockVenue.FILL_MODES:
+            raise ValueError('Invalid fill mode: ' + str(fillMode))
+        self.name = name
+        self.fillMode = fillMode
+        self.fillDelaySeconds = fillDelaySeconds
+        self.partialFillRatio = partialFillRatio
+        self.feeRate = feeRate
+        self.markets = {}
+        self.orderbooks = {}
+        self.balances = {}
+        self.orders = {}
+        self.trades = []
+        self.orderIds = itertools.count(1)
+        self.tradeIds = itertools.count(1)
+        # websocket subscribers: [(queue, channels)]
+        self.subscribers = []
+
+    def addMarket(self, symbol, amountMin=0.0001, amountMax=None, amountPrecision=8, pricePrecision=8):
+        base, quote = symbol.split('/')
+        self.markets[symbol] = {
+            'symbol': symbol,
+            'base': base,
+            'quote': quote,
+            'amountMin': amountMin,
+            'amountMax': amountMax,
+            'amountPrecision': amountPrecision,
+            'pricePrecision': pricePrecision
+        }
+
+    def setBalance(self, asset, free):
+        self.balances[asset] = {'free': float(free), 'used': 0.0}
+
+    def getBalance(self, asset):
+        return self.balances.setdefault(asset, {'free': 0.0, 'used': 0.0})
+
+    def setOrderbook(self, symbol, bids, asks):
+        self.orderbooks[symbol] = (bids, asks, time.time())
+        self.publish('orderbook:' + symbol, {'channel': 'orderbook', 'symbol': symbol, 'bids': bids, 'asks': asks})
+        for order in list(self.orders.values()):
+            if order['symbol'] == symbol and order['status'] == 'open' and order.get('isFillScheduled') is not True:
+                self.match(order)
+
+    def getMarket(self, symbol):
+        if symbol not in self.markets:
+            raise MockExchangeError('BadSymbol', 'Unknown market: ' + str(symbol))
+        return self.markets[symbol]
+
+    def getOrder(self, orderId):
+        if orderId not in self.orders:
+            raise MockExchangeError('OrderNotFound', 'Order not found: ' + str(orderId), status=404)
+        return self.orders[orderId]
+
+    def isCrossing(self, order):
+        if order['symbol'] not in self.orderbooks:
+            return False
+        bids, asks, _ = self.orderbooks[order['symbol']]
+        if order['side'] == 'buy':
+            return len(asks) > 0 and asks[0][0] <= order['price']
+        return len(bids) > 0 and bids[0][0] >= order['price']
+
+    def createOrder(self, symbol, side, amount, price):
+        market = self.getMarket(symbol)
+        if side not in ('buy', 'sell'):
+            raise MockExchangeError('InvalidOrder', 'Invalid side: ' + str(side))
+        amount = round(float(amount), market['amountPrecision'])
+        price = round(float(price), market['pricePrecision'])
+        if amount <= 0 or price <= 0:
+            raise MockExchangeError('InvalidOrder', 'Invalid amount or price')
+        if amount < market['amountMin'] or (market['amountMax'] is not None and amount > market['amountMax']):
+            raise MockExchangeError('InvalidOrder', 'Amount out of the limits of ' + symbol)
+
+        # funds reserved by the order
+        asset, reserved = (market['quote'], amount * price) if side == 'buy' else (market['base'], amount)
+        balance = self.getBalance(asset)
+        if balance['free'] < reserved:
+            raise MockExchangeError('InsufficientFunds', 'Insufficient %s balance: %s < %s' % (asset, balance['free'], reserved))
+        balance['free'] -= reserved
+        balance['used'] += reserved
+
+        order = {
+            'id': str(next(self.orderIds)),
+            'symbol': symbol,
+            'side': side,
+            'price': price,
+            'amount': amount,
+            'filled': 0.0,
+            'fee': 0.0,
+            'status': 'open',
+            'timestamp': int(time.time() * 1000)
+        }
+        self.orders[order['id']] = order
+        self.publishOrder(order)
+        if self.fillMode == MockVenue.FILL_PARTIAL and self.isCrossing(order):
+            self.fill(order, amount * self.partialFillRatio)
+        else:
+            self.match(order)
+        return order
+
+    def match(self, order):
+        if self.fillMode == MockVenue.FILL_NEVER or not self.isCrossing(order):
+            return
+        if self.fillMode == MockVenue.FILL_DELAYED:
+            order['isFillScheduled'] = True
+            asyncio.get_event_loop().call_later(self.fillDelaySeconds, self.fillRemaining, order)
+            return
+        self.fillRemaining(order)
+
+    def fillRemaining(self, order):
+        if order['status'] == 'open':
+            self.fill(order, order['amount'] - order['filled'])
+
+    def fill(self, order, amount):
+        market = self.markets[order['symbol']]
+        amount = min(amount, order['amount'] - order['filled'])
+        if amount <= 0:
+            return
+        cost = amount * order['price']
+        base = self.getBalance(market['base'])
+        quote = self.getBalance(market['quote'])
+        if order['side'] == 'buy':
+            fee = amount * self.feeRate
+            quote['used'] -= cost
+            base['free'] += amount - fee
+        else:
+            fee = cost * self.feeRate
+            base['used'] -= amount
+            quote['free'] += cost - fee
+        order['filled'] += amount
+        order['fee'] += fee
+        if order['amount'] - order['filled'] < 10 ** -market['amountPrecision']:
+            order['status'] = 'closed'
+        self.trades.append({
+            'id': str(next(self.tradeIds)),
+            'order': order['id'],
+            'symbol': order['symbol'],
+            'side': order['side'],
+            'price': order['price'],
+            'amount': amount,
+            'cost': cost,
+            'fee': fee,
+            'feeCurrency': market['base'] if order['side'] == 'buy' else market['quote'],
+            'timestamp': int(time.time() * 1000)
+        })
+        self.publishOrder(order)
+
+    def cancelOrder(self, orderId):
+        order = self.getOrder(orderId)
+        if order['status'] != 'open':
+            raise MockExchangeError('OrderNotFound', 'Order is not open: ' + str(orderId), status=404)
+        market = self.markets[order['symbol']]
+        remaining = order['amount'] - order['filled']
+        asset, reserved = (market['quote'], remaining * order['price']) if order['side'] == 'buy' else (market['base'], remaining)
+        balance = self.getBalance(asset)
+        balance['used'] -= reserved
+        balance['free'] += reserved
+        order['status'] = 'canceled'
+        self.publishOrder(order)
+        return order
+
+    def getOpenOrders(self, symbol=None):
+        return [order for order in self.orders.values()
+                if order['status'] == 'open' and (symbol is None or order['symbol'] == symbol)]
+
+    def getTrades(self, symbol=None, since=None):
+        return [trade for trade in self.trades
+                if (symbol is None or trade['symbol'] == symbol) and (since is None or trade['timestamp'] >= since)]
+
+    def publishOrder(self, order):
+        self.publish('orders', {'channel': 'orders', 'order': MockVenue.toMessage(order)})
+
+    def publish(self, channel, message):
+        for queue, channels in self.subscribers:
+            if channel in channels:
+                queue.put_nowait(message)
+
+    @staticmethod
+    def toMessage(order):
+        return {key: value for key, value in order.items() if key != 'isFillScheduled'}
+
+
+class MockExchange:
+    """
+        Local stand-in for the exchanges (load tests, failure injection, tick-to-order latency benchmarks).
+        Every venue is served under its own prefix, http://host:port/<venue>/...:
+            GET  markets, orderbook?symbol=&limit=, balance, order?id=, orders?symbol=, trades?symbol=&since=
+            POST order {symbol, side, amount, price}, cancel {id}
+            GET  ws : websocket, {"op": "subscribe", "channel": "orderbook", "symbol": ...} or {"channel": "orders"}
+        Every request is delayed by latencySeconds (+ uniform jitter), requests above rateLimitPerSecond per venue
+        are rejected with 429 and errorRate of them (or the next failNextRequests()) fail with 503.
+        MockExchangeClient is the ccxt client of a venue.
+    """
+    def __init__(self, venues, host='127.0.0.1', port=0, latencySeconds=0, latencyJitterSeconds=0,
+                 rateLimitPerSecond=None, rateLimitBurst=1, errorRate=0, seed=None):
+        self.venues = {venue.name: venue for venue in venues}
+        self.host = host
+        self.port = port
+        self.latencySeconds = latencySeconds
+        self.latencyJitterSeconds = latencyJitterSeconds
+        self.rateLimitPerSecond = rateLimitPerSecond
+        self.rateLimitBurst = rateLimitBurst
+        self.errorRate = errorRate
+        self.random = random.Random(seed)
+        self.tokenBuckets = {}
+        self.nofFailingRequests = 0
+        self.nofRequests = 0
+        self.nofRejectedRequests = 0
+        self.runner = None
+
+    def getUrl(self, venueName):
+        return 'http://%s:%d/%s' % (self.host, self.port, venueName)
+
+    def failNextRequests(self, nofRequests):
+        self.nofFailingRequests = nofRequests
+
+    async def start(self):
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get('/{venue}/markets', self.handleMarkets)
+        app.router.add_get('/{venue}/orderbook', self.handleOrderbook)
+        app.router.add_get('/{venue}/balance', self.handleBalance)
+        app.router.add_post('/{venue}/order', self.handleCreateOrder)
+        app.router.add_post('/{venue}/cancel', self.handleCancelOrder)
+        app.router.add_get('/{venue}/order', self.handleOrder)
+        app.router.add_get('/{venue}/orders', self.handleOrders)
+        app.router.add_get('/{venue}/trades', self.handleTrades)
+        app.router.add_get('/{venue}/ws', self.handleWebsocket)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        # port=0 binds a free port
+        self.port = self.runner.addresses[0][1]
+        logger.info('Mock exchange listening on http://%s:%d (%s)' % (self.host, self.port, ', '.join(self.venues.keys())))
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def getVenue(self, request):
+        venueName = request.match_info['venue']
+        if venueName not in self.venues:
+            raise MockExchangeError('ExchangeNotAvailable', 'Unknown venue: ' + venueName, status=404)
+        return self.venues[venueName]
+
+    def isRateLimited(self, venueName):
+        if self.rateLimitPerSecond is None:
+            return False
+        if venueName not in self.tokenBuckets:
+            self.tokenBuckets[venueName] = TokenBucket(ratePerSecond=self.rateLimitPerSecond, burst=self.rateLimitBurst)
+        return self.tokenBuckets[venueName].tryAcquire() is False
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        self.nofRequests += 1
+        try:
+            if self.latencySeconds or self.latencyJitterSeconds:
+                await asyncio.sleep(self.latencySeconds + self.random.uniform(0, self.latencyJitterSeconds))
+            if request.path.endswith('/ws') is False:
+                if self.isRateLimited(request.match_info.get('venue')):
+                    raise MockExchangeError('RateLimitExceeded', 'Rate limit exceeded', status=429)
+                if self.nofFailingRequests > 0 or (self.errorRate and self.random.random() < self.errorRate):
+                    self.nofFailingRequests = max(0, self.nofFailingRequests - 1)
+                    raise MockExchangeError('ExchangeNotAvailable', 'Injected failure', status=503)
+            return await handler(request)
+        except MockExchangeError as e:
+            self.nofRejectedRequests += 1
+            return web.json_response({'error': {'code': e.code, 'message': e.message}}, status=e.status)
+
+    async def getParams(self, request):
+        params = dict(request.query)
+        if request.method == 'POST' and request.can_read_body:
+            params.update(await request.json())
+        return params
+
+    async def handleMarkets(self, request):
+        return web.json_response(list(self.getVenue(request).markets.values()))
+
+    async def handleOrderbook(self, request):
+        venue = self.getVenue(request)
+        params = await self.getParams(request)
+        symbol = params.get('symbol')
+        venue.getMarket(symbol)
+        bids, asks, timestamp = venue.orderbooks.get(symbol, ([], [], time.time()))
+        limit = int(params['limit']) if params.get('limit') else None
+        return web.json_response({'symbol': symbol, 'bids': bids[:limit], 'asks': asks[:limit], 'timestamp': int(timestamp * 1000)})
+
+    async def handleBalance(self, request):
+        return web.json_response(self.getVenue(request).balances)
+
+    async def handleCreateOrder(self, request):
+        venue = self.getVenue(request)
+        params = await self.getParams(request)
+        try:
+            order = venue.createOrder(params['symbol'], params['side'], params['amount'], params['price'])
+        except (KeyError, ValueError, TypeError) as e:
+            raise MockExchangeError('InvalidOrder', 'Invalid order parameters: ' + str(e))
+        return web.json_response(MockVenue.toMessage(order))
+
+    async def handleCancelOrder(self, request):
+        params = await self.getParams(request)
+        return web.json_response(MockVenue.toMessage(self.getVenue(request).cancelOrder(str(params.get('id')))))
+
+    async def handleOrder(self, request):
+        params = await self.getParams(request)
+        return web.json_response(MockVenue.toMessage(self.getVenue(request).getOrder(str(params.get('id')))))
+
+    async def handleOrders(self, request):
+        params = await self.getParams(request)
+        return web.json_response([MockVenue.toMessage(order) for order in self.getVenue(request).getOpenOrders(params.get('symbol'))])
+
+    async def handleTrades(self, request):
+        params = await self.getParams(request)
+        since = int(params['since']) if params.get('since') else None
+        return web.json_response(self.getVenue(request).getTrades(params.get('symbol'), since))
+
+    async def handleWebsocket(self, request):
+        venue = self.getVenue(request)
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        queue = asyncio.Queue()
+        subscriber = (queue, set())
+        venue.subscribers.append(subscriber)
+
+        async def sender():
+            while True:
+                await websocket.send_json(await queue.get())
+        senderTask = asyncio.ensure_future(sender())
+        try:
+            async for message in websocket:
+                try:
+                    subscription = message.json()
+                    channel = subscription['channel']
+                    if channel == 'orderbook':
+                        symbol = subscription['symbol']
+                        venue.getMarket(symbol)
+                        subscriber[1].add('orderbook:' + symbol)
+                        if symbol in venue.orderbooks:
+                            bids, asks, _ = venue.orderbooks[symbol]
+                            queue.put_nowait({'channel': 'orderbook', 'symbol': symbol, 'bids': bids, 'asks': asks})
+                    else:
+                        subscriber[1].add(channel)
+                except (ValueError, KeyError, TypeError, MockExchangeError) as e:
+                    queue.put_nowait({'channel': 'error', 'message': str(e)})
+        finally:
+            senderTask.cancel()
+            venue.subscribers.remove(subscriber)
+        return websocket
@@ -0,0 +1,185 @@
+import ccxt.async_support as ccxt
+from ccxt.base import errors
+from ccxt.base.decimal_to_precision import DECIMAL_PLACES
+import json
+
+
+class MockExchangeClient(ccxt.Exchange):
+    """
+        ccxt client of a MockExchange venue, a drop-in for the ccxt exchange of the same id in the pollers and
+        the Trader, e.g. MockExchangeClient({'id': 'kraken', 'name': 'Kraken', 'urls': {'api': mockExchange.getUrl('kraken')}})
+        The errors of the mock are raised as the ccxt exceptions of the same name.
+    """
+    def describe(self):
+        return self.deep_extend(super(MockExchangeClient, self).describe(), {
+            'id': 'mockexchange',
+            'name': 'Mock Exchange',
+            'rateLimit': 10,
+            # precision: number of decimals
+            'precisionMode': DECIMAL_PLACES,
+            'has': {
+                'fetchCurrencies': False,
+                'fetchMarkets': True,
+                'fetchOrderBook': True,
+                'fetchBalance': True,
+                'createOrder': True,
+                'cancelOrder': True,
+                'fetchOrder': True,
+                'fetchOpenOrders': True,
+                'fetchMyTrades': True
+            },
+            'urls': {
+                'api': 'http://127.0.0.1:8090/mockexchange'
+            }
+        })
+
+    def sign(self, path, api='public', method='GET', params={}, headers=None, body=None):
+        url = self.urls['api'] + '/' + path
+        if method == 'GET':
+            if params:
+                url += '?' + self.urlencode(params)
+        else:
+            body = json.dumps(params)
+        return {'url': url, 'method': method, 'body': body, 'headers': {'Content-Type': 'application/json'}}
+
+    def handle_errors(self, code, reason, url, method, headers, body, response=None, *args):
+        if code < 400:
+            return
+        if not isinstance(response, dict):
+            try:
+                response = json.loads(body)
+            except (TypeError, ValueError):
+                return
+        error = response.get('error', {})
+        exceptionClass = getattr(errors, error.get('code', ''), errors.ExchangeError)
+        if not (isinstance(exceptionClass, type) and issubclass(exceptionClass, errors.BaseError)):
+            exceptionClass = errors.ExchangeError
+        raise exceptionClass(self.id + ' ' + str(error.get('message')))
+
+    async def fetch_markets(self, params={}):
+        markets = await self.fetch2('markets', 'public', 'GET', params)
+        return [self.parse_market(market) for market in markets]
+
+    def parse_market(self, market):
+        return {
+            'id': market['symbol'],
+            'symbol': market['symbol'],
+            'base': market['base'],
+            'quote': market['quote'],
+            'baseId': market['base'],
+            'quoteId': market['quote'],
+            'settle': None,
+            'settleId': None,
+            'active': True,
+            'type': 'spot',
+            'spot': True,
+            'margin': False,
+            'swap': False,
+            'future': False,
+            'option': False,
+            'contract': False,
+            'linear': None,
+            'inverse': None,
+            'contractSize': None,
+            'expiry': None,
+            'expiryDatetime': None,
+            'strike': None,
+            'optionType': None,
+            'taker': None,
+            'maker': None,
+            'precision': {'amount': market['amountPrecision'], 'price': market['pricePrecision']},
+            'limits': {
+                'amount': {'min': market['amountMin'], 'max': market['amountMax']},
+                'price': {'min': None, 'max': None},
+                'cost': {'min': None, 'max': None},
+                'leverage': {'min': None, 'max': None}
+            },
+            'created': None,
+            'info': market
+        }
+
+    async def fetch_order_book(self, symbol, limit=None, params={}):
+        request = {'symbol': symbol}
+        if limit is not None:
+            request['limit'] = limit
+        orderbook = await self.fetch2('orderbook', 'public', 'GET', self.extend(request, params))
+        return {
+            'symbol': symbol,
+            'bids': orderbook['bids'],
+            'asks': orderbook['asks'],
+            'timestamp': orderbook['timestamp'],
+            'datetime': self.iso8601(orderbook['timestamp']),
+            'nonce': None
+        }
+
+    async def fetch_balance(self, params={}):
+        balances = await self.fetch2('balance', 'private', 'GET', params)
+        result = {'info': balances, 'free': {}, 'used': {}, 'total': {}}
+        for currency, balance in balances.items():
+            account = {'free': balance['free'], 'used': balance['used'], 'total': balance['free'] + balance['used']}
+            result[currency] = account
+            for key in ('free', 'used', 'total'):
+                result[key][currency] = account[key]
+        return result
+
+    def parse_order(self, order, market=None):
+        return {
+            'id': order['id'],
+            'clientOrderId': None,
+            'timestamp': order['timestamp'],
+            'datetime': self.iso8601(order['timestamp']),
+            'lastTradeTimestamp': None,
+            'symbol': order['symbol'],
+            'type': 'limit',
+            'side': order['side'],
+            'price': order['price'],
+            'average': order['price'] if order['filled'] > 0 else None,
+            'amount': order['amount'],
+            'filled': order['filled'],
+            'remaining': order['amount'] - order['filled'],
+            'cost': order['filled'] * order['price'],
+            'status': order['status'],
+            'fee': {'cost': order['fee'], 'currency': None},
+            'trades': None,
+            'info': order
+        }
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        if type != 'limit':
+            raise errors.InvalidOrder(self.id + ' supports limit orders only')
+        request = {'symbol': symbol, 'side': side, 'amount': float(amount), 'price': float(price)}
+        return self.parse_order(await self.fetch2('order', 'private', 'POST', self.extend(request, params)))
+
+    async def cancel_order(self, id, symbol=None, params={}):
+        return self.parse_order(await self.fetch2('cancel', 'private', 'POST', self.extend({'id': id}, params)))
+
+    async def fetch_order(self, id, symbol=None, params={}):
+        return self.parse_order(await self.fetch2('order', 'private', 'GET', self.extend({'id': id}, params)))
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        request = {'symbol': symbol} if symbol is not None else {}
+        orders = await self.fetch2('orders', 'private', 'GET', self.extend(request, params))
+        return [self.parse_order(order) for order in orders]
+
+    async def fetch_my_trades(self, symbol=None, since=None, limit=None, params={}):
+        request = {}
+        if symbol is not None:
+            request['symbol'] = symbol
+        if since is not None:
+            request['since'] = since
+        trades = await self.fetch2('trades', 'private', 'GET', self.extend(request, params))
+        return [{
+            'id': trade['id'],
+            'order': trade['order'],
+            'timestamp': trade['timestamp'],
+            'datetime': self.iso8601(trade['timestamp']),
+            'symbol': trade['symbol'],
+            'type': 'limit',
+            'side': trade['side'],
+            'takerOrMaker': 'taker',
+            'price': trade['price'],
+            'amount': trade['amount'],
+            'cost': trade['cost'],
+            'fee': {'cost': trade['fee'], 'currency': trade['feeCurrency']},
+            'info': trade
+        } for trade in trades][:limit]
@@ -0,0 +1,207 @@
+from MockExchange import MockExchange, MockVenue
+from MockExchangeClient import MockExchangeClient
+from OrderRequest import OrderRequest, OrderRequestList, OrderRequestStatus, OrderRequestType, SegmentedOrderRequestList
+from Trader import Trader
+from ccxt.base import errors
+import asyncio
+import pytest
+import time
+
+
+def createVenue(fillMode=MockVenue.FILL_IMMEDIATE):
+    venue = MockVenue('kraken', fillMode=fillMode, fillDelaySeconds=0.05, feeRate=0.001)
+    venue.addMarket('ETH/BTC', amountMin=0.01)
+    venue.setOrderbook('ETH/BTC', [[0.03, 10]], [[0.031, 10]])
+    venue.setBalance('BTC', 1)
+    venue.setBalance('ETH', 10)
+    return venue
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class MockExchangeSession:
+    def __init__(self, venues, **kwargs):
+        self.server = MockExchange(venues, **kwargs)
+        self.client = None
+
+    async def __aenter__(self):
+        await self.server.start()
+        self.client = MockExchangeClient({'id': 'kraken', 'name': 'Kraken', 'urls': {'api': self.server.getUrl('kraken')}})
+        await self.client.load_markets()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.client.close()
+        await self.server.stop()
+
+
+class TestClass(object):
+    def test_venueFillsAndBalances(self):
+        venue = createVenue()
+        buy = venue.createOrder('ETH/BTC', 'buy', 1, 0.031)
+        assert buy['status'] == 'closed'
+        assert venue.balances['BTC'] == {'free': pytest.approx(1 - 0.031), 'used': pytest.approx(0)}
+        assert venue.balances['ETH']['free'] == pytest.approx(10 + 1 - 0.001)
+
+        # not crossing: the funds stay reserved until canceled
+        sell = venue.createOrder('ETH/BTC', 'sell', 2, 0.035)
+        assert sell['status'] == 'open'
+        assert venue.balances['ETH']['used'] == pytest.approx(2)
+        venue.cancelOrder(sell['id'])
+        assert venue.balances['ETH']['used'] == pytest.approx(0)
+        assert len(venue.trades) == 1
+
+    def test_partialFillCompletedByBookUpdate(self):
+        venue = createVenue(MockVenue.FILL_PARTIAL)
+        order = venue.createOrder('ETH/BTC', 'sell', 2, 0.03)
+        assert (order['status'], order['filled']) == ('open', 1)
+        venue.setOrderbook('ETH/BTC', [[0.0305, 5]], [[0.031, 10]])
+        assert (order['status'], order['filled']) == ('closed', 2)
+
+    def test_clientOrderLifecycle(self):
+        async def scenario():
+            async with MockExchangeSession([createVenue(MockVenue.FILL_DELAYED)]) as session:
+                client = session.client
+                assert client.markets['ETH/BTC']['limits']['amount']['min'] == 0.01
+                orderbook = await client.fetch_order_book('ETH/BTC')
+                assert orderbook['bids'] == [[0.03, 10]]
+
+                order = await client.createLimitBuyOrder('ETH/BTC', client.amountToPrecision('ETH/BTC', 1), 0.031)
+                assert order['status'] == 'open'
+                assert [openOrder['id'] for openOrder in await client.fetch_open_orders('ETH/BTC')] == [order['id']]
+                await asyncio.sleep(0.1)
+                assert (await client.fetchOrder(order['id']))['status'] == 'closed'
+                assert len(await client.fetch_my_trades('ETH/BTC')) == 1
+                balance = await client.fetch_balance()
+                assert balance['free']['BTC'] == pytest.approx(1 - 0.031)
+
+                with pytest.raises(errors.InsufficientFunds):
+                    await client.createLimitSellOrder('ETH/BTC', 100, 0.03)
+                with pytest.raises(errors.OrderNotFound):
+                    await client.cancelOrder(order['id'])
+        run(scenario())
+
+    def test_rateLimitAndInjectedFailures(self):
+        async def scenario():
+            async with MockExchangeSession([createVenue()], rateLimitPerSecond=5, rateLimitBurst=2) as session:
+                # load_markets took the first token
+                await session.client.fetch_order_book('ETH/BTC')
+                with pytest.raises(errors.RateLimitExceeded):
+                    await session.client.fetch_order_book('ETH/BTC')
+                await asyncio.sleep(0.25)
+                session.server.failNextRequests(1)
+                with pytest.raises(errors.ExchangeNotAvailable):
+                    await session.client.fetch_balance()
+                await asyncio.sleep(0.25)
+                assert 'ETH' in await session.client.fetch_balance()
+        run(scenario())
+
+    def test_traderAgainstMockExchange(self):
+        async def scenario():
+            async with MockExchangeSession([createVenue()]) as session:
+                trader = Trader(is_sandbox_mode=False)
+                await trader.initExchanges({'kraken': session.client})
+                assert trader.get_free_balance('kraken', 'ETH') == 10
+
+                orderRequest = OrderRequest('kraken', 'ETH/BTC', volumeBase=2, limitPrice=0.03, meanPrice=0.03,
+                                            requestType=OrderRequestType.SELL)
+                await trader.createLimitOrdersOnOrderRequestList(OrderRequestList([orderRequest]))
+                assert orderRequest.getStatus() == OrderRequestStatus.CLOSED
+        run(scenario())
+
+    def test_websocketPushes(self):
+        async def scenario():
+            venue = createVenue()
+            async with MockExchangeSession([venue]) as session:
+                websocket = await session.client.session.ws_connect(session.server.getUrl('kraken') + '/ws')
+                await websocket.send_json({'op': 'subscribe', 'channel': 'orderbook', 'symbol': 'ETH/BTC'})
+                await websocket.send_json({'op': 'subscribe', 'channel': 'orders'})
+                assert (await websocket.receive_json(timeout=1))['bids'] == [[0.03, 10]]
+                await asyncio.sleep(0.05)
+                venue.createOrder('ETH/BTC', 'sell', 1, 0.03)
+                statuses = [(await websocket.receive_json(timeout=1))['order']['status'] for _ in range(2)]
+                assert statuses == ['open', 'closed']
+                await websocket.close()
+        run(scenario())
+
+    def test_traderWaitsForOrderCompletion(self):
+        async def scenario():
+            venue = createVenue(MockVenue.FILL_DELAYED)
+            async with MockExchangeSession([venue]) as session:
+                trader = Trader(is_sandbox_mode=False)
+                await trader.initExchanges({'kraken': session.client})
+
+                def placeOrder(uuid, price):
+                    orderRequest = OrderRequest('kraken', 'ETH/BTC', volumeBase=1, limitPrice=price, meanPrice=price,
+                                                requestType=OrderRequestType.SELL)
+                    orderRequest.id = venue.createOrder('ETH/BTC', 'sell', 1, price)['id']
+                    orderRequest.setStatus(OrderRequestStatus.OPEN)
+                    return orderRequest, SegmentedOrderRequestList(uuid, [OrderRequestList([orderRequest])])
+
+                # filled after fillDelaySeconds, found by polling
+                orderRequest, deal = placeOrder('filled', 0.03)
+                t_start = time.time()
+                assert await trader.waitForOrderRequests(deal, timeoutSeconds=5) is True
+                assert orderRequest.getStatus() == OrderRequestStatus.CLOSED
+                assert time.time() - t_start < 1
+
+                # never crosses the book
+                orderRequest, deal = placeOrder('pending', 0.05)
+                assert await trader.waitForOrderRequests(deal, timeoutSeconds=0.3) is False
+                assert orderRequest.getStatus() == OrderRequestStatus.OPEN
+
+                # a pushed fill completes the wait without polling
+                asyncio.get_event_loop().call_later(0.05, trader.onOrderUpdate, 'Kraken', {'id': orderRequest.id, 'status': 'closed'})
+                t_start = time.time()
+                assert await trader.waitForOrderRequests(deal, timeoutSeconds=5) is True
+                assert time.time() - t_start < Trader.ORDER_STATUS_POLL_MIN_S
+        run(scenario())
+
+    def test_pipelinedPlacementOnPartialFill(self):
+        async def scenario():
+            venue = createVenue(MockVenue.FILL_PARTIAL)
+            venue.addMarket('LTC/BTC', amountMin=0.01)
+            venue.setOrderbook('LTC/BTC', [[0.0049, 100]], [[0.005, 100]])
+            venue.setBalance('BTC', 0)
+            async with MockExchangeSession([venue]) as session:
+                trader = Trader(is_sandbox_mode=False, is_pipelined_mode=True)
+                await trader.initExchanges({'kraken': session.client})
+                sell = OrderRequest('kraken', 'ETH/BTC', volumeBase=2, limitPrice=0.03, meanPrice=0.03,
+                                    requestType=OrderRequestType.SELL)
+                buy = OrderRequest('kraken', 'LTC/BTC', volumeBase=4, limitPrice=0.005, meanPrice=0.005,
+                                   requestType=OrderRequestType.BUY)
+                task = asyncio.ensure_future(trader.createLimitOrdersOnOrderRequestList(OrderRequestList([sell, buy])))
+                for _ in range(200):
+                    if buy.id is not None:
+                        break
+                    await asyncio.sleep(0.01)
+                # the half filled sell order covers the input of the buy order
+                assert buy.id is not None
+                assert (venue.orders[sell.id]['status'], venue.orders[sell.id]['filled']) == ('open', 1)
+
+                venue.setOrderbook('ETH/BTC', [[0.0305, 5]], [[0.031, 10]])
+                venue.setOrderbook('LTC/BTC', [[0.0049, 100]], [[0.005, 100]])
+                await asyncio.wait_for(task, timeout=5)
+                assert [sell.getStatus(), buy.getStatus()] == [OrderRequestStatus.CLOSED, OrderRequestStatus.CLOSED]
+        run(scenario())
+
+    def test_pipelinedPlacementOfHeldInputs(self):
+        async def scenario():
+            venue = createVenue(MockVenue.FILL_DELAYED)
+            venue.fillDelaySeconds = 0.5
+            async with MockExchangeSession([venue]) as session:
+                trader = Trader(is_sandbox_mode=False, is_pipelined_mode=True)
+                await trader.initExchanges({'kraken': session.client})
+                sell = OrderRequest('kraken', 'ETH/BTC', volumeBase=2, limitPrice=0.03, meanPrice=0.03,
+                                    requestType=OrderRequestType.SELL)
+                buy = OrderRequest('kraken', 'ETH/BTC', volumeBase=1, limitPrice=0.031, meanPrice=0.031,
+                                   requestType=OrderRequestType.BUY)
+                task = asyncio.ensure_future(trader.createLimitOrdersOnOrderRequestList(OrderRequestList([sell, buy])))
+                await asyncio.sleep(0.2)
+                # the BTC of the buy order is held already, both orders are open at once
+                assert [venue.orders[orderRequest.id]['status'] for orderRequest in (sell, buy)] == ['open', 'open']
+                await asyncio.wait_for(task, timeout=5)
+                assert [sell.getStatus(), buy.getStatus()] == [OrderRequestStatus.CLOSED, OrderRequestStatus.CLOSED]
+        run(scenario())
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+import ccxt.async_support as ccxt
+
+from OrderRequest import OrderRequest
+from RateLimiter import RateLimiter
+
+logger = logging.getLogger('Trader')
+
+
+class OrderStatusPoller:
+    """
+        Fetches the order statuses of one exchange, the requests take tokens of the exchange's RateLimiter with
+        the status priority.
+        If the exchange has fetchOrders or fetchOpenOrders, fetchOrders() of the concurrent callers is coalesced into
+        one request returning every order it can find. An order missing from the open orders is completed (closed or
+        canceled), it's fetched with fetchOrder() by the caller.
+        The batch of several markets is one request without symbol, if the exchange requires the symbol it's split
+        into one request per market from then on.
+    """
+    def __init__(self, exchange, rateLimiter: RateLimiter = None):
+        self.exchange = exchange
+        self.rateLimiter = rateLimiter if rateLimiter is not None else RateLimiter.forExchange(exchange)
+        self.batchMethod = OrderStatusPoller.getBatchMethod(exchange)
+        # the batch request without symbol failed, every market is requested separately
+        self.isSymbolRequired = False
+        # order requests of the next batch and its future
+        self.queued: List[OrderRequest] = []
+        self.nextBatch = None
+        self.nofRequests = 0
+
+    @staticmethod
+    def getBatchMethod(exchange):
+        has = getattr(exchange, 'has', {})
+        if has.get('fetchOrders') is True:
+            return 'fetchOrders'
+        if has.get('fetchOpenOrders') is True:
+            return 'fetchOpenOrders'
+        return None
+
+    def isBatchSupported(self) -> bool:
+        return self.batchMethod is not None
+
+    async def request(self, method: str, *args):
+        self.nofRequests += 1
+        return await self.rateLimiter.request(RateLimiter.PRIORITY_STATUS, getattr(self.exchange, method), *args)
+
+    async def fetchOrder(self, orderRequest: OrderRequest):
+        return await self.request('fetchOrder', orderRequest.id)
+
+    async def fetchOrders(self, orderRequests: List[OrderRequest]) -> Dict[str, dict]:
+        '''
+        :return: {order id: ccxt order} of the order requests found by the batch request, empty if the exchange has no
+                 batch request or it failed
+        '''
+        if not self.isBatchSupported():
+            return {}
+        self.queued.extend(orderRequest for orderRequest in orderRequests if orderRequest.id is not None)
+        if self.nextBatch is None:
+            self.nextBatch = asyncio.ensure_future(self.__runBatch())
+        # a canceled caller doesn't cancel the batch of the others
+        orders = await asyncio.shield(self.nextBatch)
+        return {orderRequest.id: orders[orderRequest.id] for orderRequest in orderRequests if orderRequest.id in orders}
+
+    async def __runBatch(self) -> Dict[str, dict]:
+        # the order requests queued while waiting for the rate limit join this batch
+        await self.rateLimiter.acquire(RateLimiter.PRIORITY_STATUS)
+        self.nextBatch = None
+        orderRequests, self.queued = self.queued, []
+        if not orderRequests or self.batchMethod is None:
+            return {}
+        markets = sorted({orderRequest.market for orderRequest in orderRequests})
+        symbols = [None] if len(markets) > 1 and self.isSymbolRequired is False else markets
+        orders = []
+        isTokenAcquired = True
+        while symbols:
+            symbol = symbols.pop(0)
+            if isTokenAcquired is False:
+                await self.rateLimiter.acquire(RateLimiter.PRIORITY_STATUS)
+            isTokenAcquired = False
+            try:
+                self.nofRequests += 1
+                orders.extend(await getattr(self.exchange, self.batchMethod)(symbol))
+            except (ccxt.DDoSProtection, ccxt.RateLimitExceeded) as e:
+                logger.error(f'{self.batchMethod} failed on {self.exchange.name}: {e}')
+                self.rateLimiter.drain()
+                break
+            except ccxt.ExchangeError as e:
+                if symbol is None:
+                    logger.warning(f'{self.batchMethod} without symbol failed on {self.exchange.name}, '
+                                   f'the markets are requested one by one: {e}')
+                    self.isSymbolRequired = True
+                    symbols = list(markets)
+                    continue
+                # it won't work next time either
+                logger.error(f'{self.batchMethod} failed on {self.exchange.name}, the orders are fetched one by one: {e}')
+                self.batchMethod = None
+                break
+            except ccxt.NetworkError as e:
+                logger.error(f'{self.batchMethod} failed on {self.exchange.name}: {e}')
+                break
+        ids = {orderRequest.id for orderRequest in orderRequests}
+        return {order['id']: order for order in orders if order['id'] in ids}
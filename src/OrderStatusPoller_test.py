@@ -0,0 +1,93 @@
+from MockExchange import MockExchange, MockVenue
+from MockExchangeClient import MockExchangeClient
+from OrderRequest import OrderRequest, OrderRequestStatus, OrderRequestType
+from OrderStatusPoller import OrderStatusPoller
+from Trader import Trader
+import asyncio
+import ccxt.async_support as ccxt
+
+
+def placeOrders(venue, prices):
+    orderRequests = []
+    for price in prices:
+        orderRequest = OrderRequest('kraken', 'ETH/BTC', volumeBase=1, limitPrice=price, meanPrice=price, requestType=OrderRequestType.SELL)
+        orderRequest.id = venue.createOrder('ETH/BTC', 'sell', 1, price)['id']
+        orderRequest.setStatus(OrderRequestStatus.OPEN)
+        orderRequests.append(orderRequest)
+    return orderRequests
+
+
+def runWithMockExchange(scenario):
+    async def run():
+        venue = MockVenue('kraken', fillMode=MockVenue.FILL_IMMEDIATE)
+        venue.addMarket('ETH/BTC')
+        venue.setOrderbook('ETH/BTC', [[0.03, 100]], [[0.031, 100]])
+        venue.setBalance('ETH', 10)
+        server = MockExchange([venue])
+        await server.start()
+        client = MockExchangeClient({'id': 'kraken', 'name': 'kraken', 'urls': {'api': server.getUrl('kraken')}})
+        try:
+            await client.load_markets()
+            await scenario(venue, client)
+        finally:
+            await client.close()
+            await server.stop()
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+class TestClass(object):
+    def test_concurrentCallsShareOneRequest(self):
+        async def scenario(venue, client):
+            poller = OrderStatusPoller(client)
+            assert poller.batchMethod == 'fetchOpenOrders'
+            orderRequests = placeOrders(venue, [0.04, 0.05, 0.06])
+            results = await asyncio.gather(poller.fetchOrders(orderRequests[:1]), poller.fetchOrders(orderRequests[1:]))
+            assert [list(result.keys()) for result in results] == [[orderRequests[0].id], [orderRequests[1].id, orderRequests[2].id]]
+            assert poller.nofRequests == 1
+        runWithMockExchange(scenario)
+
+    def test_traderFallsBackForCompletedOrders(self):
+        async def scenario(venue, client):
+            trader = Trader(is_sandbox_mode=False)
+            await trader.initExchanges({'kraken': client})
+            poller = trader.getOrderStatusPoller('kraken')
+            orderRequests = placeOrders(venue, [0.04, 0.05, 0.06])
+
+            await trader.fetchOrderStatuses(orderRequests)
+            assert poller.nofRequests == 1
+
+            # the first order is filled, it's no longer in the open orders
+            venue.setOrderbook('ETH/BTC', [[0.045, 100]], [[0.046, 100]])
+            await trader.fetchOrderStatuses(orderRequests)
+            assert poller.nofRequests == 3
+            assert [orderRequest.getStatus() for orderRequest in orderRequests] == \
+                [OrderRequestStatus.CLOSED, OrderRequestStatus.OPEN, OrderRequestStatus.OPEN]
+
+            # without a batch request every order is fetched one by one
+            poller.batchMethod = None
+            await trader.fetchOrderStatuses(orderRequests[1:])
+            assert poller.nofRequests == 5
+        runWithMockExchange(scenario)
+
+    def test_batchIsSplitPerSymbolIfRequired(self):
+        async def scenario(venue, client):
+            venue.addMarket('ETH/USD')
+            fetchOpenOrders = client.fetchOpenOrders
+
+            async def fetchOpenOrdersWithSymbol(symbol=None, *args, **kwargs):
+                if symbol is None:
+                    raise ccxt.ExchangeError('symbol is required')
+                return await fetchOpenOrders(symbol, *args, **kwargs)
+            client.fetchOpenOrders = fetchOpenOrdersWithSymbol
+            poller = OrderStatusPoller(client)
+            orderRequests = placeOrders(venue, [0.04])
+            orderRequest = OrderRequest('kraken', 'ETH/USD', volumeBase=1, limitPrice=300, meanPrice=300, requestType=OrderRequestType.SELL)
+            orderRequest.id = venue.createOrder('ETH/USD', 'sell', 1, 300)['id']
+            orderRequests.append(orderRequest)
+
+            orders = await poller.fetchOrders(orderRequests)
+            assert sorted(orders.keys()) == sorted(orderRequest.id for orderRequest in orderRequests)
+            assert (poller.nofRequests, poller.isSymbolRequired, poller.batchMethod) == (3, True, 'fetchOpenOrders')
+            await poller.fetchOrders(orderRequests)
+            assert poller.nofRequests == 5
+        runWithMockExchange(scenario)
@@ -1,4 +1,3 @@
-from ArbitrageGraph import ArbitrageGraph
 from ArbitrageGraphNeo import ArbitrageGraphNeo
 from FeeStore import FeeStore
 from OrderBook import OrderBook, OrderBookPair, Asset
@@ -8,53 +7,19 @@ import logging
 from FWLiveParams import FWLiveParams
 import asyncio
 from utilities import timed
+from Metrics import getRegistry, perf_counter_ns
 from TradingStrategy import TradingStrategy
-from aiokafka import AIOKafkaProducer
-import json
-from multiprocessing import Process, Pipe, Queue
-import numbers
+from KafkaProducerWrapper import KafkaProducerWrapper
+from multiprocessing import Queue
+import queue
 from threading import Thread
 from DealUUIDGenerator import DealUUIDGenerator
+from GraphWorkerPool import GraphWorkerPool
+from OrderbookValidator import OrderbookValidator
 import time
 
 logger = logging.getLogger('CryptoArbitrageApp')
 
-class KafkaProducerWrapper:
-    def __init__(self, kafkaCredentials, eventLoop):
-        self.kafkaProducer = None
-        self.eventLoop = eventLoop
-        if kafkaCredentials is not None:
-            self.topic = kafkaCredentials["topicDeals"]
-            try:
-                self.kafkaProducer = AIOKafkaProducer(
-                    loop=self.eventLoop,
-                    bootstrap_servers=kafkaCredentials["uri"],
-                    value_serializer=lambda v: json.dumps(v).encode('utf-8'))
-                asyncio.ensure_future(self.kafkaProducer.start(), loop=self.eventLoop)
-            except Exception as e:
-                logger.error('Kafka producer initialization failed')
-                
-        else:
-            logger.info('No credentials available for Kafka producer')
-
-    async def sendAsync(self, deal):
-        if self.kafkaProducer is not None:
-            logger.info('Deal published to kafka stream')
-            payload = deal.getLogJSONDump()
-            try:
-                await self.kafkaProducer.send_and_wait(self.topic, payload)
-                logger.info('Deal published to kafka stream')
-            except Exception as e:
-                logger.warning('Failed to publish to Kafka stream ')
-    
-    def __del__(self):
-        if self.kafkaProducer is not None:
-            try:
-                self.eventLoop.run_until_complete(self.kafkaProducer.stop())
-            except Exception as e:
-                logger.error('Error during destroying Kafka producer: '+str(e))
-
-
 class OrderbookAnalyser:
     PRICE_SOURCE_ORDERBOOK = "PRICE_SOURCE_ORDERBOOK"
     PRICE_SOURCE_CMC = "PRICE_SOURCE_CMC"
@@ -69,23 +34,43 @@ class OrderbookAnalyser:
                  neo4j_mode=FWLiveParams.neo4j_mode_disabled,
                  dealfinder_mode=FWLiveParams.dealfinder_mode_networkx,
                  kafkaCredentials=None,
-                 dealFinderRateLimitTimeSeconds=0.05):
+                 dealFinderRateLimitTimeSeconds=0.05,
+                 dealFinderMaxDelaySeconds=0.25,
+                 nofGraphWorkers=None,
+                 exchangeClusters=None,
+                 marketDataRecorder=None,
+                 clock=time.time):
 
         self.dealFinderRateLimitTimeSeconds = dealFinderRateLimitTimeSeconds
+        self.metrics = getRegistry()
+        self.validationLatency = self.metrics.histogram('stage_latency', stage='validation')
+        self.priceLookupLatency = self.metrics.histogram('stage_latency', stage='price_lookup')
+        self.pipeSendLatency = self.metrics.histogram('stage_latency', stage='pipe_send')
+        self.messageCounters = {}
+        self.nofInvalidatedMarkets = self.metrics.counter('stale_markets_invalidated')
         self.eventLoop = asyncio.get_event_loop()
         self.kafkaProducer = KafkaProducerWrapper(kafkaCredentials, eventLoop=self.eventLoop)
         self.dealUUIDGenerator = DealUUIDGenerator()
+        self.dealListeners = []
+        self.marketDataRecorder = marketDataRecorder
+        self.clock = clock
         # create Arbitrage Graph objects
         if dealfinder_mode & FWLiveParams.dealfinder_mode_networkx:
-            self.arbitrageGraphs = [ArbitrageGraph() for count in range(len(vol_BTC))]
-            self.pipes = [Pipe() for count in range(len(vol_BTC))]
-            self.dealQueue = Queue()
-            self.processes = [Process(target=self.updatePointProcess, args=(self.arbitrageGraphs[i], vol_BTC[i], self.pipes[i], self.dealQueue, self.dealFinderRateLimitTimeSeconds)) for i in range(len(vol_BTC))]
+            # the inline deal finder (nofGraphWorkers=0) runs in this process
+            self.dealQueue = queue.Queue() if nofGraphWorkers == 0 else Queue()
+            self.graphWorkerPool = GraphWorkerPool(
+                vol_BTC=vol_BTC,
+                dealQueue=self.dealQueue,
+                nofWorkers=nofGraphWorkers,
+                exchangeClusters=exchangeClusters,
+                dealFinderRateLimitTimeSeconds=self.dealFinderRateLimitTimeSeconds,
+                dealFinderMaxDelaySeconds=dealFinderMaxDelaySeconds,
+                clock=clock)
             #self.dealProcessor = Process(target=self.dealProcess, args=(self.eventLoop, self.dealQueue, trader))
             #self.dealProcessor.daemon = True
-            self.dealProcessorThread = Thread(target=self.dealProcess, args=(self.eventLoop, self.dealQueue, trader, self.kafkaProducer, self.dealUUIDGenerator))
+            self.dealProcessorThread = Thread(target=self.dealProcess, args=(self.eventLoop, self.dealQueue, trader, self.kafkaProducer, self.dealUUIDGenerator, self.dealListeners))
         else:
-            self.arbitrageGraphs = None
+            self.graphWorkerPool = None
 
         if dealfinder_mode & FWLiveParams.dealfinder_mode_neo4j:
             self.arbitrageGraphNeo = ArbitrageGraphNeo(neo4j_mode=neo4j_mode,volumeBTCs=vol_BTC)
@@ -94,6 +79,7 @@ class OrderbookAnalyser:
 
         self.edgeTTL=edgeTTL
         self.feeStore = FeeStore()
+        self.orderbookValidator = OrderbookValidator()
         self.priceStore = PriceStore(priceTTL=priceTTL)
         self.vol_BTC = vol_BTC
         self.resultsdir = resultsdir
@@ -110,70 +96,97 @@ class OrderbookAnalyser:
         #self.dealProcessor.start()
         self.dealProcessorThread.start()
         # kick-of processes
-        for process in self.processes:
-            process.daemon = True
-            process.start()
+        self.graphWorkerPool.start()
 
     def updateCoinmarketcapPrice(self, cmcTicker):
         self.cmcTicker = cmcTicker
+        if self.marketDataRecorder is not None:
+            self.marketDataRecorder.recordCoinmarketcapTicker(cmcTicker, self.clock())
 
     def updateForexPrice(self, forexTicker):
         self.priceStore.updatePriceFromForex(forexTicker)
 
     @staticmethod
-    def dealProcess(eventLoop, dealQueue, trader, kafkaProducer, dealUUIDGenerator):
+    def dealProcess(eventLoop, dealQueue, trader, kafkaProducer, dealUUIDGenerator, dealListeners=()):
+        dealDispatchLatency = getRegistry().histogram('stage_latency', stage='deal_dispatch')
+        nofDealsApproved = getRegistry().counter('deals_approved')
         while True:
-            path = dealQueue.get()  # Read from the queue
-            if path is None:
+            dealRecord = dealQueue.get()  # Read from the queue
+            if dealRecord is None:
                 return
-            path.updateUUID(dealUUIDGenerator)
-            logger.info("NetX Found arbitrage deal: " + str(path))
-            path.log()
+            try:
+                t_start = perf_counter_ns()
+                path = dealRecord.getPath()
+                path.updateUUID(dealUUIDGenerator)
+                logger.info("NetX Found arbitrage deal: " + str(path))
+                path.log()
 
-            asyncio.ensure_future(kafkaProducer.sendAsync(path), loop=eventLoop)
+                kafkaProducer.publish(path)
+                for dealListener in dealListeners:
+                    eventLoop.call_soon_threadsafe(dealListener, path)
 
-            if TradingStrategy.isDealApproved(path) is True:
-                sorl = path.toSegmentedOrderList(volumeMultiplier=OrderbookAnalyser.TRADER_VOLUME_MULTIPLIER )
-                asyncio.ensure_future(trader.execute(sorl), loop=eventLoop)
-                logger.info("Called Trader ensure_future")
+                if TradingStrategy.isDealApproved(path) is True:
+                    sorl = path.toSegmentedOrderList(volumeMultiplier=OrderbookAnalyser.TRADER_VOLUME_MULTIPLIER )
+                    asyncio.ensure_future(trader.execute(sorl), loop=eventLoop)
+                    logger.info("Called Trader ensure_future")
+                    nofDealsApproved.inc()
+                dealDispatchLatency.record(perf_counter_ns() - t_start)
+            finally:
+                # the replay waits for the deals of the queue (join)
+                if isinstance(dealQueue, queue.Queue):
+                    dealQueue.task_done()
 
-    @staticmethod
-    def updatePointProcess(arbitrageGraph, volumeBTC, pipe, dealQueue, dealFinderRateLimitTimeSeconds):
-        p_output, p_input = pipe
+    def addDealListener(self, dealListener):
+        """ dealListener(path) is called on the event loop for every deal found """
+        self.dealListeners.append(dealListener)
 
-        timeOfNextDealfinderCall = time.time()
+    def getRejectionCounters(self):
+        return self.orderbookValidator.getRejectionCounters()
 
-        while True:
-            orderBookPair, timestamp = p_output.recv()    # Read from the output pipe
-            arbitrageGraph.updatePoint(orderBookPair=orderBookPair, volumeBTC=volumeBTC)
-            if timeOfNextDealfinderCall <= time.time():
-                path = arbitrageGraph.getArbitrageDeal(timestamp)
-                if path.isProfitable() is True:
-                    dealQueue.put(path)
-                timeOfNextDealfinderCall = time.time() + dealFinderRateLimitTimeSeconds
+    def getMetricsSummary(self):
+        self.collectMetrics()
+        return self.metrics.summary()
 
-    @staticmethod
-    def __isOrderbookFormatValid(orderbook):
-        return (not orderbook) or \
-               any(not isinstance(entry, list) for entry in orderbook) or \
-               any(not isinstance(entry[0], numbers.Number) or
-                   not isinstance(entry[1], numbers.Number) for entry in orderbook)
+    def collectMetrics(self):
+        for reason, count in self.orderbookValidator.getRejectionCounters().items():
+            self.metrics.counter('orderbook_rejected', reason=reason).value = count
+        if self.graphWorkerPool is not None:
+            self.graphWorkerPool.collectMetrics(self.metrics)
+            for loadMetrics in self.graphWorkerPool.getLoadMetrics():
+                worker = str(loadMetrics['worker'])
+                self.metrics.gauge('graph_worker_pipe_backlog', worker=worker).set(loadMetrics['pipeBacklog'])
+                self.metrics.gauge('graph_worker_utilisation', worker=worker).set(loadMetrics['utilisation'])
+                self.metrics.gauge('graph_worker_max_staleness_seconds', worker=worker).set(loadMetrics['maxStalenessSeconds'])
+                self.metrics.counter('graph_worker_conflated_updates', worker=worker).value = loadMetrics['conflatedUpdates']
+
+    def countMessage(self, exchangename):
+        try:
+            counter = self.messageCounters[exchangename]
+        except KeyError:
+            counter = self.messageCounters[exchangename] = self.metrics.counter('orderbook_messages', exchange=str(exchangename))
+        counter.inc()
 
-    @timed
+    def dumpMetricsIfDue(self):
+        if self.metrics.isSummaryDue():
+            self.collectMetrics()
+            self.metrics.dumpIfDue()
+
+    @timed('ingest')
     def update(self, exchangename, symbol, bids, asks, timestamp):
-        # Validate inputs and reject if invalid
-        if isinstance(exchangename, str) is False:
-            raise Exception("Invalid exchange name is not a string: " + str(exchangename)+" "+str(symbol))
-        if (isinstance(symbol, str) is False) or (symbol.find("/") == -1):
-            raise Exception("Invalid symbol:"+symbol + " "+str(exchangename))
-        if self.__isOrderbookFormatValid(bids):
-            raise Exception("Invalid bids format on " + str(exchangename)+" "+str(symbol)+", bids:"+str(bids))
-        if self.__isOrderbookFormatValid(asks):
-            raise Exception("Invalid asks format on " + str(exchangename)+" "+str(symbol)+", bids:"+str(asks))
-        if not isinstance(timestamp, numbers.Number):
-            raise Exception("Invalid timestamp on " + str(exchangename) + " " + str(symbol)+":"+str(timestamp))
-        if bids[0][0] >= asks[0][0] and str(exchangename).lower() != "sfox":
-            raise Exception("Bid is higher than ask on " + str(exchangename) + " " + str(symbol) + ":" + str(timestamp))
+        self.countMessage(exchangename)
+        # Validate and normalize inputs, invalid snapshots are counted and dropped
+        t_start = perf_counter_ns()
+        validated = self.orderbookValidator.validate(exchangename, symbol, bids, asks, timestamp)
+        self.validationLatency.record(perf_counter_ns() - t_start)
+        self.dumpMetricsIfDue()
+        if validated is None:
+            return
+        symbolBase, symbolQuote, bids, asks = validated
+        feeRate = self.feeStore.getTakerFee(exchangename, symbol)
+        if self.marketDataRecorder is not None:
+            self.marketDataRecorder.recordOrderbook(exchangename, symbol, bids, asks, timestamp, feeRate)
+
+        t_start = perf_counter_ns()
 
         if self.priceSource == OrderbookAnalyser.PRICE_SOURCE_ORDERBOOK:
             self.priceStore.updatePriceFromOrderBook(
@@ -193,13 +206,14 @@ class OrderbookAnalyser:
 
         rateBTCxBase = self.priceStore.getMeanPrice(
             symbol_base_ref='BTC',
-            symbol_quote_ref=symbol.split('/')[0],
+            symbol_quote_ref=symbolBase,
             timestamp=timestamp)
 
         rateBTCxQuote = self.priceStore.getMeanPrice(
             symbol_base_ref='BTC',
-            symbol_quote_ref=symbol.split('/')[1],
+            symbol_quote_ref=symbolQuote,
             timestamp=timestamp)
+        self.priceLookupLatency.record(perf_counter_ns() - t_start)
 
         # Price store doesn't have an exchange rate for this trading pair
         # therefore trading graph won't be updated
@@ -214,7 +228,7 @@ class OrderbookAnalyser:
             bids=bids,
             rateBTCxBase=rateBTCxBase,
             rateBTCxQuote=rateBTCxQuote,
-            feeRate=self.feeStore.getTakerFee(exchangename, symbol),
+            feeRate=feeRate,
             timeToLiveSec=self.edgeTTL)
 
 
@@ -241,9 +255,11 @@ class OrderbookAnalyser:
         '''
         # ArbitrageGraph deal finder (NetworkX)
         if self.dealfinder_mode & FWLiveParams.dealfinder_mode_networkx:
-            for idx, pipe in enumerate(self.pipes):
-                pipe[1].send((orderBookPair, timestamp))
-                '''arbitrageGraph.updatePoint(orderBookPair=orderBookPair,volumeBTC = self.vol_BTC[idx])
+            t_start = perf_counter_ns()
+            self.graphWorkerPool.route(orderBookPair, timestamp)
+            self.pipeSendLatency.record(perf_counter_ns() - t_start)
+            '''for idx, arbitrageGraph in enumerate(self.arbitrageGraphs):
+                arbitrageGraph.updatePoint(orderBookPair=orderBookPair,volumeBTC = self.vol_BTC[idx])
                 path = arbitrageGraph.getArbitrageDeal(timestamp)
                 if path.isProfitable() is True:
                     logger.info("NetX Found arbitrage deal: "+str(path))
@@ -255,16 +271,36 @@ class OrderbookAnalyser:
                         asyncio.ensure_future(self.trader.execute(sorl))
                         logger.info("Called Trader ensure_future")'''
 
+    def updateBatch(self, updates):
+        """ updates: [(exchangename, symbol, bids, asks, timestamp), ...] """
+        for exchangename, symbol, bids, asks, timestamp in updates:
+            try:
+                self.update(exchangename, symbol, bids, asks, timestamp)
+            except Exception as e:
+                logger.error('Error updating orderbook analyser: ' + str(e))
+
+    def invalidateMarkets(self, markets):
+        """ markets: [(exchangename, symbol), ...] whose orderbooks are stale, their graph edges are removed """
+        if self.graphWorkerPool is None:
+            return
+        for exchangename, symbol in markets:
+            self.graphWorkerPool.invalidate(exchangename, symbol)
+            self.nofInvalidatedMarkets.inc()
+
     def terminate(self):
         self.isRunning = False
+        if self.marketDataRecorder is not None:
+            self.marketDataRecorder.stop()
 
         self.dealQueue.put(None)
-        for process in self.processes:
-            process.terminate()
+        self.graphWorkerPool.terminate()
 
         self.kafkaProducer.__del__()
 
+    def getGraphWorkerLoadMetrics(self):
+        return self.graphWorkerPool.getLoadMetrics()
+
     def plotGraphs(self):
-        for idx, arbitrageGraph in enumerate(self.arbitrageGraphs):
-            arbitrageGraph.plotGraph(
-                figid=(idx + 1), vol_BTC=self.vol_BTC[idx])
+        for shard in self.graphWorkerPool.shards:
+            shard.arbitrageGraph.plotGraph(
+                figid=(shard.shardId + 1), vol_BTC=shard.volumeBTC)
@@ -123,7 +123,7 @@ class TestClass(object):
                 orderbookAnalyser.arbitrageGraphNeo.graphDB.resetDBData()
             
             mocker.spy(orderbookAnalyser.trader, 'execute')
-            mocker.spy(orderbookAnalyser.kafkaProducer, 'sendAsync')
+            mocker.spy(orderbookAnalyser.kafkaProducer, 'publish')
             orderbookAnalyser.updateCoinmarketcapPrice(cmc)
             orderbookAnalyser.update(
                 'kraken',
@@ -149,7 +149,7 @@ class TestClass(object):
             time.sleep(SLEEP_TIME)
 
             assert orderbookAnalyser.trader.execute.call_count == len(vol_BTC)
-            assert orderbookAnalyser.kafkaProducer.sendAsync.call_count == len(vol_BTC)
+            assert orderbookAnalyser.kafkaProducer.publish.call_count == len(vol_BTC)
             orderRequestLists = orderbookAnalyser.trader.execute.call_args_list[0][0][0].getOrderRequestLists()[0].getOrderRequests()
             
             orderRequestList = orderRequestLists[0]
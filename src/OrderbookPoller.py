@@ -0,0 +1,112 @@
+from RateLimiter import RateLimiter
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class OrderbookPoller:
+    """
+        Polls the orderbooks of one exchange. The requests take tokens of the public bucket of the exchange's
+        RateLimiter with the lowest priority and are issued concurrently up to its burst. The next symbol to fetch
+        is the one with the highest priority:
+            staleness [s] * (1 + DEAL_ACTIVITY_WEIGHT * deal activity)
+        where the deal activity is the number of recent deals that traded the symbol, decayed with
+        DEAL_ACTIVITY_HALF_LIFE_SECONDS.
+    """
+    DEAL_ACTIVITY_WEIGHT = 4.0
+    DEAL_ACTIVITY_HALF_LIFE_SECONDS = 300
+    ORDERBOOK_LIMIT = 20
+
+    def __init__(self, exchange, symbols, onOrderbook, tokenBucket=None, maxConcurrency=None, clock=time.time, rateLimiter=None):
+        self.exchange = exchange
+        # duplicates would only be fetched more often
+        self.symbols = list(dict.fromkeys(symbols))
+        self.onOrderbook = onOrderbook
+        # a token bucket of its own or the shared rate limit of the exchange
+        if rateLimiter is None:
+            rateLimiter = RateLimiter(exchange.name, tokenBucket) if tokenBucket is not None else RateLimiter.forExchange(exchange)
+        self.rateLimiter = rateLimiter
+        self.tokenBucket = rateLimiter.getBucket(isPrivate=False)
+        self.maxConcurrency = maxConcurrency if maxConcurrency is not None else self.tokenBucket.burst
+        self.clock = clock
+
+        self.timeOfLastFetch = {symbol: None for symbol in self.symbols}
+        self.dealActivity = {symbol: (0, 0) for symbol in self.symbols}  # symbol: (activity, time of last update)
+        self.symbolsByCurrencies = {frozenset(symbol.split('/')): symbol for symbol in self.symbols}
+        self.inFlight = set()
+        self.slotReleased = asyncio.Event()
+        self.isRunning = False
+        self.nofRequests = 0
+        self.nofErrors = 0
+
+    def getDealActivity(self, symbol, now):
+        activity, timeOfUpdate = self.dealActivity[symbol]
+        return activity * math.pow(0.5, (now - timeOfUpdate) / OrderbookPoller.DEAL_ACTIVITY_HALF_LIFE_SECONDS)
+
+    def recordDeal(self, symbol, now=None):
+        if symbol not in self.dealActivity:
+            return
+        if now is None:
+            now = self.clock()
+        self.dealActivity[symbol] = (self.getDealActivity(symbol, now) + 1, now)
+
+    def recordDealByCurrencies(self, currencyA, currencyB, now=None):
+        """ The deal traded currencyA against currencyB on this exchange """
+        symbol = self.symbolsByCurrencies.get(frozenset((currencyA, currencyB)))
+        if symbol is not None:
+            self.recordDeal(symbol, now)
+
+    def getPriority(self, symbol, now):
+        timeOfLastFetch = self.timeOfLastFetch[symbol]
+        if timeOfLastFetch is None:
+            return math.inf
+        return (now - timeOfLastFetch) * (1 + OrderbookPoller.DEAL_ACTIVITY_WEIGHT * self.getDealActivity(symbol, now))
+
+    def getNextSymbol(self, now=None):
+        """ Symbol with the highest priority that isn't being fetched, None if all of them are in flight """
+        if now is None:
+            now = self.clock()
+        candidates = [symbol for symbol in self.symbols if symbol not in self.inFlight]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda symbol: self.getPriority(symbol, now))
+
+    async def fetch(self, symbol):
+        try:
+            orderbook = await self.exchange.fetch_order_book(symbol, limit=OrderbookPoller.ORDERBOOK_LIMIT)
+            self.timeOfLastFetch[symbol] = self.clock()
+            self.onOrderbook(symbol, orderbook)
+        except Exception as error:
+            self.nofErrors += 1
+            # the failed symbol is retried later, not immediately
+            self.timeOfLastFetch[symbol] = self.clock()
+            if type(error).__name__ in ('DDoSProtection', 'RateLimitExceeded'):
+                self.rateLimiter.drain(isPrivate=False)
+            logger.error('Fetch orderbook error ' + str(self.exchange.name) + " " + symbol + ": " + type(error).__name__ + " " + str(error.args))
+        finally:
+            self.inFlight.discard(symbol)
+            self.slotReleased.set()
+
+    async def run(self):
+        self.isRunning = True
+        while self.isRunning:
+            if len(self.inFlight) >= self.maxConcurrency or len(self.inFlight) >= len(self.symbols):
+                self.slotReleased.clear()
+                await self.slotReleased.wait()
+                continue
+
+            await self.rateLimiter.acquire(RateLimiter.PRIORITY_MARKET_DATA, isPrivate=False)
+            # picked after the token wait, so the priorities are up to date
+            symbol = self.getNextSymbol()
+            if symbol is None:
+                continue
+            self.inFlight.add(symbol)
+            self.nofRequests += 1
+            asyncio.ensure_future(self.fetch(symbol))
+
+    def stop(self):
+        self.isRunning = False
+        self.slotReleased.set()
@@ -0,0 +1,108 @@
+from OrderbookPoller import OrderbookPoller
+from TokenBucket import TokenBucket
+import asyncio
+import time
+
+
+class FakeExchange:
+    """ Local fake exchange: fixed latency, records the request times and the concurrency """
+    id = 'fake'
+    name = 'Fake'
+    rateLimit = 100
+
+    def __init__(self, latencySeconds=0.05, failingSymbols=()):
+        self.latencySeconds = latencySeconds
+        self.failingSymbols = failingSymbols
+        self.requests = []
+        self.concurrency = 0
+        self.maxConcurrency = 0
+
+    async def fetch_order_book(self, symbol, limit=None):
+        self.requests.append((time.monotonic(), symbol))
+        self.concurrency += 1
+        self.maxConcurrency = max(self.maxConcurrency, self.concurrency)
+        try:
+            await asyncio.sleep(self.latencySeconds)
+            if symbol in self.failingSymbols:
+                raise Exception('fake exchange error')
+            return {'bids': [[9000, 1]], 'asks': [[9001, 1]]}
+        finally:
+            self.concurrency -= 1
+
+
+def runPoller(poller, seconds):
+    loop = asyncio.get_event_loop()
+    task = asyncio.ensure_future(poller.run())
+    loop.run_until_complete(asyncio.sleep(seconds))
+    poller.stop()
+    loop.run_until_complete(asyncio.sleep(0.1))
+    task.cancel()
+
+
+class TestClass(object):
+
+    def test_concurrentUpToBurst(self):
+        exchange = FakeExchange(latencySeconds=0.1)
+        received = []
+        poller = OrderbookPoller(
+            exchange=exchange,
+            symbols=['BTC/USD', 'ETH/USD', 'ETH/BTC', 'LTC/BTC', 'XRP/BTC', 'BTC/USD'],
+            onOrderbook=lambda symbol, orderbook: received.append(symbol),
+            tokenBucket=TokenBucket(ratePerSecond=20, burst=4))
+        assert poller.symbols == ['BTC/USD', 'ETH/USD', 'ETH/BTC', 'LTC/BTC', 'XRP/BTC']
+
+        runPoller(poller, 0.5)
+        # the burst is issued at once
+        assert exchange.maxConcurrency == 4
+        assert sorted(symbol for t, symbol in exchange.requests[:4]) == ['BTC/USD', 'ETH/BTC', 'ETH/USD', 'LTC/BTC']
+        # sustained rate: burst + 0.5 s * 20 requests/s
+        assert len(exchange.requests) <= 4 + 11
+        assert set(received) == set(poller.symbols)
+
+    def test_rateLimitWithoutBurst(self):
+        exchange = FakeExchange(latencySeconds=0.01)
+        poller = OrderbookPoller(exchange=exchange, symbols=['BTC/USD', 'ETH/USD'], onOrderbook=lambda symbol, orderbook: None)
+        # ccxt rateLimit of the unknown venue: 100 ms
+        assert poller.tokenBucket.ratePerSecond == 10
+        runPoller(poller, 0.35)
+        assert 3 <= len(exchange.requests) <= 5
+        assert exchange.maxConcurrency == 1
+
+    def test_priorities(self):
+        now = 1000
+        poller = OrderbookPoller(exchange=FakeExchange(), symbols=['BTC/USD', 'ETH/USD', 'ETH/BTC'], onOrderbook=None)
+        assert poller.getNextSymbol(now) == 'BTC/USD'   # never fetched
+        poller.timeOfLastFetch = {'BTC/USD': now - 1, 'ETH/USD': now - 2, 'ETH/BTC': now - 3}
+        assert poller.getNextSymbol(now) == 'ETH/BTC'  # stalest
+        poller.recordDealByCurrencies('USD', 'BTC', now)
+        assert poller.getNextSymbol(now) == 'BTC/USD'   # traded by a recent deal
+        poller.inFlight.add('BTC/USD')
+        assert poller.getNextSymbol(now) == 'ETH/BTC'
+        # the deal activity decays
+        assert poller.getDealActivity('BTC/USD', now + OrderbookPoller.DEAL_ACTIVITY_HALF_LIFE_SECONDS) == 0.5
+
+    def test_dealActivityRaisesRefreshRate(self):
+        exchange = FakeExchange(latencySeconds=0.01)
+        poller = OrderbookPoller(
+            exchange=exchange,
+            symbols=['BTC/USD', 'ETH/USD', 'ETH/BTC', 'LTC/BTC'],
+            onOrderbook=lambda symbol, orderbook: None,
+            tokenBucket=TokenBucket(ratePerSecond=40, burst=1))
+        for idx in range(5):
+            poller.recordDeal('ETH/BTC')
+        runPoller(poller, 0.6)
+        counts = {symbol: sum(1 for t, s in exchange.requests if s == symbol) for symbol in poller.symbols}
+        assert counts['ETH/BTC'] > 2 * counts['LTC/BTC']
+
+    def test_errorsAreRetriedLater(self):
+        exchange = FakeExchange(latencySeconds=0.01, failingSymbols=['ETH/USD'])
+        received = []
+        poller = OrderbookPoller(
+            exchange=exchange,
+            symbols=['BTC/USD', 'ETH/USD'],
+            onOrderbook=lambda symbol, orderbook: received.append(symbol),
+            tokenBucket=TokenBucket(ratePerSecond=20, burst=1))
+        runPoller(poller, 0.3)
+        assert poller.nofErrors > 0
+        assert 'BTC/USD' in received and 'ETH/USD' not in received
+        assert poller.inFlight == set()
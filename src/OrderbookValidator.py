@@ -0,0 +1,117 @@
+import numbers
+import logging
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class OrderbookValidator:
+    """
+        Single-pass validator and normalizer for the orderbook snapshots entering OrderbookAnalyser.update.
+        Invalid snapshots are not raised as exceptions, they are counted per rejection reason.
+    """
+    REJECT_EXCHANGE = "exchange"
+    REJECT_SYMBOL = "symbol"
+    REJECT_TIMESTAMP = "timestamp"
+    REJECT_BIDS_FORMAT = "bids_format"
+    REJECT_ASKS_FORMAT = "asks_format"
+    REJECT_BIDS_ORDER = "bids_order"
+    REJECT_ASKS_ORDER = "asks_order"
+    REJECT_NON_POSITIVE = "non_positive"
+    REJECT_CROSSED = "crossed"
+
+    # exchanges where the top of the book is allowed to be crossed
+    CROSSED_BOOK_EXEMPT_EXCHANGES = ("sfox",)
+
+    __NUMERIC_TYPES = (float, int)
+
+    def __init__(self):
+        self.__symbolCache = {}
+        self.rejectionCounters = {}
+        self.nofAccepted = 0
+
+    def getRejectionCounters(self):
+        return dict(self.rejectionCounters)
+
+    def getNofRejected(self):
+        return sum(self.rejectionCounters.values())
+
+    def __reject(self, reason):
+        self.rejectionCounters[reason] = self.rejectionCounters.get(reason, 0) + 1
+        return None
+
+    def splitSymbol(self, symbol):
+        """ Returns (base, quote) of a 'BASE/QUOTE' symbol or None if invalid. Results are cached per symbol. """
+        try:
+            return self.__symbolCache[symbol]
+        except KeyError:
+            pass
+        except TypeError:  # unhashable
+            return None
+
+        if not isinstance(symbol, str):
+            return None
+        symbolsplit = symbol.split('/')
+        if len(symbolsplit) != 2 or not symbolsplit[0] or not symbolsplit[1]:
+            return None
+        self.__symbolCache[symbol] = (symbolsplit[0], symbolsplit[1])
+        return self.__symbolCache[symbol]
+
+    @staticmethod
+    def __normalizeSide(orderbook, isDescending, rejectFormat, rejectOrder):
+        """ Returns (normalized orderbook, None) or (None, rejection reason) """
+        if not orderbook or not isinstance(orderbook, (list, tuple)):
+            return None, rejectFormat
+
+        numericTypes = OrderbookValidator.__NUMERIC_TYPES
+        normalized = []
+        previousPrice = None
+        for entry in orderbook:
+            if not isinstance(entry, (list, tuple)) or len(entry) < 2:
+                return None, rejectFormat
+            price = entry[0]
+            volume = entry[1]
+            if type(price) not in numericTypes or type(volume) not in numericTypes:
+                if not isinstance(price, numbers.Real) or not isinstance(volume, numbers.Real) or \
+                        isinstance(price, bool) or isinstance(volume, bool):
+                    return None, rejectFormat
+            if price <= 0 or volume <= 0:
+                return None, OrderbookValidator.REJECT_NON_POSITIVE
+            if previousPrice is not None:
+                if (isDescending and price > previousPrice) or (not isDescending and price < previousPrice):
+                    return None, rejectOrder
+            previousPrice = price
+            normalized.append([float(price), float(volume)])
+
+        return normalized, None
+
+    def validate(self, exchangename, symbol, bids, asks, timestamp):
+        """
+            Validates shape, price ordering (bids descending, asks ascending), positivity and crossed books
+            in one pass and converts the levels to [float price, float volume] lists.
+            :return: (symbolBase, symbolQuote, bids, asks) or None if the snapshot is rejected
+        """
+        if not isinstance(exchangename, str):
+            return self.__reject(OrderbookValidator.REJECT_EXCHANGE)
+
+        symbolsplit = self.splitSymbol(symbol)
+        if symbolsplit is None:
+            return self.__reject(OrderbookValidator.REJECT_SYMBOL)
+
+        if not isinstance(timestamp, numbers.Real) or isinstance(timestamp, bool):
+            return self.__reject(OrderbookValidator.REJECT_TIMESTAMP)
+
+        bids, reason = OrderbookValidator.__normalizeSide(
+            bids, True, OrderbookValidator.REJECT_BIDS_FORMAT, OrderbookValidator.REJECT_BIDS_ORDER)
+        if reason is not None:
+            return self.__reject(reason)
+
+        asks, reason = OrderbookValidator.__normalizeSide(
+            asks, False, OrderbookValidator.REJECT_ASKS_FORMAT, OrderbookValidator.REJECT_ASKS_ORDER)
+        if reason is not None:
+            return self.__reject(reason)
+
+        if bids[0][0] >= asks[0][0] and exchangename.lower() not in OrderbookValidator.CROSSED_BOOK_EXEMPT_EXCHANGES:
+            return self.__reject(OrderbookValidator.REJECT_CROSSED)
+
+        self.nofAccepted += 1
+        return symbolsplit[0], symbolsplit[1], bids, asks
@@ -0,0 +1,52 @@
+from OrderbookValidator import OrderbookValidator
+
+
+class TestClass(object):
+
+    def test_validOrderbookIsNormalized(self):
+        validator = OrderbookValidator()
+        ret = validator.validate('kraken', 'BTC/USD', bids=[[9000, 1], [8999.5, 2]], asks=[(9001, 1.5), [9002, 3, 'extra']], timestamp=100)
+        assert ret == ('BTC', 'USD', [[9000.0, 1.0], [8999.5, 2.0]], [[9001.0, 1.5], [9002.0, 3.0]])
+        assert all(isinstance(value, float) for entry in ret[2] + ret[3] for value in entry)
+        assert validator.nofAccepted == 1
+        assert validator.getNofRejected() == 0
+
+    def test_rejectionsAreCountedPerReason(self):
+        validator = OrderbookValidator()
+        bids = [[9000, 1]]
+        asks = [[9001, 1]]
+        assert validator.validate(None, 'BTC/USD', bids, asks, 1) is None
+        assert validator.validate('kraken', 'BTCUSD', bids, asks, 1) is None
+        assert validator.validate('kraken', 'BTC/USD', bids, asks, '1') is None
+        assert validator.validate('kraken', 'BTC/USD', [], asks, 1) is None
+        assert validator.validate('kraken', 'BTC/USD', [['9000', 1]], asks, 1) is None
+        assert validator.validate('kraken', 'BTC/USD', bids, '[[9001, 1]]', 1) is None
+        assert validator.validate('kraken', 'BTC/USD', [[9000, 1], [9000.5, 1]], asks, 1) is None
+        assert validator.validate('kraken', 'BTC/USD', bids, [[9001, 1], [9000.5, 1]], 1) is None
+        assert validator.validate('kraken', 'BTC/USD', bids, [[9001, 0]], 1) is None
+        assert validator.validate('kraken', 'BTC/USD', [[-1, 1]], asks, 1) is None
+        assert validator.validate('kraken', 'BTC/USD', [[9002, 1]], asks, 1) is None
+
+        assert validator.getRejectionCounters() == {
+            OrderbookValidator.REJECT_EXCHANGE: 1,
+            OrderbookValidator.REJECT_SYMBOL: 1,
+            OrderbookValidator.REJECT_TIMESTAMP: 1,
+            OrderbookValidator.REJECT_BIDS_FORMAT: 2,
+            OrderbookValidator.REJECT_ASKS_FORMAT: 1,
+            OrderbookValidator.REJECT_BIDS_ORDER: 1,
+            OrderbookValidator.REJECT_ASKS_ORDER: 1,
+            OrderbookValidator.REJECT_NON_POSITIVE: 2,
+            OrderbookValidator.REJECT_CROSSED: 1,
+        }
+        assert validator.nofAccepted == 0
+
+    def test_crossedBookExemptExchange(self):
+        validator = OrderbookValidator()
+        assert validator.validate('SFOX', 'BTC/USD', [[9002, 1]], [[9001, 1]], 1) is not None
+
+    def test_splitSymbolCache(self):
+        validator = OrderbookValidator()
+        assert validator.splitSymbol('ETH/BTC') == ('ETH', 'BTC')
+        assert validator.splitSymbol('ETH/BTC') is validator.splitSymbol('ETH/BTC')
+        assert validator.splitSymbol('ETH/BTC/X') is None
+        assert validator.splitSymbol(['ETH/BTC']) is None
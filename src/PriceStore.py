@@ -1,5 +1,5 @@
 import ast
-import dateutil.parser as dp
+from utilities import parseIsoTimestamp
 import logging
 
 logger = logging.getLogger('CryptoArbitrageApp')
@@ -23,7 +23,7 @@ class PriceStore:
         symbol_base = ('forex', symbolsplit[0])
         symbol_quote = ('forex', symbolsplit[1])
 
-        timestamp = int(dp.parse(forexTicker['time']).strftime('%s'))
+        timestamp = int(parseIsoTimestamp(forexTicker['time']))
         key1 = (symbol_quote, symbol_base)
         key2 = (symbol_base, symbol_quote)
         self.price[key1] = (timestamp, 1 / forexTicker['ask'])
@@ -0,0 +1,141 @@
+from TokenBucket import TokenBucket
+import asyncio
+import heapq
+import itertools
+import logging
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class RateLimiter:
+    """
+        Shared rate limit of one exchange: a token bucket for the public and one for the private endpoints, every
+        request of the pollers, the Trader and TraderHistory takes a token of it (forExchange() returns the same
+        instance for the ccxt instances of the same exchange id).
+        The waiting requests of a bucket are served by priority, then in arrival order. A request can take a token
+        if there are more tokens than waiting requests ahead of it, so order placement never waits behind history polling.
+    """
+    PRIORITY_ORDER = 0
+    PRIORITY_CANCEL = 1
+    PRIORITY_STATUS = 2
+    PRIORITY_HISTORY = 3
+    PRIORITY_MARKET_DATA = 4
+    PRIORITY_NAMES = {
+        PRIORITY_ORDER: 'order',
+        PRIORITY_CANCEL: 'cancel',
+        PRIORITY_STATUS: 'status',
+        PRIORITY_HISTORY: 'history',
+        PRIORITY_MARKET_DATA: 'marketdata'
+    }
+    # (requests per second, burst) of the public endpoints, by ccxt exchange id
+    VENUE_RATE_LIMITS = {
+        'kraken': (1, 15),
+        'bitstamp': (8, 8),
+        'gdax': (3, 6),
+        'coinbasepro': (3, 6),
+        'poloniex': (6, 6),
+        'bittrex': (1, 3),
+        'coinfloor': (1, 3)
+    }
+    # (requests per second, burst) of the private endpoints, by ccxt exchange id
+    VENUE_PRIVATE_RATE_LIMITS = {
+        'kraken': (0.33, 15),
+        'bitstamp': (8, 8),
+        'gdax': (5, 10),
+        'coinbasepro': (5, 10),
+        'poloniex': (6, 6),
+        'bittrex': (1, 3),
+        'coinfloor': (1, 3)
+    }
+    # exchange id: RateLimiter
+    instances = {}
+
+    def __init__(self, name, publicBucket: TokenBucket, privateBucket: TokenBucket = None):
+        self.name = name
+        self.buckets = {
+            False: publicBucket,
+            True: privateBucket if privateBucket is not None else TokenBucket(publicBucket.ratePerSecond, publicBucket.burst)
+        }
+        # isPrivate: heap of (priority, sequence) of the waiting requests
+        self.queues = {False: [], True: []}
+        self.sequence = itertools.count()
+        self.nofRequests = {priority: 0 for priority in RateLimiter.PRIORITY_NAMES}
+        self.nofRateLimitErrors = 0
+
+    @staticmethod
+    def getVenueId(exchange):
+        ''' ccxt id of the exchange class, the configured id may differ (e.g. a mock exchange named after the venue) '''
+        try:
+            return exchange.describe()['id']
+        except Exception:
+            return getattr(exchange, 'id', None)
+
+    @staticmethod
+    def createForExchange(exchange):
+        venueId = RateLimiter.getVenueId(exchange)
+        # ccxt rateLimit: minimum delay between two requests [ms]
+        default = (1000 / exchange.rateLimit, 1)
+        publicRate, publicBurst = RateLimiter.VENUE_RATE_LIMITS.get(venueId, default)
+        privateRate, privateBurst = RateLimiter.VENUE_PRIVATE_RATE_LIMITS.get(venueId, default)
+        return RateLimiter(getattr(exchange, 'id', venueId),
+                           TokenBucket(ratePerSecond=publicRate, burst=publicBurst),
+                           TokenBucket(ratePerSecond=privateRate, burst=privateBurst))
+
+    @staticmethod
+    def forExchange(exchange):
+        key = getattr(exchange, 'id', None) or exchange.name
+        if key not in RateLimiter.instances:
+            RateLimiter.instances[key] = RateLimiter.createForExchange(exchange)
+        return RateLimiter.instances[key]
+
+    def getBucket(self, isPrivate=True) -> TokenBucket:
+        return self.buckets[isPrivate]
+
+    def getQueueDepth(self, isPrivate=None, priority=None) -> int:
+        queues = self.queues.values() if isPrivate is None else [self.queues[isPrivate]]
+        return sum(1 for queue in queues for entry in queue if priority is None or entry[0] == priority)
+
+    async def acquire(self, priority, isPrivate=True):
+        bucket = self.buckets[isPrivate]
+        queue = self.queues[isPrivate]
+        entry = (priority, next(self.sequence))
+        heapq.heappush(queue, entry)
+        try:
+            while True:
+                # waiting requests served before this one
+                ahead = sum(1 for other in queue if other < entry)
+                if bucket.getTokens() >= ahead + 1 and bucket.tryAcquire():
+                    break
+                await asyncio.sleep(max(bucket.getWaitTimeSeconds(ahead + 1), 0.001))
+        finally:
+            queue.remove(entry)
+            heapq.heapify(queue)
+        self.nofRequests[priority] += 1
+
+    async def request(self, priority, function, *args, isPrivate=True, **kwargs):
+        ''' Awaits function(*args, **kwargs) after acquire(), a rate limit error of the venue drains the bucket '''
+        await self.acquire(priority, isPrivate)
+        return await self.call(function, *args, isPrivate=isPrivate, **kwargs)
+
+    async def call(self, function, *args, isPrivate=True, **kwargs):
+        ''' Awaits function(*args, **kwargs) with the token acquired by the caller, see request() '''
+        try:
+            return await function(*args, **kwargs)
+        except Exception as error:
+            if type(error).__name__ in ('DDoSProtection', 'RateLimitExceeded'):
+                self.drain(isPrivate)
+            raise
+
+    def drain(self, isPrivate=True):
+        self.nofRateLimitErrors += 1
+        self.buckets[isPrivate].drain()
+
+    def collectMetrics(self, metrics):
+        for isPrivate in (False, True):
+            bucket = 'private' if isPrivate else 'public'
+            for priority, name in RateLimiter.PRIORITY_NAMES.items():
+                metrics.gauge('rate_limiter_queue_depth', exchange=str(self.name), bucket=bucket, priority=name) \
+                    .set(self.getQueueDepth(isPrivate, priority))
+        for priority, name in RateLimiter.PRIORITY_NAMES.items():
+            metrics.counter('rate_limiter_requests', exchange=str(self.name), priority=name).value = self.nofRequests[priority]
+        metrics.counter('rate_limiter_rate_limit_errors', exchange=str(self.name)).value = self.nofRateLimitErrors
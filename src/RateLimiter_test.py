@@ -0,0 +1,73 @@
+from Metrics import MetricsRegistry
+from RateLimiter import RateLimiter
+from TokenBucket import TokenBucket
+from ccxt.base import errors
+import asyncio
+import pytest
+
+
+class FakeExchange:
+    id = 'fakevenue'
+    name = 'Fake Venue'
+    rateLimit = 50
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class TestClass(object):
+    def test_servedByPriority(self):
+        rateLimiter = RateLimiter('fake', TokenBucket(ratePerSecond=50, burst=1), TokenBucket(ratePerSecond=50, burst=1))
+        rateLimiter.drain()
+        served = []
+
+        async def request(priority):
+            await rateLimiter.acquire(priority)
+            served.append(priority)
+
+        async def scenario():
+            tasks = [asyncio.ensure_future(request(priority)) for priority in
+                     [RateLimiter.PRIORITY_MARKET_DATA, RateLimiter.PRIORITY_HISTORY, RateLimiter.PRIORITY_STATUS,
+                      RateLimiter.PRIORITY_ORDER, RateLimiter.PRIORITY_CANCEL, RateLimiter.PRIORITY_ORDER]]
+            await asyncio.sleep(0)
+            assert rateLimiter.getQueueDepth() == 6
+            assert rateLimiter.getQueueDepth(isPrivate=True, priority=RateLimiter.PRIORITY_ORDER) == 2
+            await asyncio.gather(*tasks)
+        run(scenario())
+        assert served == [RateLimiter.PRIORITY_ORDER, RateLimiter.PRIORITY_ORDER, RateLimiter.PRIORITY_CANCEL,
+                          RateLimiter.PRIORITY_STATUS, RateLimiter.PRIORITY_HISTORY, RateLimiter.PRIORITY_MARKET_DATA]
+        assert rateLimiter.getQueueDepth() == 0
+        assert rateLimiter.nofRequests[RateLimiter.PRIORITY_ORDER] == 2
+
+    def test_publicAndPrivateBuckets(self):
+        rateLimiter = RateLimiter('fake', TokenBucket(ratePerSecond=1, burst=2), TokenBucket(ratePerSecond=1, burst=1))
+
+        async def scenario():
+            await rateLimiter.acquire(RateLimiter.PRIORITY_ORDER)
+            # the private bucket is empty, the public one isn't
+            await asyncio.wait_for(rateLimiter.acquire(RateLimiter.PRIORITY_MARKET_DATA, isPrivate=False), timeout=0.1)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(rateLimiter.acquire(RateLimiter.PRIORITY_STATUS), timeout=0.1)
+            # the timed out request left the queue
+            assert rateLimiter.getQueueDepth() == 0
+        run(scenario())
+
+    def test_sharedPerExchangeAndDrainedByRateLimitErrors(self):
+        rateLimiter = RateLimiter.forExchange(FakeExchange())
+        assert RateLimiter.forExchange(FakeExchange()) is rateLimiter
+        assert rateLimiter.getBucket(isPrivate=False).ratePerSecond == 20
+
+        async def rejected():
+            raise errors.RateLimitExceeded('fakevenue 429')
+
+        with pytest.raises(errors.RateLimitExceeded):
+            run(rateLimiter.request(RateLimiter.PRIORITY_STATUS, rejected))
+        assert rateLimiter.getBucket().tryAcquire() is False
+        assert rateLimiter.getBucket(isPrivate=False).tryAcquire() is True
+
+        metrics = MetricsRegistry()
+        rateLimiter.collectMetrics(metrics)
+        snapshot = metrics.snapshot()
+        assert snapshot['counters'][('rate_limiter_rate_limit_errors', (('exchange', 'fakevenue'),))] == 1
+        assert snapshot['counters'][('rate_limiter_requests', (('exchange', 'fakevenue'), ('priority', 'status')))] == 1
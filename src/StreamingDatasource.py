@@ -0,0 +1,395 @@
+import asyncio
+import bisect
+import json
+import logging
+import time
+import websockets
+from utilities import parseIsoTimestamp
+
+logger = logging.getLogger('CryptoArbitrageApp')
+
+
+class StreamReconnectRequest(Exception):
+    """ The venue asked the client to reconnect """
+    pass
+
+
+class LocalOrderbook:
+    """
+        Local copy of an orderbook maintained from a snapshot and diffs (price level -> size). The prices of both
+        sides are also kept sorted (bisect), so the top-N is read without scanning the book.
+    """
+    def __init__(self):
+        self.bids = {}
+        self.asks = {}
+        # ascending prices of the levels
+        self.bidPrices = []
+        self.askPrices = []
+        self.timestamp = None
+        self.lastTop = None
+
+    def applySnapshot(self, bids, asks, timestamp=None):
+        self.bids = {float(entry[0]): float(entry[1]) for entry in bids if float(entry[1]) > 0}
+        self.asks = {float(entry[0]): float(entry[1]) for entry in asks if float(entry[1]) > 0}
+        self.bidPrices = sorted(self.bids)
+        self.askPrices = sorted(self.asks)
+        self.timestamp = timestamp
+
+    @staticmethod
+    def applyDiff(side, prices, entries):
+        for entry in entries:
+            price = float(entry[0])
+            size = float(entry[1])
+            if size > 0:
+                if price not in side:
+                    bisect.insort(prices, price)
+                side[price] = size
+            elif side.pop(price, None) is not None:
+                del prices[bisect.bisect_left(prices, price)]
+
+    def applyBidsDiff(self, entries, timestamp=None):
+        LocalOrderbook.applyDiff(self.bids, self.bidPrices, entries)
+        self.timestamp = timestamp
+
+    def applyAsksDiff(self, entries, timestamp=None):
+        LocalOrderbook.applyDiff(self.asks, self.askPrices, entries)
+        self.timestamp = timestamp
+
+    def truncate(self, depth):
+        """ Drops the levels beyond the best depth levels of both sides """
+        for price in self.bidPrices[:-depth]:
+            del self.bids[price]
+        del self.bidPrices[:-depth]
+        for price in self.askPrices[depth:]:
+            del self.asks[price]
+        del self.askPrices[depth:]
+
+    def getTop(self, depth):
+        bids = [[price, self.bids[price]] for price in reversed(self.bidPrices[-depth:])]
+        asks = [[price, self.asks[price]] for price in self.askPrices[:depth]]
+        return bids, asks
+
+    def getTopIfChanged(self, depth, force=False):
+        """ Top-N (bids, asks), None if it hasn't changed since the last call (unless forced) or one of the sides is empty """
+        top = self.getTop(depth)
+        if not top[0] or not top[1] or (top == self.lastTop and force is False):
+            return None
+        self.lastTop = top
+        return top
+
+
+class StreamingDatasource:
+    """
+        Websocket orderbook stream of an exchange. The local books are kept up to date with the snapshots and
+        diffs of the venue, and the top-N snapshot of a book is pushed to onOrderbook(exchangename, symbol,
+        bids, asks, timestamp) whenever it changes. The snapshots are timestamped with the receive time, the
+        unchanged books are pushed again every REFRESH_INTERVAL_SECONDS so their graph edges don't expire while
+        the stream is live. The stream reconnects and resubscribes with exponential backoff; the local books
+        are rebuilt from the new snapshots.
+        Subclasses implement getSubscribeMessages() and handleMessage(message).
+    """
+    EXCHANGE_NAME = None
+    URL = None
+    DEPTH = 10
+    RECONNECT_DELAY_SECONDS = 1
+    MAX_RECONNECT_DELAY_SECONDS = 30
+    REFRESH_INTERVAL_SECONDS = 0.5
+
+    def __init__(self, symbols, onOrderbook, url=None, depth=DEPTH, exchangename=None, clock=time.time):
+        self.symbols = list(dict.fromkeys(symbols))
+        # name of the exchange in the graph, e.g. the ccxt name of the polled exchange it replaces
+        self.exchangename = exchangename if exchangename is not None else self.EXCHANGE_NAME
+        self.onOrderbook = onOrderbook
+        self.url = url if url is not None else self.URL
+        self.depth = depth
+        self.clock = clock
+        self.orderbooks = {}
+        self.isRunning = False
+        self.websocket = None
+        self.nofConnects = 0
+        self.nofMessages = 0
+        self.nofSnapshotsPushed = 0
+        self.timeOfLastRefresh = 0
+
+    def getSubscribeMessages(self):
+        raise NotImplementedError
+
+    def handleMessage(self, message):
+        """ Applies the message to the local books, returns the symbols of the updated books """
+        raise NotImplementedError
+
+    def getOrderbook(self, symbol):
+        try:
+            return self.orderbooks[symbol]
+        except KeyError:
+            orderbook = self.orderbooks[symbol] = LocalOrderbook()
+            return orderbook
+
+    def pushIfChanged(self, symbol, now, force=False):
+        top = self.orderbooks[symbol].getTopIfChanged(self.depth, force)
+        if top is None:
+            return
+        bids, asks = top
+        self.nofSnapshotsPushed += 1
+        try:
+            self.onOrderbook(
+                exchangename=self.exchangename,
+                symbol=symbol,
+                bids=bids,
+                asks=asks,
+                timestamp=now)
+        except Exception as e:
+            logger.error('Error updating orderbook analyser from %s stream: %s' % (self.EXCHANGE_NAME, str(e)))
+
+    def processRawMessage(self, rawMessage):
+        self.nofMessages += 1
+        try:
+            message = json.loads(rawMessage)
+            symbols = self.handleMessage(message)
+        except StreamReconnectRequest:
+            raise
+        except Exception as e:
+            logger.warning('Error while parsing %s websocket data: %s %s' % (self.EXCHANGE_NAME, type(e).__name__, str(e.args)))
+            return
+        now = self.clock()
+        if now - self.timeOfLastRefresh > self.REFRESH_INTERVAL_SECONDS:
+            self.timeOfLastRefresh = now
+            for symbol in self.orderbooks:
+                self.pushIfChanged(symbol, now, force=True)
+        else:
+            for symbol in symbols:
+                self.pushIfChanged(symbol, now)
+
+    async def connectAndStream(self):
+        async with websockets.connect(self.url) as websocket:
+            self.websocket = websocket
+            self.nofConnects += 1
+            # the books are rebuilt from the snapshots of the new subscription
+            self.orderbooks = {}
+            for subscribeMessage in self.getSubscribeMessages():
+                await websocket.send(json.dumps(subscribeMessage))
+            logger.info('Subscribed to %s stream: %s' % (self.EXCHANGE_NAME, ','.join(self.symbols)))
+            async for rawMessage in websocket:
+                self.processRawMessage(rawMessage)
+                if self.isRunning is False:
+                    return
+
+    async def run(self):
+        self.isRunning = True
+        reconnectDelaySeconds = self.RECONNECT_DELAY_SECONDS
+        while self.isRunning:
+            timeOfConnect = self.clock()
+            try:
+                await self.connectAndStream()
+                if self.isRunning:
+                    logger.warning('%s stream closed by the server' % self.EXCHANGE_NAME)
+            except asyncio.CancelledError:
+                raise
+            except StreamReconnectRequest:
+                logger.info('%s stream requested reconnect' % self.EXCHANGE_NAME)
+            except Exception as e:
+                logger.error('%s stream failed: %s %s' % (self.EXCHANGE_NAME, type(e).__name__, str(e.args)))
+            finally:
+                self.websocket = None
+
+            if self.isRunning is False:
+                break
+            # a connection that was up for a while is not a failure streak
+            if self.clock() - timeOfConnect > self.MAX_RECONNECT_DELAY_SECONDS:
+                reconnectDelaySeconds = self.RECONNECT_DELAY_SECONDS
+            logger.info('Reconnecting to %s stream in %.1f s' % (self.EXCHANGE_NAME, reconnectDelaySeconds))
+            await asyncio.sleep(reconnectDelaySeconds)
+            reconnectDelaySeconds = min(reconnectDelaySeconds * 2, self.MAX_RECONNECT_DELAY_SECONDS)
+
+    async def stop(self):
+        self.isRunning = False
+        if self.websocket is not None:
+            await self.websocket.close()
+
+
+class KrakenStream(StreamingDatasource):
+    """
+        Kraken websocket API v1, book channel: snapshot ('as', 'bs') and diffs ('a', 'b') of [price, volume, timestamp].
+        Kraken doesn't delete the levels pushed out of the subscribed depth, the book is truncated after every diff.
+    """
+    EXCHANGE_NAME = 'kraken'
+    URL = 'wss://ws.kraken.com'
+    SUBSCRIPTION_DEPTH = 100
+    NAMING = [('BTC', 'XBT')]
+
+    def __init__(self, symbols, onOrderbook, url=None, depth=StreamingDatasource.DEPTH, exchangename=None, clock=time.time):
+        super().__init__(symbols, onOrderbook, url=url, depth=depth, exchangename=exchangename, clock=clock)
+        self.channels = {}
+
+    @staticmethod
+    def toKrakenSymbol(symbol):
+        for standard, kraken in KrakenStream.NAMING:
+            symbol = symbol.replace(standard, kraken)
+        return symbol
+
+    @staticmethod
+    def fromKrakenSymbol(symbol):
+        for standard, kraken in KrakenStream.NAMING:
+            symbol = symbol.replace(kraken, standard)
+        return symbol
+
+    @staticmethod
+    def getTimestamp(entries, timestamp):
+        for entry in entries:
+            if len(entry) > 2:
+                timestamp = max(timestamp or 0, float(entry[2]))
+        return timestamp
+
+    def getSubscribeMessages(self):
+        self.channels = {}
+        return [{
+            'event': 'subscribe',
+            'pair': [KrakenStream.toKrakenSymbol(symbol) for symbol in self.symbols],
+            'subscription': {'name': 'book', 'depth': self.SUBSCRIPTION_DEPTH}
+        }]
+
+    def handleMessage(self, message):
+        if isinstance(message, dict):
+            if message.get('event') == 'subscriptionStatus':
+                if message.get('status') == 'subscribed':
+                    self.channels[message['channelID']] = KrakenStream.fromKrakenSymbol(message['pair'])
+                else:
+                    logger.error('Kraken subscription failed: ' + str(message.get('errorMessage')))
+            return []
+
+        symbol = self.channels.get(message[0])
+        if symbol is None and len(message) >= 4 and isinstance(message[-1], str):
+            symbol = KrakenStream.fromKrakenSymbol(message[-1])
+        if symbol is None:
+            return []
+
+        orderbook = self.getOrderbook(symbol)
+        for payload in message[1:]:
+            if not isinstance(payload, dict):
+                continue
+            if 'as' in payload or 'bs' in payload:
+                orderbook.applySnapshot(payload.get('bs', []), payload.get('as', []),
+                                        KrakenStream.getTimestamp(payload.get('as', []) + payload.get('bs', []), None))
+            if 'a' in payload:
+                orderbook.applyAsksDiff(payload['a'], KrakenStream.getTimestamp(payload['a'], orderbook.timestamp))
+            if 'b' in payload:
+                orderbook.applyBidsDiff(payload['b'], KrakenStream.getTimestamp(payload['b'], orderbook.timestamp))
+        orderbook.truncate(self.SUBSCRIPTION_DEPTH)
+        return [symbol]
+
+
+class CoinbaseProStream(StreamingDatasource):
+    """ Coinbase Pro websocket feed, level2 channel: 'snapshot' and 'l2update' messages """
+    EXCHANGE_NAME = 'coinbasepro'
+    URL = 'wss://ws-feed.pro.coinbase.com'
+
+    def getSubscribeMessages(self):
+        return [{
+            'type': 'subscribe',
+            'product_ids': [symbol.replace('/', '-') for symbol in self.symbols],
+            'channels': ['level2']
+        }]
+
+    def handleMessage(self, message):
+        messageType = message.get('type')
+        if messageType == 'error':
+            logger.error('Coinbase Pro stream error: ' + str(message.get('message')) + ' ' + str(message.get('reason')))
+            return []
+        if messageType not in ('snapshot', 'l2update'):
+            return []
+
+        symbol = message['product_id'].replace('-', '/')
+        orderbook = self.getOrderbook(symbol)
+        timestamp = parseIsoTimestamp(message['time']) if 'time' in message else self.clock()
+        if messageType == 'snapshot':
+            orderbook.applySnapshot(message['bids'], message['asks'], timestamp)
+        else:
+            for side, price, size in message['changes']:
+                if side == 'buy':
+                    orderbook.applyBidsDiff([(price, size)], timestamp)
+                else:
+                    orderbook.applyAsksDiff([(price, size)], timestamp)
+        return [symbol]
+
+
+class BitstampStream(StreamingDatasource):
+    """ Bitstamp websocket API v2, order_book channels: top 100 snapshots on every change """
+    EXCHANGE_NAME = 'bitstamp'
+    URL = 'wss://ws.bitstamp.net'
+    CHANNEL_PREFIX = 'order_book_'
+
+    def __init__(self, symbols, onOrderbook, url=None, depth=StreamingDatasource.DEPTH, exchangename=None, clock=time.time):
+        super().__init__(symbols, onOrderbook, url=url, depth=depth, exchangename=exchangename, clock=clock)
+        self.symbolsByChannel = {BitstampStream.getChannel(symbol): symbol for symbol in self.symbols}
+
+    @staticmethod
+    def getChannel(symbol):
+        return BitstampStream.CHANNEL_PREFIX + symbol.replace('/', '').lower()
+
+    def getSubscribeMessages(self):
+        return [{'event': 'bts:subscribe', 'data': {'channel': BitstampStream.getChannel(symbol)}} for symbol in self.symbols]
+
+    def handleMessage(self, message):
+        event = message.get('event')
+        if event == 'bts:request_reconnect':
+            raise StreamReconnectRequest()
+        if event != 'data':
+            return []
+        symbol = self.symbolsByChannel.get(message.get('channel'))
+        if symbol is None:
+            return []
+
+        data = message['data']
+        self.getOrderbook(symbol).applySnapshot(data['bids'], data['asks'], float(data['microtimestamp']) / 1e6)
+        return [symbol]
+
+
+class StreamReplayServer:
+    """
+        Local websocket server replaying recorded stream messages to every client (tests and offline runs).
+        The connection is dropped after disconnectAfter messages of the first connection to exercise reconnects.
+    """
+    def __init__(self, messages, host='127.0.0.1', port=0, disconnectAfter=None, intervalSeconds=0):
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.disconnectAfter = disconnectAfter
+        self.intervalSeconds = intervalSeconds
+        self.server = None
+        self.nofConnections = 0
+        self.receivedMessages = []
+
+    def getUrl(self):
+        return 'ws://%s:%d' % (self.host, self.port)
+
+    async def handler(self, websocket, path=None):
+        self.nofConnections += 1
+        isFirstConnection = self.nofConnections == 1
+        # subscription requests
+        try:
+            while True:
+                self.receivedMessages.append(json.loads(await asyncio.wait_for(websocket.recv(), timeout=0.05)))
+        except asyncio.TimeoutError:
+            pass
+        for idx, message in enumerate(self.messages):
+            if isFirstConnection and self.disconnectAfter is not None and idx >= self.disconnectAfter:
+                break
+            await websocket.send(message if isinstance(message, str) else json.dumps(message))
+            if self.intervalSeconds:
+                await asyncio.sleep(self.intervalSeconds)
+        if isFirstConnection and self.disconnectAfter is not None:
+            await websocket.close()
+            return
+        # keep the connection open
+        await websocket.wait_closed()
+
+    async def start(self):
+        self.server = await websockets.serve(self.handler, self.host, self.port)
+        sockets = getattr(self.server, 'sockets', None) or self.server.server.sockets
+        self.port = list(sockets)[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
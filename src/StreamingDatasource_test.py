@@ -0,0 +1,159 @@
+from StreamingDatasource import LocalOrderbook, KrakenStream, CoinbaseProStream, BitstampStream, StreamReconnectRequest, StreamReplayServer
+import asyncio
+import json
+import pytest
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class OrderbookSink:
+    def __init__(self):
+        self.updates = []
+
+    def __call__(self, exchangename, symbol, bids, asks, timestamp):
+        self.updates.append((exchangename, symbol, bids, asks, timestamp))
+
+
+KRAKEN_MESSAGES = [
+    {'event': 'systemStatus', 'status': 'online'},
+    {'event': 'subscriptionStatus', 'status': 'subscribed', 'channelID': 42, 'pair': 'XBT/USD', 'subscription': {'name': 'book'}},
+    [42, {'as': [['9001.0', '1.0', '1560000000.1'], ['9002.0', '2.0', '1560000000.1']],
+          'bs': [['9000.0', '1.5', '1560000000.1'], ['8999.0', '3.0', '1560000000.1']]}, 'book-100', 'XBT/USD'],
+    [42, {'a': [['9001.0', '0.00000000', '1560000001.2']]}, 'book-100', 'XBT/USD'],
+    [42, {'b': [['9000.5', '0.5', '1560000002.3']]}, 'book-100', 'XBT/USD']
+]
+
+
+class TestClass(object):
+    def test_localOrderbookDiffs(self):
+        orderbook = LocalOrderbook()
+        orderbook.applySnapshot([['100', '1'], ['99', '2'], ['98', '0']], [['101', '1'], ['102', '2']])
+        assert orderbook.getTop(10) == ([[100, 1], [99, 2]], [[101, 1], [102, 2]])
+
+        orderbook.applyBidsDiff([['100', '0'], ['99.5', '4']])
+        orderbook.applyAsksDiff([['100.5', '1']])
+        assert orderbook.getTop(1) == ([[99.5, 4]], [[100.5, 1]])
+
+    def test_localOrderbookTruncate(self):
+        orderbook = LocalOrderbook()
+        orderbook.applySnapshot([['100', '1'], ['99', '2'], ['98', '3']], [['101', '1'], ['102', '2'], ['103', '3']])
+        orderbook.truncate(2)
+        assert orderbook.getTop(10) == ([[100, 1], [99, 2]], [[101, 1], [102, 2]])
+        assert sorted(orderbook.bids) == orderbook.bidPrices == [99, 100]
+        assert sorted(orderbook.asks) == orderbook.askPrices == [101, 102]
+
+    def test_localOrderbookTopIfChanged(self):
+        orderbook = LocalOrderbook()
+        orderbook.applySnapshot([['100', '1']], [])
+        # one-sided book
+        assert orderbook.getTopIfChanged(5) is None
+        orderbook.applyAsksDiff([['101', '1']])
+        assert orderbook.getTopIfChanged(5) == ([[100, 1]], [[101, 1]])
+        assert orderbook.getTopIfChanged(5) is None
+        assert orderbook.getTopIfChanged(5, force=True) == ([[100, 1]], [[101, 1]])
+        # a change below the top-N isn't pushed
+        orderbook.applyBidsDiff([['90', '1']])
+        assert orderbook.getTopIfChanged(1) is None
+
+    def test_kraken(self):
+        sink = OrderbookSink()
+        clock = FakeClock()
+        stream = KrakenStream(['BTC/USD', 'BTC/USD'], sink, depth=2, clock=clock)
+        assert stream.getSubscribeMessages()[0]['pair'] == ['XBT/USD']
+
+        for message in KRAKEN_MESSAGES:
+            clock.now += 0.1
+            stream.processRawMessage(json.dumps(message))
+        assert [update[1] for update in sink.updates] == ['BTC/USD'] * 3
+        assert sink.updates[0] == ('kraken', 'BTC/USD', [[9000, 1.5], [8999, 3]], [[9001, 1], [9002, 2]], pytest.approx(1000.3))
+        assert sink.updates[1][3] == [[9002, 2]]
+        assert sink.updates[2][2] == [[9000.5, 0.5], [9000, 1.5]]
+        assert stream.getOrderbook('BTC/USD').timestamp == pytest.approx(1560000002.3)
+
+    def test_krakenBookIsTruncatedToSubscriptionDepth(self):
+        sink = OrderbookSink()
+        stream = KrakenStream(['BTC/USD'], sink, depth=5, clock=FakeClock())
+        stream.SUBSCRIPTION_DEPTH = 2
+        assert stream.getSubscribeMessages()[0]['subscription']['depth'] == 2
+        for message in KRAKEN_MESSAGES[:3]:
+            stream.processRawMessage(json.dumps(message))
+        # 9002 leaves the subscribed depth, Kraken doesn't send its deletion
+        stream.processRawMessage(json.dumps([42, {'a': [['9000.8', '1.0', '1560000001.0']]}, 'book-2', 'XBT/USD']))
+        stream.processRawMessage(json.dumps([42, {'a': [['9000.8', '0.00000000', '1560000002.0']]}, 'book-2', 'XBT/USD']))
+        assert sink.updates[-1][3] == [[9001, 1]]
+
+    def test_refreshOfUnchangedBooks(self):
+        sink = OrderbookSink()
+        clock = FakeClock()
+        stream = KrakenStream(['BTC/USD'], sink, clock=clock)
+        for message in KRAKEN_MESSAGES[:3]:
+            stream.processRawMessage(json.dumps(message))
+        assert len(sink.updates) == 1
+
+        heartbeat = json.dumps({'event': 'heartbeat'})
+        stream.processRawMessage(heartbeat)
+        assert len(sink.updates) == 1
+        clock.now += KrakenStream.REFRESH_INTERVAL_SECONDS + 0.1
+        stream.processRawMessage(heartbeat)
+        assert len(sink.updates) == 2
+        assert sink.updates[1][4] == clock.now
+
+    def test_coinbasepro(self):
+        sink = OrderbookSink()
+        stream = CoinbaseProStream(['ETH/BTC'], sink, clock=FakeClock())
+        assert stream.getSubscribeMessages()[0]['product_ids'] == ['ETH-BTC']
+
+        stream.processRawMessage(json.dumps({'type': 'snapshot', 'product_id': 'ETH-BTC', 'bids': [['0.03', '10']], 'asks': [['0.031', '5']]}))
+        stream.processRawMessage(json.dumps({'type': 'l2update', 'product_id': 'ETH-BTC', 'time': '2019-06-01T12:00:00.123456Z',
+                                             'changes': [['buy', '0.0305', '1'], ['sell', '0.031', '0']]}))
+        assert len(sink.updates) == 1
+        stream.processRawMessage(json.dumps({'type': 'l2update', 'product_id': 'ETH-BTC', 'time': '2019-06-01T12:00:00.2Z',
+                                             'changes': [['sell', '0.032', '2']]}))
+        assert sink.updates[-1][1:4] == ('ETH/BTC', [[0.0305, 1], [0.03, 10]], [[0.032, 2]])
+        # malformed messages are logged and skipped
+        stream.processRawMessage('{"type": "l2update"}')
+        assert len(sink.updates) == 2
+
+    def test_bitstamp(self):
+        sink = OrderbookSink()
+        stream = BitstampStream(['BTC/EUR', 'XRP/USD'], sink, clock=FakeClock())
+        assert [message['data']['channel'] for message in stream.getSubscribeMessages()] == ['order_book_btceur', 'order_book_xrpusd']
+
+        stream.processRawMessage(json.dumps({'event': 'bts:subscription_succeeded', 'channel': 'order_book_btceur', 'data': {}}))
+        stream.processRawMessage(json.dumps({'event': 'data', 'channel': 'order_book_btceur',
+                                             'data': {'microtimestamp': '1560000000123456', 'bids': [['8000', '1']], 'asks': [['8001', '2']]}}))
+        assert sink.updates == [('bitstamp', 'BTC/EUR', [[8000, 1]], [[8001, 2]], 1000.0)]
+        with pytest.raises(StreamReconnectRequest):
+            stream.processRawMessage(json.dumps({'event': 'bts:request_reconnect', 'channel': '', 'data': ''}))
+
+    def test_replayWithReconnect(self):
+        loop = asyncio.get_event_loop()
+        sink = OrderbookSink()
+        server = StreamReplayServer(KRAKEN_MESSAGES, disconnectAfter=3)
+        loop.run_until_complete(server.start())
+        stream = KrakenStream(['BTC/USD'], sink, url=server.getUrl())
+        stream.RECONNECT_DELAY_SECONDS = 0.05
+        task = asyncio.ensure_future(stream.run())
+
+        async def waitForUpdates():
+            while len(sink.updates) < 4:
+                await asyncio.sleep(0.01)
+        try:
+            loop.run_until_complete(asyncio.wait_for(waitForUpdates(), timeout=5))
+        finally:
+            loop.run_until_complete(stream.stop())
+            task.cancel()
+            loop.run_until_complete(server.stop())
+
+        assert stream.nofConnects == 2
+        assert server.receivedMessages[0]['pair'] == ['XBT/USD']
+        assert len(server.receivedMessages) == 2
+        # first connection: snapshot only, second connection: snapshot and the two diffs
+        assert sink.updates[0][2:4] == sink.updates[1][2:4]
+        assert sink.updates[-1][2] == [[9000.5, 0.5], [9000, 1.5], [8999, 3]]
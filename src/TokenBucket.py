@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+        Token bucket rate limiter: tokens are refilled continuously at ratePerSecond up to burst,
+        every request consumes a token. Up to burst requests can be issued at once, the sustained
+        rate is bounded by ratePerSecond.
+    """
+    def __init__(self, ratePerSecond, burst=1, clock=time.monotonic):
+        if ratePerSecond <= 0 or burst < 1:
+            raise ValueError('Invalid token bucket parameters, rate:%s burst:%s' % (str(ratePerSecond), str(burst)))
+        self.ratePerSecond = float(ratePerSecond)
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.timeOfLastRefill = clock()
+
+    def __refill(self, now):
+        if now > self.timeOfLastRefill:
+            self.tokens = min(self.burst, self.tokens + (now - self.timeOfLastRefill) * self.ratePerSecond)
+            self.timeOfLastRefill = now
+
+    def getTokens(self, now=None):
+        self.__refill(self.clock() if now is None else now)
+        return self.tokens
+
+    def tryAcquire(self, tokens=1, now=None):
+        self.__refill(self.clock() if now is None else now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def getWaitTimeSeconds(self, tokens=1, now=None):
+        self.__refill(self.clock() if now is None else now)
+        return max(0, (tokens - self.tokens) / self.ratePerSecond)
+
+    def drain(self, now=None):
+        """ e.g. after a rate limit error of the venue, the next request waits for a full refill period """
+        self.__refill(self.clock() if now is None else now)
+        self.tokens = min(self.tokens, 0)
+
+    async def acquire(self, tokens=1):
+        while self.tryAcquire(tokens) is False:
+            await asyncio.sleep(self.getWaitTimeSeconds(tokens))
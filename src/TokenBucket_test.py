@@ -0,0 +1,35 @@
+from TokenBucket import TokenBucket
+import pytest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestClass(object):
+
+    def test_burstAndRefill(self):
+        clock = FakeClock()
+        tokenBucket = TokenBucket(ratePerSecond=2, burst=3, clock=clock)
+        assert [tokenBucket.tryAcquire() for idx in range(4)] == [True, True, True, False]
+        assert tokenBucket.getWaitTimeSeconds() == 0.5
+        clock.now = 0.5
+        assert tokenBucket.tryAcquire() is True
+        assert tokenBucket.tryAcquire() is False
+        clock.now = 10
+        assert tokenBucket.getTokens() == 3
+
+    def test_drain(self):
+        clock = FakeClock()
+        tokenBucket = TokenBucket(ratePerSecond=1, burst=5, clock=clock)
+        tokenBucket.drain()
+        assert tokenBucket.tryAcquire() is False
+        assert tokenBucket.getWaitTimeSeconds() == 1
+
+    def test_invalidParameters(self):
+        with pytest.raises(ValueError):
+            TokenBucket(ratePerSecond=0)
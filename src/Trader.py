@@ -11,9 +11,15 @@ import ccxt.async_support as ccxt
 from ccxt import InvalidOrder, OrderNotFound
 from ccxt.async_support.base.exchange import Exchange
 
+from BalanceCache import BalanceCache
+from BalanceLedger import BalanceLedger
 from Exceptions import OrderCreationError, OrderErrorByExchange
+from MarketRules import MarketRules
+from Metrics import getRegistry
+from OrderStatusPoller import OrderStatusPoller
+from RateLimiter import RateLimiter
 from OrderRequest import OrderRequest, OrderRequestStatus, OrderRequestType, OrderRequestList, \
-    SegmentedOrderRequestList, CCXT_ORDER_STATUS_OPEN, CCXT_ORDER_STATUS_CANCELED
+    SegmentedOrderRequestList, CCXT_ORDER_STATUS_OPEN, CCXT_ORDER_STATUS_CLOSED, CCXT_ORDER_STATUS_CANCELED
 import time
 import logging
 from Notifications import sendNotification
@@ -27,8 +33,12 @@ class Trader:
     PHASE_CREATE_TIMEOUT = 5  # sec (Az összes create-nek létre kell jönnie ennyi idő után)
     PHASE_FETCH_TIMEOUT = 10  # sec (Az összes order-nek CLOSED-nak kell lennie ennyi idő után, ha ez nem igaz, akkor ABORT ALL)
     NOF_CCTX_RETRY = 4
-    TTL_TRADEORDER_S = 60 * 5
-    FETCH_ORDER_STATUS_TIMEOUT = 60 * 60 # sec
+    TTL_TRADEORDER_S = 60 * 5  # deadline of the orders of a deal, the pending ones are canceled after it
+    ORDER_STATUS_POLL_MIN_S = 0.25  # backoff of the order status polling while waiting for the orders of a deal
+    ORDER_STATUS_POLL_MAX_S = 10
+    MAX_CONCURRENT_DEALS = 4  # deals executed at the same time, the balances they need are reserved in the BalanceLedger
+    BALANCE_RECONCILE_INTERVAL_S = 60  # the incrementally updated balances are replaced by the fetched ones this often
+    PIPELINE_FILL_TOLERANCE = 1e-9  # relative, the output of a leg covers the input of the next one
 
     # EFFICIENCY = 0.9  # Ezzel szorozzuk a beadott amout-okat, hogy elkerüljük a recegést a soros átváltások miatt
     #
@@ -39,20 +49,40 @@ class Trader:
     #             orderRequest.amount = orderRequest.amount * pow(Trader.EFFICIENCY, idx * 1)
     #     return segmentedOrderRequestList
 
-    def __init__(self, is_sandbox_mode=True):
-        self.__balances: Dict[str, Any] = {}
+    def __init__(self, is_sandbox_mode=True, is_pipelined_mode=False):
+        self.__balanceCache = BalanceCache()
         self.__is_sandbox_mode: bool = is_sandbox_mode
+        # the legs of a segment are placed as soon as their input is available instead of one by one after CLOSED
+        self.__is_pipelined_mode: bool = is_pipelined_mode
         self.__exchanges: Dict[str, Exchange] = {}
-        self.__isBusy = False
-        logger.debug(f'Trader.__init__(is_sandbox_mode={is_sandbox_mode})')
+        self.__orderStatusPollers: Dict[str, OrderStatusPoller] = {}
+        self.__marketRules = MarketRules()
+        self.__balanceLedger = BalanceLedger()
+        # uuid: segmentedOrderRequestList of the deals in progress
+        self.__activeDeals: Dict[str, SegmentedOrderRequestList] = {}
+        # uuid: (segmentedOrderRequestList, asyncio.Event) of the deals waiting for their orders to complete
+        self.__orderWaiters: Dict[str, tuple] = {}
+        # id(orderRequest): input of the order request reserved in the BalanceLedger by its deal
+        self.__legReservations: Dict[int, float] = {}
+        logger.debug(f'Trader.__init__(is_sandbox_mode={is_sandbox_mode}, is_pipelined_mode={is_pipelined_mode})')
 
     def getBalances(self):
-        return self.__balances
+        return {name: self.__balanceCache.toCCXT(name) for name in self.__balanceCache.balances}
+
+    def getRateLimiter(self, exchangeName: str) -> RateLimiter:
+        return RateLimiter.forExchange(self.__exchanges[exchangeName])
+
+    def getOrderStatusPoller(self, exchangeName: str) -> OrderStatusPoller:
+        return self.__orderStatusPollers[exchangeName]
+
+    def getBalanceCache(self) -> BalanceCache:
+        return self.__balanceCache
 
     def getFreeBalances(self):
         free = {}
-        for name in self.__balances:
-            exchange = self.__balances[name]
+        balances = self.getBalances()
+        for name in balances:
+            exchange = balances[name]
             try:
                 for symbol in exchange['free']:
                     if exchange['free'][symbol] > 0.00001:
@@ -97,6 +127,16 @@ class Trader:
 
         db.close()
 
+    def storeFreeBalancesInBackground(self, uuid, timing):
+        ''' storeFreeBalances() of the current free balances in the default executor, the deal doesn't wait for MySQL '''
+        future = asyncio.get_event_loop().run_in_executor(None, Trader.storeFreeBalances, uuid, timing, self.getFreeBalances())
+
+        def logError(f):
+            if f.exception() is not None:
+                logger.error(f'Storing the free balances of {uuid} failed: {f.exception()}')
+        future.add_done_callback(logError)
+        return future
+
     async def initExchangesFromAWSParameterStore(self):
         logger.debug(f'initExchangesFromAWSParameterStore')
         with open('./cred/aws-keys.json') as file:
@@ -136,10 +176,21 @@ class Trader:
                 await self.__init_exchange(exchangeName, exchangeCreds[exchangeName])
         await self.fetch_balances()
 
+    async def initExchanges(self, exchanges: Dict[str, Exchange]):
+        ''' Exchanges created by the caller, e.g. MockExchangeClient instances of a local MockExchange '''
+        logger.debug(f'initExchanges({list(exchanges.keys())})')
+        for exchangeName, exchange in exchanges.items():
+            await self.__add_exchange(exchangeName, exchange)
+        await self.fetch_balances()
+
     async def __init_exchange(self, exchangeName: str, exchangeCreds):
-        exchange = getattr(ccxt, exchangeName)(exchangeCreds)
+        await self.__add_exchange(exchangeName, getattr(ccxt, exchangeName)(exchangeCreds))
+
+    async def __add_exchange(self, exchangeName: str, exchange: Exchange):
         await exchange.load_markets()
         self.__exchanges[exchangeName.lower().replace(" ", "")] = exchange
+        self.__orderStatusPollers[exchangeName.lower().replace(" ", "")] = OrderStatusPoller(exchange)
+        self.__marketRules.addExchange(exchangeName.lower().replace(" ", ""), exchange)
 
     async def __close_exchange(self, exchange):
         await exchange.close()
@@ -167,23 +218,21 @@ class Trader:
         if orderRequest.id is not None:
             for retrycntr in range(Trader.NOF_CCTX_RETRY):
                 try:
-                    response = await self.__exchanges[
-                        orderRequest.exchange_name_std].cancelOrder(orderRequest.id, orderRequest.market)
+                    response = await self.getRateLimiter(orderRequest.exchange_name_std).request(
+                        RateLimiter.PRIORITY_CANCEL, self.__exchanges[orderRequest.exchange_name_std].cancelOrder, orderRequest.id, orderRequest.market)
                     logger.debug(f'cancelOrder response={response}')
                     if 'error' in response:
                         raise ValueError('Error in exchange response:' +
                                          str(response['error']))
                     logger.debug(f'Cancelled oder #{orderRequest.id} ({orderRequest})')
                     orderRequest.setCanceled()
-                    exchange = self.__exchanges[orderRequest.exchange_name_std]
-                    await asyncio.sleep(exchange.rateLimit / 1000)
+                    self.__applyOrderUpdate(orderRequest, response, isCompleted=True)
                     return
                 except OrderNotFound as onf:
                     logger.error(f'Cancel order request (#{orderRequest.id}) failed with OrderNotFound ({onf})')
                     break
                 except Exception as e:
                     logger.debug(f'Cancel order request (#{orderRequest.id}) failed  with {e}, retrycntr={retrycntr}')
-                    await asyncio.sleep(self.__exchanges[orderRequest.exchange_name_std].rateLimit / 1000)
         dt = (time.time() - t1) * 1000
         logger.debug(f'Cancel order request (#{orderRequest.id}) ended in {dt} ms ({orderRequest.toString()})')
 
@@ -207,19 +256,18 @@ class Trader:
         logger.debug(f'__fetch_order_status #{orderRequest.id} ({orderRequest.toString()})')
         try:
             t1 = time.time()
-            response = await self.__exchanges[orderRequest.exchange_name_std].fetchOrder(orderRequest.id)
+            # the poller takes a status priority token of the exchange's shared RateLimiter before the request
+            response = await self.__orderStatusPollers[orderRequest.exchange_name_std].fetchOrder(orderRequest)
             logger.debug(f'__fetch_order_status #{orderRequest.id} response: {response}')
             t2 = time.time()
             d = (t2 - t1) * 1000.0
             logger.debug(f'Order status fetched #{orderRequest.id} from {orderRequest.exchange_name} in {d} ms')
             orderRequest.updateOrderStatusFromCCXT(response)
+            self.__applyOrderUpdate(orderRequest, response)
             if response['status'] == CCXT_ORDER_STATUS_CANCELED:
                 logger.debug(f'Order status CANCELED #{orderRequest.id}')
                 raise OrderErrorByExchange(orderRequest)
 
-            exchange = self.__exchanges[orderRequest.exchange_name_std]
-            await asyncio.sleep(exchange.rateLimit / 1000)
-
             return
 
         except OrderErrorByExchange as e:
@@ -230,62 +278,179 @@ class Trader:
             raise OrderErrorByExchange(orderRequest)
         except Exception as e:
             logger.error(f'Order status fetching failed for {orderRequest} with reason {e}')
-            await asyncio.sleep(
-                self.__exchanges[orderRequest.exchange_name_std].rateLimit / 1000)
 
-    async def __fetch_order_status_until_closed_or_timeout(self, orderRequest: OrderRequest):
-        t_start = time.time()
-        while (orderRequest.getStatus() != OrderRequestStatus.CLOSED) and (time.time() < t_start + Trader.FETCH_ORDER_STATUS_TIMEOUT):
-            await self.__fetch_order_status(orderRequest)
-            await asyncio.sleep(self.__exchanges[orderRequest.exchange_name_std].rateLimit / 1000)
+    async def __fetch_order_statuses_of_exchange(self, exchangeName: str, orderRequests: List[OrderRequest]):
+        '''
+        One batch request for the order requests of the exchange (concurrent calls are coalesced by the poller),
+        the ones it doesn't return are fetched one by one.
+        :raises OrderErrorByExchange: an order is canceled by the exchange
+        '''
+        orders = await self.__orderStatusPollers[exchangeName].fetchOrders(orderRequests)
+        canceled = None
+        for orderRequest in orderRequests:
+            if orderRequest.id in orders:
+                orderRequest.updateOrderStatusFromCCXT(orders[orderRequest.id])
+                self.__applyOrderUpdate(orderRequest, orders[orderRequest.id])
+                if orders[orderRequest.id]['status'] == CCXT_ORDER_STATUS_CANCELED and canceled is None:
+                    canceled = orderRequest
+        results = await asyncio.gather(*[self.__fetch_order_status(orderRequest) for orderRequest in orderRequests
+                                         if orderRequest.id not in orders], return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        if canceled is not None:
+            logger.debug(f'Order status CANCELED #{canceled.id}')
+            raise OrderErrorByExchange(canceled)
+
+    async def fetchOrderStatuses(self, orderRequests: List[OrderRequest]):
+        ''' Fetches the statuses of the placed order requests, one poller per exchange '''
+        byExchange: Dict[str, List[OrderRequest]] = {}
+        for orderRequest in orderRequests:
+            if orderRequest.id is not None:
+                byExchange.setdefault(orderRequest.exchange_name_std, []).append(orderRequest)
+        await asyncio.gather(*[self.__fetch_order_statuses_of_exchange(exchangeName, exchangeOrderRequests)
+                               for exchangeName, exchangeOrderRequests in byExchange.items()])
 
     async def fetch_order_statuses(self, segmentedOrderRequestList: SegmentedOrderRequestList):
-        tasks = []
         try:
-            for orderRequest in segmentedOrderRequestList.getOrderRequests():
-                tasks.append(asyncio.ensure_future(
-                    self.__fetch_order_status(orderRequest)))
-            await asyncio.gather(*tasks)
+            await self.fetchOrderStatuses(segmentedOrderRequestList.getOrderRequests())
             logger.debug("Order statuses fetching completed")
         except OrderErrorByExchange as e:
             logger.error(f"Order canceled by exchange: {e}")
             raise e
 
+    async def waitForOrderRequests(self, segmentedOrderRequestList: SegmentedOrderRequestList, timeoutSeconds: float) -> bool:
+        '''
+        Waits until none of the order requests is pending (closed, canceled or failed) or the timeout passes.
+        The statuses are polled with exponential backoff, onOrderUpdate() (e.g. private websocket fills) wakes the wait up.
+        :return: True if every order request is completed
+        '''
+        deadline = time.time() + timeoutSeconds
+        delay = Trader.ORDER_STATUS_POLL_MIN_S
+        event = asyncio.Event()
+        self.__orderWaiters[segmentedOrderRequestList.uuid] = (segmentedOrderRequestList, event)
+        try:
+            while True:
+                pending = [orderRequest for orderRequest in segmentedOrderRequestList.getOrderRequests() if orderRequest.isPending()]
+                if not pending:
+                    logger.debug(f'Order requests of {segmentedOrderRequestList.uuid} completed')
+                    return True
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.debug(f'Order requests of {segmentedOrderRequestList.uuid} are pending after {timeoutSeconds} s')
+                    return False
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(delay, remaining))
+                    # status pushed by onOrderUpdate
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, Trader.ORDER_STATUS_POLL_MAX_S)
+                await self.fetchOrderStatuses(pending)
+        finally:
+            del self.__orderWaiters[segmentedOrderRequestList.uuid]
+
+    def onOrderUpdate(self, exchangeName: str, order_from_ccxt):
+        ''' Order status pushed by the exchange (ccxt order structure), updates the order request of a waiting deal '''
+        exchange_name_std = exchangeName.lower().replace(" ", "")
+        for segmentedOrderRequestList, event in self.__orderWaiters.values():
+            for orderRequest in segmentedOrderRequestList.getOrderRequests():
+                if orderRequest.exchange_name_std == exchange_name_std and orderRequest.id == order_from_ccxt['id']:
+                    orderRequest.updateOrderStatusFromCCXT(order_from_ccxt)
+                    self.__applyOrderUpdate(orderRequest, order_from_ccxt)
+                    event.set()
+                    return
+
+    def __applyOrderUpdate(self, orderRequest: OrderRequest, order_from_ccxt, isCompleted=False):
+        ''' Applies the fills and the fee of an order (ccxt order structure) on the balance cache '''
+        order = order_from_ccxt if isinstance(order_from_ccxt, dict) else {}
+        status = order.get('status')
+        filled = order.get('filled')
+        if filled is None and status == 'closed':
+            filled = orderRequest.volumeBase
+        price = order.get('average') or order.get('price') or orderRequest.limitPrice
+        fee = order.get('fee') or {}
+        self.__balanceCache.updateOrder(orderRequest.exchange_name_std, orderRequest.id, filled, price,
+                                        feeCost=fee.get('cost'), feeCurrency=fee.get('currency'),
+                                        isCompleted=isCompleted or status in ('closed', 'canceled'))
+        self.__reserveOutputForNextLeg(orderRequest)
+        self.__notifyOrderWaiters(orderRequest)
+
+    def __notifyOrderWaiters(self, orderRequest: OrderRequest):
+        ''' Wakes up the waits of the order request, its status changed (e.g. placed, filled or failed) '''
+        for orderRequestList, event in self.__orderWaiters.values():
+            if any(other is orderRequest for other in orderRequestList.getOrderRequests()):
+                event.set()
+
     async def fetch_balance(self, exchange):
         for retrycntr in range(Trader.NOF_CCTX_RETRY):
             t1 = time.time()
             try:
-                balance = await exchange.fetch_balance()
-                self.__balances[exchange.name.lower().replace(
-                    " ", "")] = balance
+                balance = await RateLimiter.forExchange(exchange).request(RateLimiter.PRIORITY_STATUS, exchange.fetch_balance)
+                self.__balanceCache.setBalance(exchange.name.lower().replace(" ", ""), balance)
                 d_ms = (time.time() - t1) * 1000.0
                 logger.debug('Balance fetching completed from ' +
                             exchange.name + f" in {d_ms} ms")
-                await asyncio.sleep(exchange.rateLimit / 1000)  # wait for rateLimit
                 return
             except (ccxt.ExchangeError, ccxt.NetworkError) as error:
                 d_ms = (time.time() - t1) * 1000.0
                 logger.error('Fetch balance failed from ' + exchange.name +
                              " " + type(error).__name__ + " " +
                              str(error.args) + " retrycntr:" + str(retrycntr) + f" in {d_ms} ms")
-                await asyncio.sleep(exchange.rateLimit / 1000)
         logger.error(f'Error during fetch balance for {exchange}.')
         raise ValueError(f'Error during fetch balance for {exchange}.')
 
     async def fetch_balances(self):
-        self.__balances = {}
+        # the balances are replaced one by one, the concurrent deals keep validating against the previous ones
         tasks = []
         for _, exchange in self.__exchanges.items():
             tasks.append(asyncio.ensure_future(self.fetch_balance(exchange)))
         await asyncio.gather(*tasks)
 
+    def isExchangeTrading(self, exchangeName: str) -> bool:
+        ''' True if a deal in progress or an open order of the balance cache is on the exchange '''
+        if self.__balanceCache.hasOpenOrders(exchangeName):
+            return True
+        for segmentedOrderRequestList in self.__activeDeals.values():
+            for orderRequest in segmentedOrderRequestList.getOrderRequests():
+                if orderRequest.exchange_name_std == exchangeName:
+                    return True
+        return False
+
+    async def reconcileBalances(self):
+        '''
+        Replaces the cached balances of the exchanges without trading activity by the fetched ones.
+        A fetched balance is dropped if the cache has changed in the meantime, it's retried in the next round.
+        '''
+        for exchangeName, exchange in self.__exchanges.items():
+            if self.isExchangeTrading(exchangeName):
+                continue
+            version = self.__balanceCache.getVersion(exchangeName)
+            try:
+                balance = await self.getRateLimiter(exchangeName).request(RateLimiter.PRIORITY_HISTORY, exchange.fetch_balance)
+            except (ccxt.ExchangeError, ccxt.NetworkError) as error:
+                logger.error(f'Balance reconciliation failed for {exchangeName}: {type(error).__name__} {error.args}')
+                continue
+            if self.__balanceCache.getVersion(exchangeName) != version or self.isExchangeTrading(exchangeName):
+                logger.debug(f'Balance reconciliation of {exchangeName} is skipped, it traded in the meantime')
+                continue
+            self.__balanceCache.setBalance(exchangeName, balance)
+            logger.debug(f'Balances of {exchangeName} reconciled')
+
+    async def runBalanceReconciliation(self):
+        while True:
+            await asyncio.sleep(Trader.BALANCE_RECONCILE_INTERVAL_S)
+            try:
+                await self.reconcileBalances()
+            except Exception as e:
+                logger.error(f'Balance reconciliation failed: {e}', exc_info=True)
+
     def get_free_balance(self, exchangeName, symbol) -> float:
         try:
-            return float(self.__balances[exchangeName][symbol]["free"])
-        except Exception as e:
-            # logger.warning()
-            raise ValueError(
-                f"No balance available from {exchangeName} {symbol} {self.__balances[exchangeName][symbol]['free']}")
+            return self.__balanceCache.getFree(exchangeName, symbol)
+        except KeyError:
+            raise ValueError(f"No balance available from {exchangeName} {symbol}")
 
     def is_exchange_available(self, exchange_name: str) -> bool:
         return exchange_name in self.__exchanges
@@ -307,41 +472,25 @@ class Trader:
         return exchange.markets[market_str]
 
     def get_min_trade_amount(self, exchange_name: str, market_str: str):
-        market = self.get_market(exchange_name, market_str)
-        return market['limits']['amount']['min']
+        return self.__marketRules.getRule(exchange_name, market_str).amountMin
+
+    def getMarketRules(self) -> MarketRules:
+        return self.__marketRules
 
     def isOrderRequestValid(self, orderRequest: OrderRequest) -> bool:
-        exchange_name = orderRequest.exchange_name_std
-        market_str = orderRequest.market
-        amount = orderRequest.volumeBase
-        type = orderRequest.type
         try:
-            if not self.is_exchange_available(exchange_name):
-                raise ValueError(f'Exchange is not available: {exchange_name}')
-            exchange = self.get_exchange(exchange_name)
-            market = self.get_market(exchange_name, market_str)
-            if market['limits']['amount']['min']:
-                if amount < exchange.markets[market_str]['limits']['amount']['min']:
-                    raise ValueError(
-                        'Amount too small, won'
-                        't execute on ' + exchange.name + " " + market_str +
-                        " Amount: " + str(amount) + " Min.amount:" +
-                        str(exchange.markets[market_str]['limits']['amount']['min'])
-                    )
-
-            if market['limits']['amount']['max']:
-                if amount > exchange.markets[market_str]['limits']['amount']['max']:
-                    raise ValueError(
-                        'Amount too big, won'
-                        't execute on ' + exchange.name + " " + market_str +
-                        " Amount: " + str(amount) + " Max.amount:" +
-                        str(exchange.markets[market_str]['limits']['amount']['max'])
-                    )
-
+            self.__marketRules.validate(orderRequest)
             return True
         except Exception as e:
             raise ValueError(f"Error during validating OrderRequest: {e}")
 
+    def prepareOrderRequests(self, orderRequests: List[OrderRequest]):
+        ''' Rounds and validates the order requests against the compiled market rules, in one pass without network calls '''
+        try:
+            self.__marketRules.prepareOrderRequests(orderRequests)
+        except Exception as e:
+            raise ValueError(f"Error during validating OrderRequest: {e}")
+
     def hasSufficientBalanceForOrderRequest(self, orderRequest: OrderRequest):
         logger.debug(f'hasSufficientBalanceForOrderRequest({orderRequest})')
         exchange_name = orderRequest.exchange_name_std
@@ -379,18 +528,102 @@ class Trader:
             raise ValueError('Invalid orderRequest.type')
 
     def isOrderRequestListValid(self, orderRequestList: OrderRequestList):
-        for orderRequest in orderRequestList.getOrderRequests():
-            if self.isOrderRequestValid(orderRequest) is False:
-                return False
         ors = orderRequestList.getOrderRequests()
+        self.prepareOrderRequests(ors)
         return self.hasSufficientBalanceForOrderRequest(ors[0])
 
     def isSegmentedOrderRequestListValid(self, segmentedOrderRequestList: SegmentedOrderRequestList):
+        self.prepareOrderRequests(segmentedOrderRequestList.getOrderRequests())
         ret: bool = True
         for orderRequestList in segmentedOrderRequestList.getOrderRequestLists():
-            ret = ret & self.isOrderRequestListValid(orderRequestList)
+            ret = ret & self.hasSufficientBalanceForOrderRequest(orderRequestList.getOrderRequests()[0])
         return ret
 
+    @staticmethod
+    def getBalanceRequirements(segmentedOrderRequestList: SegmentedOrderRequestList) -> Dict[tuple, float]:
+        '''
+        Balances the deal spends before its own fills arrive: the input of the first order of every segment
+        :return: {(exchange_name_std, asset): amount}, buy orders at their limit price
+        '''
+        requirements = {}
+        for orderRequestList in segmentedOrderRequestList.getOrderRequestLists():
+            orderRequest = orderRequestList.getOrderRequests()[0]
+            base, quote = orderRequest.market.split('/')
+            if orderRequest.type == OrderRequestType.SELL:
+                key, amount = (orderRequest.exchange_name_std, base), orderRequest.volumeBase
+            else:
+                key, amount = (orderRequest.exchange_name_std, quote), orderRequest.volumeBase * orderRequest.limitPrice
+            requirements[key] = requirements.get(key, 0.0) + amount
+        return requirements
+
+    def reserveBalances(self, segmentedOrderRequestList: SegmentedOrderRequestList):
+        ''' Reserves the balances of the deal, raises BalanceReservationError if another deal holds them '''
+        self.__balanceLedger.reserve(segmentedOrderRequestList.uuid,
+                                     Trader.getBalanceRequirements(segmentedOrderRequestList),
+                                     self.get_free_balance)
+        for orderRequestList in segmentedOrderRequestList.getOrderRequestLists():
+            orderRequest = orderRequestList.getOrderRequests()[0]
+            self.__legReservations[id(orderRequest)] = Trader.getOrderInput(orderRequest)[1]
+
+    def getBalanceLedger(self) -> BalanceLedger:
+        return self.__balanceLedger
+
+    def __findLegOfDeal(self, orderRequest: OrderRequest):
+        ''' :return: (uuid, order requests of the segment, index) of the order request in the deals in progress or None '''
+        for uuid, segmentedOrderRequestList in self.__activeDeals.items():
+            for orderRequestList in segmentedOrderRequestList.getOrderRequestLists():
+                for idx, other in enumerate(orderRequestList.getOrderRequests()):
+                    if other is orderRequest:
+                        return uuid, orderRequestList.getOrderRequests(), idx
+        return None
+
+    def __abortDeal(self, dealId: str):
+        ''' Every order request of the deal in progress is aborted, the ones not placed yet won't be placed '''
+        segmentedOrderRequestList = self.__activeDeals.get(dealId)
+        if segmentedOrderRequestList is None:
+            return
+        for orderRequest in segmentedOrderRequestList.getOrderRequests():
+            orderRequest.shouldAbort = True
+            self.__notifyOrderWaiters(orderRequest)
+
+    def __releaseReservationOfOrder(self, orderRequest: OrderRequest):
+        ''' The placed order holds its input as used in the balance cache, the deal's reservation of it is released '''
+        amount = self.__legReservations.pop(id(orderRequest), 0.0)
+        leg = self.__findLegOfDeal(orderRequest)
+        if leg is not None and amount > 0:
+            asset = Trader.getOrderInput(orderRequest)[0]
+            self.__balanceLedger.release(leg[0], orderRequest.exchange_name_std, asset, amount)
+
+    def __reserveOutputForNextLeg(self, orderRequest: OrderRequest):
+        '''
+        The fills of a leg land in the free balance, they are reserved for the next leg of the deal (up to its input)
+        until it's placed, other deals can't claim them in the meantime.
+        '''
+        leg = self.__findLegOfDeal(orderRequest)
+        if leg is None:
+            return
+        uuid, ors, idx = leg
+        if idx + 1 >= len(ors):
+            return
+        nextLeg = ors[idx + 1]
+        if nextLeg.id is not None or nextLeg.shouldAbort or nextLeg.getStatus() != OrderRequestStatus.INITIAL:
+            return
+        asset, received = Trader.getOrderOutput(orderRequest)
+        if nextLeg.exchange_name_std != orderRequest.exchange_name_std or Trader.getOrderInput(nextLeg)[0] != asset:
+            return
+        reserved = self.__legReservations.get(id(nextLeg), 0.0)
+        try:
+            available = self.__balanceLedger.getAvailable(nextLeg.exchange_name_std, asset,
+                                                          self.get_free_balance(nextLeg.exchange_name_std, asset))
+        except ValueError:
+            return
+        amount = min(received, Trader.getOrderInput(nextLeg)[1]) - reserved
+        amount = min(amount, available)
+        if amount <= BalanceLedger.EPSILON:
+            return
+        self.__balanceLedger.reserveMore(uuid, {(nextLeg.exchange_name_std, asset): amount}, self.get_free_balance)
+        self.__legReservations[id(nextLeg)] = reserved + amount
+
     async def __create_limit_order(self, orderRequest: OrderRequest):
         logger.debug(f"__create_limit_order ({orderRequest.toString()})")
         if orderRequest.shouldAbort:
@@ -398,20 +631,29 @@ class Trader:
             return
         exchange = self.__exchanges[orderRequest.exchange_name_std]
         symbol = orderRequest.market
-        amount = orderRequest.volumeBase
-        price = orderRequest.limitPrice
         t1 = time.time()
         try:
             if self.__is_sandbox_mode is True:
                 raise ValueError('Trader sandbox mode ON')
 
+            # rounded to the precision of the market, the order request is usually prepared already
+            rule = self.__marketRules.getRule(orderRequest.exchange_name_std, symbol)
+            amount = rule.roundAmount(orderRequest.volumeBase)
+            price = rule.roundPrice(orderRequest.limitPrice)
+
+            rateLimiter = self.getRateLimiter(orderRequest.exchange_name_std)
+            await rateLimiter.acquire(RateLimiter.PRIORITY_ORDER)
+            if orderRequest.shouldAbort:
+                # the deal is aborted while waiting for the rate limit
+                logger.debug(f"Create limit order is canceled after the rate limit, reason: shouldAbort is True ({orderRequest.toString()})")
+                return
             if orderRequest.type == OrderRequestType.BUY:
                 orderRequest.setStatus(OrderRequestStatus.CREATING)
-                response = await exchange.createLimitBuyOrder(symbol, exchange.amountToPrecision(symbol, amount), exchange.priceToPrecision(symbol, price))
+                response = await rateLimiter.call(exchange.createLimitBuyOrder, symbol, amount, price)
                 logger.debug(f"{orderRequest.exchange_name_std}.createLimitBuyOrder ({orderRequest.toString()}) response: {response}")
             elif orderRequest.type == OrderRequestType.SELL:
                 orderRequest.setStatus(OrderRequestStatus.CREATING)
-                response = await exchange.createLimitSellOrder(symbol, exchange.amountToPrecision(symbol, amount), exchange.priceToPrecision(symbol, price))
+                response = await rateLimiter.call(exchange.createLimitSellOrder, symbol, amount, price)
                 logger.debug(f"{orderRequest.exchange_name_std}.createLimitSellOrder ({orderRequest.toString()}) response: {response}")
             else:
                 raise ValueError('orderRequest.type has an invalid value')
@@ -421,6 +663,13 @@ class Trader:
                                          exchange.name + " " + symbol)
             orderRequest.id = response['id']
             orderRequest.setStatus(OrderRequestStatus.CREATED)
+            if response.get('status') in (CCXT_ORDER_STATUS_OPEN, CCXT_ORDER_STATUS_CLOSED, CCXT_ORDER_STATUS_CANCELED):
+                # e.g. filled at once
+                orderRequest.updateOrderStatusFromCCXT(response)
+            self.__balanceCache.addOrder(orderRequest.exchange_name_std, orderRequest.id, symbol,
+                                         'buy' if orderRequest.type == OrderRequestType.BUY else 'sell', amount, price)
+            self.__releaseReservationOfOrder(orderRequest)
+            self.__applyOrderUpdate(orderRequest, response)
             if 'info' in response:
                 if 'error' in response['info']:
                     orderRequest.errorlog = response['info']['error']
@@ -433,43 +682,171 @@ class Trader:
             d_ms = (time.time() - t1) * 1000.0
             logger.debug(f"Create limit order SUCCESS ({orderRequest.toString()}) in {d_ms} ms")
 
-            await asyncio.sleep(exchange.rateLimit / 1000)
-
         except Exception as error:
             d_ms = (time.time() - t1) * 1000.0
             logger.error(f"Create limit order FAILED ({orderRequest.toString()}) in {d_ms} ms. Reason: {error}")
             orderRequest.setStatus(OrderRequestStatus.FAILED)
+            self.__notifyOrderWaiters(orderRequest)
             raise error
 
-    async def createLimitOrdersOnOrderRequestList(self, orderRequestList: OrderRequestList):
+    @staticmethod
+    def getOrderInput(orderRequest: OrderRequest):
+        ''' :return: (asset, amount) spent by the order request, buy orders at their limit price '''
+        base, quote = orderRequest.market.split('/')
+        if orderRequest.type == OrderRequestType.BUY:
+            return quote, orderRequest.volumeBase * orderRequest.limitPrice
+        return base, orderRequest.volumeBase
+
+    @staticmethod
+    def getOrderOutput(orderRequest: OrderRequest):
+        ''' :return: (asset, amount) received by the order request so far (partial fills included), minus the fee '''
+        base, quote = orderRequest.market.split('/')
+        order = orderRequest.order_from_ccxt or {}
+        filled = order.get('filled')
+        if filled is None:
+            filled = orderRequest.volumeBase if orderRequest.getStatus() == OrderRequestStatus.CLOSED else 0
+        if orderRequest.type == OrderRequestType.BUY:
+            asset, received = base, filled
+        else:
+            asset, received = quote, filled * (order.get('average') or order.get('price') or orderRequest.limitPrice)
+        fee = order.get('fee') or {}
+        if fee.get('currency') in (None, asset):
+            # the fee is charged on the received currency if the exchange doesn't tell
+            received -= fee.get('cost') or 0
+        return asset, received
+
+    async def __waitForOrderOutput(self, orderRequest: OrderRequest, amount: float, deadline: float):
+        '''
+        Waits until the order request has received amount of its output (partial fills included) or it's closed.
+        The status is fetched at once, then polled with exponential backoff. A status change (placement, fill pushed by
+        onOrderUpdate() or fetched by another wait, failure) wakes the wait up and restarts the backoff.
+        :raises OrderErrorByExchange: the order request is canceled or failed
+        :raises ValueError: the deadline of the deal passed
+        '''
+        # None: the first status is fetched without waiting
+        delay = None
+        event = asyncio.Event()
+        key = f'order-{id(orderRequest)}'
+        self.__orderWaiters[key] = (OrderRequestList([orderRequest]), event)
+        try:
+            while True:
+                if orderRequest.getStatus() in (OrderRequestStatus.CANCELED, OrderRequestStatus.FAILED) or orderRequest.shouldAbort:
+                    raise OrderErrorByExchange(orderRequest)
+                if orderRequest.getStatus() == OrderRequestStatus.CLOSED or \
+                        Trader.getOrderOutput(orderRequest)[1] >= amount * (1 - Trader.PIPELINE_FILL_TOLERANCE):
+                    return
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise ValueError(f'OrderRequestStatus is not CLOSED after timeout: {orderRequest.toString()}')
+                if delay is None:
+                    delay = Trader.ORDER_STATUS_POLL_MIN_S
+                else:
+                    event.clear()
+                    try:
+                        await asyncio.wait_for(event.wait(), timeout=min(delay, remaining))
+                        delay = Trader.ORDER_STATUS_POLL_MIN_S
+                        continue
+                    except asyncio.TimeoutError:
+                        pass
+                    if orderRequest.id is not None:
+                        # not placed yet: nothing to poll, the placement wakes the wait up
+                        delay = min(delay * 2, Trader.ORDER_STATUS_POLL_MAX_S)
+                await self.fetchOrderStatuses([orderRequest])
+        finally:
+            del self.__orderWaiters[key]
+
+    async def __waitForOrderClosed(self, orderRequest: OrderRequest, deadline: float):
+        ''' Waits until the order request is CLOSED, see __waitForOrderOutput() '''
+        await self.__waitForOrderOutput(orderRequest, math.inf, deadline)
+
+    def __getUnreservedBalance(self, exchangeName: str, asset: str) -> float:
+        try:
+            freeBalance = self.get_free_balance(exchangeName, asset)
+        except ValueError:
+            return 0.0
+        return self.__balanceLedger.getAvailable(exchangeName, asset, freeBalance)
+
+    async def __createLimitOrdersPipelined(self, orderRequestList: OrderRequestList, dealId: str, deadline: float):
+        '''
+        Places every leg of the segment as soon as its input is available: legs whose input is held in the balance
+        (not reserved by any deal) at once, the others when the fills of the previous leg cover their input.
+        The input of a held leg is reserved by the deal until the leg is placed.
+        Waits until every order is CLOSED or the deadline of the deal passes.
+        '''
+        ors = orderRequestList.getOrderRequests()
+        available = {}
+        isInputHeld = []
+        for idx, orderRequest in enumerate(ors):
+            asset, amount = Trader.getOrderInput(orderRequest)
+            key = (orderRequest.exchange_name_std, asset)
+            if key not in available:
+                available[key] = self.__getUnreservedBalance(orderRequest.exchange_name_std, asset)
+            # the first leg is reserved by the deal already
+            isInputHeld.append(idx == 0 or available[key] >= amount)
+            if idx > 0 and isInputHeld[-1]:
+                available[key] -= amount
+                if dealId is not None:
+                    self.__balanceLedger.reserveMore(dealId, {key: amount}, self.get_free_balance)
+                    self.__legReservations[id(orderRequest)] = amount
+
+        async def placeLeg(idx):
+            orderRequest = ors[idx]
+            if not isInputHeld[idx]:
+                await self.__waitForOrderOutput(ors[idx - 1], Trader.getOrderInput(orderRequest)[1], deadline)
+            if orderRequest.shouldAbort is False:
+                await self.__create_limit_order(orderRequest)
+                if orderRequest.shouldAbort is True:
+                    await self.__cancelOrderRequest(orderRequest)
+
+        logger.debug(f'Pipelined placement, input held: {isInputHeld}')
+        await asyncio.gather(*[placeLeg(idx) for idx in range(len(ors))])
+        await asyncio.gather(*[self.__waitForOrderClosed(orderRequest, deadline) for orderRequest in ors
+                               if orderRequest.shouldAbort is False])
+
+    async def createLimitOrdersOnOrderRequestList(self, orderRequestList: OrderRequestList, dealId: str = None,
+                                                  deadline: float = None):
         '''
         Creates limit order and waits for the order status
         :param orderRequestList:
+        :param dealId: uuid of the deal, its balance reservations are available to the pipelined legs
+        :param deadline: time of the deal's deadline, no order is placed and waited for after it (now + TTL if None)
         :return:
         '''
+        if deadline is None:
+            deadline = time.time() + Trader.TTL_TRADEORDER_S
         try:
             # Pre-check transactions
             if self.isOrderRequestListValid(orderRequestList) is False:
                 logger.error(f'OrderRequestList is not valid: {orderRequestList} ')
                 raise ValueError(f'OrderRequestList is not valid: {orderRequestList} ')
 
+            if self.__is_pipelined_mode is True:
+                await self.__createLimitOrdersPipelined(orderRequestList, dealId, deadline)
+                return
+
             # Fire real transactions
-            for orderRequest in orderRequestList.getOrderRequests():
+            for idx, orderRequest in enumerate(orderRequestList.getOrderRequests()):
+                if idx > 0:
+                    # a failure of another segment completed at the same time aborts the deal before the next leg
+                    await asyncio.sleep(0)
                 if orderRequest.shouldAbort is False:
+                    if time.time() >= deadline:
+                        raise ValueError(f'Deadline of the deal passed before placing: {orderRequest.toString()}')
                     await self.__create_limit_order(orderRequest)
                     if orderRequest.shouldAbort is True:
                         await self.__cancelOrderRequest(orderRequest)
                     else:
-                        await self.__fetch_order_status_until_closed_or_timeout(orderRequest)
-                        if orderRequest.getStatus() != OrderRequestStatus.CLOSED:
-                            raise ValueError(f'OrderRequestStatus is not CLOSED after timeout: {orderRequest.toString()}')
+                        await self.__waitForOrderClosed(orderRequest, deadline)
 
         except Exception as e:
             logger.error(f"OrderRequestList cannot be created: {e}")
             # traceback.print_exc()
+            # the other segments don't place their next leg while the exception reaches execute()
+            self.__abortDeal(dealId)
             raise e
 
-    async def createLimitOrdersOnSegmentedOrderRequestList(self, segmentedOrderRequestList: SegmentedOrderRequestList):
+    async def createLimitOrdersOnSegmentedOrderRequestList(self, segmentedOrderRequestList: SegmentedOrderRequestList,
+                                                           deadline: float = None):
         orders = []
         try:
             # Pre-check transactions
@@ -480,7 +857,8 @@ class Trader:
             # Fire real transactions
             for orderRequestList in segmentedOrderRequestList.getOrderRequestLists():
                 orders.append(
-                    asyncio.ensure_future(self.createLimitOrdersOnOrderRequestList(orderRequestList)))
+                    asyncio.ensure_future(self.createLimitOrdersOnOrderRequestList(orderRequestList, segmentedOrderRequestList.uuid,
+                                                                                   deadline)))
 
             await asyncio.gather(*orders)
 
@@ -491,6 +869,18 @@ class Trader:
     def isSandboxMode(self):
         return self.__is_sandbox_mode
 
+    def isPipelinedMode(self):
+        return self.__is_pipelined_mode
+
+    def isBusy(self):
+        return len(self.__activeDeals) > 0
+
+    def getNofActiveDeals(self):
+        return len(self.__activeDeals)
+
+    def getExchangeNames(self):
+        return list(self.__exchanges.keys())
+
     def input(self, str):
         return input(str)
 
@@ -510,10 +900,13 @@ class Trader:
             logger.error(e)
 
     async def execute(self, segmentedOrderRequestList: SegmentedOrderRequestList):
-        if self.__isBusy:
-            # logger.debug(f"Trader is busy, the execute() call is droped")
+        if len(self.__activeDeals) >= Trader.MAX_CONCURRENT_DEALS:
+            logger.warning(f"Trader is executing {len(self.__activeDeals)} deals, deal {segmentedOrderRequestList.uuid} is dropped")
+            getRegistry().counter('trader_deals_dropped', reason='max_concurrent').inc()
+            return
+        if segmentedOrderRequestList.uuid in self.__activeDeals:
+            logger.debug(f"Deal {segmentedOrderRequestList.uuid} is already being executed")
             return
-        self.__isBusy = True
 
         try:
             logger.debug(f'Start execute the orders:')
@@ -523,21 +916,21 @@ class Trader:
             logger.debug(f'Validating result: {isValid}')
 
             if isValid is False:
-                self.__isBusy = False
                 return
 
             if self.__is_sandbox_mode:
                 logger.debug('Trader is in sandbox mode. Skiping the order requests.')
-                self.__isBusy = False
                 return
 
+            # rejects the deal if a deal in progress holds the balances it needs
+            self.reserveBalances(segmentedOrderRequestList)
+            self.__activeDeals[segmentedOrderRequestList.uuid] = segmentedOrderRequestList
+
         except ValueError as e:
             logger.error(f"execute failed during pre validation. Reason: {e}")
-            self.__isBusy = False
             return
         except Exception as e:
             logger.error(f"execute failed during pre validation. Reason: {e}", exc_info=True)
-            self.__isBusy = False
             return
 
         # ret = self.input('Write <ok> to authorize the trade:')
@@ -551,37 +944,42 @@ class Trader:
             # TODO: save SORL into db
             self.sendNotification(f"CryptoArb Trader is placing orders, uuid: {segmentedOrderRequestList.uuid}")
             t1 = time.time()
-            Trader.storeFreeBalances(segmentedOrderRequestList.uuid, -1, self.getFreeBalances())
-            await self.createLimitOrdersOnSegmentedOrderRequestList(segmentedOrderRequestList)
+            deadline = t1 + Trader.TTL_TRADEORDER_S
+            self.storeFreeBalancesInBackground(segmentedOrderRequestList.uuid, -1)
+            await self.createLimitOrdersOnSegmentedOrderRequestList(segmentedOrderRequestList, deadline)
             d_s = time.time() - t1
             logger.debug(f"createLimitOrdersOnSegmentedOrderRequestList ended in {d_s} s")
-            logger.debug(f"Waiting for the order requests to complete for {Trader.TTL_TRADEORDER_S} s ")
-            await asyncio.sleep(Trader.TTL_TRADEORDER_S)
-            logger.debug(f"Waiting for TTL_TRADEORDER_S is over. ({Trader.TTL_TRADEORDER_S} s) ")
-            await self.fetch_order_statuses(segmentedOrderRequestList)
+            logger.debug(f"Waiting for the order requests to complete, at most {Trader.TTL_TRADEORDER_S} s ")
+            if await self.waitForOrderRequests(segmentedOrderRequestList, deadline - time.time()) is False:
+                await self.fetch_order_statuses(segmentedOrderRequestList)
             logger.debug(f"Canceling all requests")
             await self.cancelAllOrderRequests(segmentedOrderRequestList)
         except Exception as e:
             d_s = time.time() - t1
             logger.error(f"execute failed in {d_s} s. Reason: {e}")
-            for orderRequest in segmentedOrderRequestList.getOrderRequests():
-                orderRequest.shouldAbort = True
+            self.__abortDeal(segmentedOrderRequestList.uuid)
             await self.abortSegmentedOrderRequestList(segmentedOrderRequestList)
             self.sendNotification(f"CryptoArb Trader failed. Reason: " + f"{e}"[:100])
         finally:
-            logger.debug('SORL after execution:')
-            logger.debug(f'\n{segmentedOrderRequestList.sorlToString()}\n')
-            logger.debug('History log after execution:')
-            logger.debug(f'\n{segmentedOrderRequestList.statusLogToString()}\n')
-            await self.fetch_balances()
-            logger.debug(f'Free Balances: {self.getFreeBalances()}')
-            Trader.storeFreeBalances(segmentedOrderRequestList.uuid, 1, self.getFreeBalances())
-            # Fetch trades into db
-            await self.pollTrades()
-
-            self.saveSORLtoDB(segmentedOrderRequestList)
-
-            # TODO: fetch FIAT into db
-            self.__isBusy = False
+            try:
+                logger.debug('SORL after execution:')
+                logger.debug(f'\n{segmentedOrderRequestList.sorlToString()}\n')
+                logger.debug('History log after execution:')
+                logger.debug(f'\n{segmentedOrderRequestList.statusLogToString()}\n')
+                # the balance cache has the fills of the deal, the fetched balances are reconciled in the background
+                logger.debug(f'Free Balances: {self.getFreeBalances()}')
+                self.storeFreeBalancesInBackground(segmentedOrderRequestList.uuid, 1)
+                # Fetch trades into db
+                await self.pollTrades()
+
+                self.saveSORLtoDB(segmentedOrderRequestList)
+
+                # TODO: fetch FIAT into db
+            finally:
+                # the fills and cancels of the deal are in the balance cache (or the deal failed)
+                self.__balanceLedger.releaseAll(segmentedOrderRequestList.uuid)
+                for orderRequest in segmentedOrderRequestList.getOrderRequests():
+                    self.__legReservations.pop(id(orderRequest), None)
+                self.__activeDeals.pop(segmentedOrderRequestList.uuid, None)
             logger.debug('execute(): end.')
             # sys.exit("Exit after execute()")
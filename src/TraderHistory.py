@@ -9,6 +9,7 @@ import logging
 # import MySQLdb
 import os
 from Database import Database
+from RateLimiter import RateLimiter
 
 logger = logging.getLogger('TraderHistory')
 
@@ -103,20 +104,18 @@ class TraderHistory:
         for retrycntr in range(TraderHistory.NOF_CCTX_RETRY):
             t1 = time.time()
             try:
-                balance = await exchange.fetch_balance()
+                balance = await RateLimiter.forExchange(exchange).request(RateLimiter.PRIORITY_HISTORY, exchange.fetch_balance)
                 self.__balances[exchange.name.lower().replace(
                     " ", "")] = balance
                 d_ms = (time.time() - t1) * 1000.0
                 logger.info('Balance fetching completed from ' +
                             exchange.name + f" in {d_ms} ms")
-                await asyncio.sleep(exchange.rateLimit / 1000)  # wait for rateLimit
                 return
             except (ccxt.ExchangeError, ccxt.NetworkError) as error:
                 d_ms = (time.time() - t1) * 1000.0
                 logger.error('Fetch balance failed from ' + exchange.name +
                              " " + type(error).__name__ + " " +
                              str(error.args) + " retrycntr:" + str(retrycntr) + f" in {d_ms} ms")
-                await asyncio.sleep(exchange.rateLimit / 1000)
         logger.error(f'Error during fetch balance for {exchange}.')
         raise ValueError(f'Error during fetch balance for {exchange}.')
 
@@ -235,7 +234,7 @@ class TraderHistory:
                         try:
                             if symbol in exchange.symbols:
                                 logger.debug(f"CALL: {exchange.id}.fetchOrders({symbol})")
-                                fetchOrdersItems = await exchange.fetchOrders(symbol)
+                                fetchOrdersItems = await RateLimiter.forExchange(exchange).request(RateLimiter.PRIORITY_HISTORY, exchange.fetchOrders, symbol)
                                 logger.debug(fetchOrdersItems)
                                 self.__insertOrders(exchange.id, fetchOrdersItems)
                         except Exception as e:
@@ -243,7 +242,7 @@ class TraderHistory:
                 else:
                     try:
                         logger.debug(f"CALL: {exchange.id}.fetchOrders()")
-                        fetchOrdersItems = await exchange.fetchOrders()
+                        fetchOrdersItems = await RateLimiter.forExchange(exchange).request(RateLimiter.PRIORITY_HISTORY, exchange.fetchOrders)
                         logger.debug(fetchOrdersItems)
                         self.__insertOrders(exchange.id, fetchOrdersItems)
                     except Exception as e:
@@ -256,7 +255,7 @@ class TraderHistory:
                         try:
                             if symbol in exchange.symbols:
                                 logger.debug(f"CALL: {exchange.id}.fetchClosedOrders({symbol})")
-                                fetchClosedOrdersItems = await exchange.fetchClosedOrders(symbol)
+                                fetchClosedOrdersItems = await RateLimiter.forExchange(exchange).request(RateLimiter.PRIORITY_HISTORY, exchange.fetchClosedOrders, symbol)
                                 logger.debug(fetchOrdersItems)
                                 self.__insertOrders(exchange.id, fetchClosedOrdersItems)
                         except Exception as e:
@@ -264,7 +263,7 @@ class TraderHistory:
                 else:
                     try:
                         logger.debug(f"CALL: {exchange.id}.fetchClosedOrders()")
-                        fetchClosedOrdersItems = await exchange.fetchClosedOrders()
+                        fetchClosedOrdersItems = await RateLimiter.forExchange(exchange).request(RateLimiter.PRIORITY_HISTORY, exchange.fetchClosedOrders)
                         logger.debug(fetchClosedOrdersItems)
                         self.__insertOrders(exchange.id, fetchClosedOrdersItems)
                     except Exception as e:
@@ -277,7 +276,7 @@ class TraderHistory:
                         try:
                             if symbol in exchange.symbols:
                                 logger.debug(f"CALL: {exchange.id}.fetchMyTrades({symbol})")
-                                fetchMyTradesItems = await exchange.fetchMyTrades(symbol=symbol, since=None, limit=None, params={})
+                                fetchMyTradesItems = await RateLimiter.forExchange(exchange).request(RateLimiter.PRIORITY_HISTORY, exchange.fetchMyTrades, symbol=symbol, since=None, limit=None, params={})
                                 logger.debug(fetchMyTradesItems)
                                 self.__insertTrades(exchange.id, fetchMyTradesItems)
                         except Exception as e:
@@ -285,7 +284,7 @@ class TraderHistory:
                 else:
                     try:
                         logger.debug(f"CALL: {exchange.id}.fetchMyTrades()")
-                        fetchMyTradesItems = await exchange.fetchMyTrades(symbol=None, since=None, limit=None, params={})
+                        fetchMyTradesItems = await RateLimiter.forExchange(exchange).request(RateLimiter.PRIORITY_HISTORY, exchange.fetchMyTrades, symbol=None, since=None, limit=None, params={})
                         logger.debug(fetchMyTradesItems)
                         self.__insertTrades(exchange.id, fetchMyTradesItems)
                     except Exception as e:
@@ -30,8 +30,7 @@ class TestClass(TestCase):
     isSandboxMode = False
 
     async def setUp(self):
-        Trader.TTL_TRADEORDER_S = 1
-        Trader.FETCH_ORDER_STATUS_TIMEOUT = 5
+        Trader.TTL_TRADEORDER_S = 5
         self.trader = Trader(is_sandbox_mode=TestClass.isSandboxMode)
         await self.trader.initExchangesFromAWSParameterStore()
 
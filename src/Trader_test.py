@@ -4,6 +4,7 @@ import unittest
 import pytest
 from asynctest import CoroutineMock, patch, TestCase, Mock, logging
 from ccxt import InsufficientFunds
+from Metrics import getRegistry
 from Trader import Trader
 from OrderRequest import OrderRequest, OrderRequestStatus, OrderRequestType, OrderRequestList, \
     SegmentedOrderRequestList, CCXT_ORDER_STATUS_CANCELED, CCXT_ORDER_STATUS_CLOSED, CCXT_ORDER_STATUS_OPEN
@@ -136,8 +137,7 @@ class TestClass(TestCase):
         self.trader.sendNotification = lambda x: ''
         self.trader.saveSORLtoDB = lambda x: ''
         self.trader.pollTrades = CoroutineMock()
-        Trader.TTL_TRADEORDER_S = 1
-        Trader.FETCH_ORDER_STATUS_TIMEOUT = 5
+        Trader.TTL_TRADEORDER_S = 5
 
     async def tearDown(self):
         await self.trader.close_exchanges()
@@ -162,6 +162,42 @@ class TestClass(TestCase):
         assert exchangeMock.cancelOrder.await_count == 0
         assert sorl.getOrderRequests()[0].getStatus() == OrderRequestStatus.CLOSED
 
+    async def test_deal_over_max_concurrent_dropped(self):
+        """
+           MAX_CONCURRENT_DEALS deals in progress, the next one is dropped and counted
+        """
+        exchangeMock = self.binance.return_value
+        isCreateReleased = asyncio.Event()
+
+        async def mockCreateLimitSellOrder(symbol, amount, price):
+            await isCreateReleased.wait()
+            return {'id': str(len(exchangeMock.createLimitSellOrder.await_args_list))}
+
+        exchangeMock.createLimitSellOrder = CoroutineMock(side_effect=mockCreateLimitSellOrder)
+        exchangeMock.fetchOrder = CoroutineMock(return_value={'status': CCXT_ORDER_STATUS_CLOSED})
+
+        sorls = [SegmentedOrderRequestList(f'uuid{idx}', [OrderRequestList([
+            OrderRequest(BINANCE, ETH_EUR, volumeBase=1, limitPrice=1, meanPrice=1, requestType=OrderRequestType.SELL)])])
+            for idx in range(Trader.MAX_CONCURRENT_DEALS + 1)]
+        executions = [asyncio.ensure_future(self.trader.execute(sorl)) for sorl in sorls[:-1]]
+        await asyncio.sleep(0.05)
+        assert self.trader.getNofActiveDeals() == Trader.MAX_CONCURRENT_DEALS
+        reserved = self.trader.getBalanceLedger().getReserved(BINANCE, 'ETH')
+        nofDropped = getRegistry().counter('trader_deals_dropped', reason='max_concurrent').value
+
+        await self.trader.execute(sorls[-1])
+
+        assert getRegistry().counter('trader_deals_dropped', reason='max_concurrent').value == nofDropped + 1
+        assert self.trader.getBalanceLedger().getReserved(BINANCE, 'ETH') == reserved
+        assert self.trader.getBalanceLedger().getNofDeals() == Trader.MAX_CONCURRENT_DEALS
+        assert sorls[-1].getOrderRequests()[0].getStatus() == OrderRequestStatus.INITIAL
+
+        isCreateReleased.set()
+        await asyncio.gather(*executions)
+        assert [sorl.getOrderRequests()[0].getStatus() for sorl in sorls[:-1]] == \
+            [OrderRequestStatus.CLOSED] * Trader.MAX_CONCURRENT_DEALS
+        assert exchangeMock.createLimitSellOrder.await_count == Trader.MAX_CONCURRENT_DEALS
+
     async def test_balances_validation(self):
         sorl = self.__SORL_3()
         ors: [OrderRequest] = sorl.getOrderRequests()
@@ -331,7 +367,7 @@ class TestClass(TestCase):
 
         assert exchangeMock.createLimitSellOrder.await_count == 1
         assert exchangeMock.createLimitBuyOrder.await_count == 1
-        assert exchangeMock.fetchOrder.await_count > Trader.FETCH_ORDER_STATUS_TIMEOUT / 2
+        assert exchangeMock.fetchOrder.await_count > Trader.TTL_TRADEORDER_S / 2
         assert exchangeMock.cancelOrder.await_count == Trader.NOF_CCTX_RETRY
 
     async def test_canceled_more_exchanges_middle_failed(self):
@@ -412,7 +448,7 @@ class TestClass(TestCase):
         assert exchangeMockBinance.createLimitBuyOrder.await_count == 1
         assert exchangeMockBinance.createLimitSellOrder.await_count == 1
         assert exchangeMockBinance.fetchOrder.await_count == 1
-        assert exchangeMockBinance.cancelOrder.await_count == 2  # Trader.NOF_CCTX_RETRY * 3
+        assert exchangeMockBinance.cancelOrder.await_count == 1
 
         assert exchangeMockKraken.createLimitSellOrder.await_count == 1
         assert exchangeMockKraken.createLimitBuyOrder.await_count == 1
@@ -1,14 +1,42 @@
 from functools import wraps
-from time import time
+from Metrics import getRegistry, perf_counter_ns
+import calendar
+import dateutil.parser
 import logging
+import re
 
 logger = logging.getLogger('CryptoArbitrageApp')
-def timed(f):
-  @wraps(f)
-  def wrapper(*args, **kwds):
-    start = time()
-    result = f(*args, **kwds)
-    elapsed = time() - start
-    logger.info("%s took %d ms" % (f.__module__ + " " + f.__name__, elapsed*1000))
-    return result
-  return wrapper
+def timed(stage):
+  """
+    Records the latency of every call in the 'stage_latency' histogram of the metrics registry:
+      @timed('ingest') or @timed (the stage is the function name)
+  """
+  def decorator(f):
+    histogram = getRegistry().histogram('stage_latency', stage=stageName)
+    @wraps(f)
+    def wrapper(*args, **kwds):
+      start = perf_counter_ns()
+      result = f(*args, **kwds)
+      histogram.record(perf_counter_ns() - start)
+      return result
+    return wrapper
+
+  if callable(stage):
+    stageName = stage.__name__
+    return decorator(stage)
+  stageName = stage
+  return decorator
+
+
+ISO_TIMESTAMP_UTC = re.compile(r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(\.\d+)?Z$')
+def parseIsoTimestamp(text):
+  """
+    ISO-8601 time to epoch seconds. The UTC times of the venues ('2019-06-01T12:00:00.123456789Z',
+    fraction of any precision) are parsed without dateutil, other formats fall back to dateutil.
+  """
+  match = ISO_TIMESTAMP_UTC.match(text)
+  if match is None:
+    return dateutil.parser.parse(text).timestamp()
+  year, month, day, hour, minute, second, fraction = match.groups()
+  timestamp = calendar.timegm((int(year), int(month), int(day), int(hour), int(minute), int(second), 0, 0, 0))
+  return timestamp + float(fraction) if fraction is not None else float(timestamp)
@@ -0,0 +1,16 @@
+from utilities import parseIsoTimestamp
+import calendar
+import pytest
+
+
+class TestClass(object):
+    def test_parseIsoTimestamp(self):
+        epoch = calendar.timegm((2019, 6, 1, 12, 0, 0, 0, 0, 0))
+        assert parseIsoTimestamp('2019-06-01T12:00:00Z') == epoch
+        assert parseIsoTimestamp('2019-06-01T12:00:00.5Z') == epoch + 0.5
+        # Oanda: nanosecond precision
+        assert parseIsoTimestamp('2019-06-01T12:00:00.123456789Z') == pytest.approx(epoch + 0.123456789)
+
+    def test_parseIsoTimestampFallback(self):
+        epoch = calendar.timegm((2019, 6, 1, 12, 0, 0, 0, 0, 0))
+        assert parseIsoTimestamp('2019-06-01T14:00:00.25+02:00') == epoch + 0.25
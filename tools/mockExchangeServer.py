@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+# Local mock exchange serving the exchanges and symbols of the FrameworkLive config, with synthetic
+# random-walk orderbooks and funded balances. Run from the repository root:
+#   python tools/mockExchangeServer.py [--port=8090] [--latency=0.05] [--jitter=0.02] [--ratelimit=10]
+#                                      [--fill=immediate|partial|delayed|never] [--errorrate=0.01]
+#                                      [--config=config/frameworklive.json]
+# then point FrameworkLive at it:
+#   python src/FrameworkLive.py --mockexchange=http://127.0.0.1:8090
+
+import asyncio
+import getopt
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src'))
+
+from FWLiveConfig import FWLiveConfig
+from MockExchange import MockExchange, MockVenue
+
+BOOK_UPDATE_INTERVAL_SECONDS = 0.1
+BOOK_DEPTH = 10
+BALANCE = 1000000
+
+
+def createVenues(config, fillMode):
+    venues = []
+    for exchange, symbols in config.symbols.items():
+        venue = MockVenue(exchange, fillMode=fillMode)
+        for symbol in symbols:
+            venue.addMarket(symbol)
+            for asset in symbol.split('/'):
+                venue.setBalance(asset, BALANCE)
+        venues.append(venue)
+    return venues
+
+
+async def updateOrderbooks(venues):
+    # every venue quotes around its own mid, the deal finder sees some arbitrage
+    mids = {(venue.name, symbol): random.uniform(0.99, 1.01) for venue in venues for symbol in venue.markets}
+    while True:
+        for venue in venues:
+            for symbol in venue.markets:
+                mid = mids[(venue.name, symbol)] = mids[(venue.name, symbol)] * random.uniform(0.9995, 1.0005)
+                venue.setOrderbook(symbol,
+                                   [[round(mid * (1 - 0.001 * (level + 1)), 8), round(random.uniform(0.1, 10), 4)] for level in range(BOOK_DEPTH)],
+                                   [[round(mid * (1 + 0.001 * (level + 1)), 8), round(random.uniform(0.1, 10), 4)] for level in range(BOOK_DEPTH)])
+        await asyncio.sleep(BOOK_UPDATE_INTERVAL_SECONDS)
+
+
+def main(argv):
+    opts, _ = getopt.getopt(argv, '', ['port=', 'latency=', 'jitter=', 'ratelimit=', 'fill=', 'errorrate=', 'config='])
+    opts = dict(opts)
+    config = FWLiveConfig.load(opts.get('--config'))
+    venues = createVenues(config, opts.get('--fill', MockVenue.FILL_IMMEDIATE))
+    server = MockExchange(
+        venues,
+        port=int(opts.get('--port', 8090)),
+        latencySeconds=float(opts.get('--latency', 0)),
+        latencyJitterSeconds=float(opts.get('--jitter', 0)),
+        rateLimitPerSecond=float(opts['--ratelimit']) if '--ratelimit' in opts else None,
+        errorRate=float(opts.get('--errorrate', 0)))
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(server.start())
+    print('Mock exchange listening on http://%s:%d (%s)' % (server.host, server.port, ', '.join(venue.name for venue in venues)))
+    asyncio.ensure_future(updateOrderbooks(venues))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.stop())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
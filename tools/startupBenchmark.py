@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+# Startup time of FrameworkLive: module import and construction (graph worker processes included),
+# every run in a fresh interpreter. Run from the repository root:
+#   python tools/startupBenchmark.py [runs]
+
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+# the logs are written to ./results, the application runs from the repository root
+ENV = dict(os.environ, PYTHONPATH=os.path.join(REPO_DIR, 'src'))
+
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+import FrameworkLive
+from FWLiveParams import FWLiveParams
+imported = time.perf_counter()
+frameworkLive = FrameworkLive.FrameworkLive(FWLiveParams(metrics_port=None))
+constructed = time.perf_counter()
+frameworkLive.orderbookAnalyser.terminate()
+print(imported - start, constructed - imported)
+'''
+
+
+def runStartup():
+    output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT], cwd=REPO_DIR, env=ENV, stderr=subprocess.DEVNULL)
+    importSeconds, constructSeconds = output.decode().split()[-2:]
+    return float(importSeconds), float(constructSeconds)
+
+
+def getSlowestImports(limit=15):
+    """ Cumulative import times [us] of the slowest modules, python 3.7+ (-X importtime) """
+    if sys.version_info < (3, 7):
+        return []
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import FrameworkLive'],
+                            cwd=REPO_DIR, env=ENV, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE).stderr.decode()
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), module.strip()))
+    # top-level packages only
+    imports = [(cumulative, module) for cumulative, module in imports if '.' not in module]
+    return sorted(imports, reverse=True)[:limit]
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [runStartup() for _ in range(runs)]
+    importTimes = [result[0] for result in results]
+    constructTimes = [result[1] for result in results]
+    print('import FrameworkLive:    median %6.3f s  min %6.3f s' % (statistics.median(importTimes), min(importTimes)))
+    print('FrameworkLive():         median %6.3f s  min %6.3f s' % (statistics.median(constructTimes), min(constructTimes)))
+    print('total:                   median %6.3f s' % statistics.median([sum(result) for result in results]))
+
+    slowestImports = getSlowestImports()
+    if slowestImports:
+        print('\nslowest imports (cumulative):')
+        for cumulative, module in slowestImports:
+            print('  %8.1f ms  %s' % (cumulative / 1000, module))